@@ -0,0 +1,53 @@
+import json
+import time
+
+import click
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_tables
+from src.model.intern import dump_shared_tables, field_pool
+from src.model.storage import dump_doc, table_docs_from_data
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _load(text: str):
+    field_pool.clear()
+    return [field_pool.table(table) for table in table_docs_from_data(json.loads(text))]
+
+
+@click.command(help="Compare size and parse time of the verbose and compact docs layouts")
+@click.option("--tables", "n_tables", default=20000, help="Number of tables")
+@click.option("--fields", "n_fields", default=12, help="Number of fields per table")
+@click.option("--repeat", default=3, help="Runs per measure, the best one is kept")
+@click.option("--seed", default=0)
+def main(n_tables: int, n_fields: int, repeat: int, seed: int):
+    tables = generate_tables(n_tables, n_fields, seed)
+    layouts = {
+        "verbose": dump_doc(tables),
+        "compact": dump_doc(tables, compact=True),
+        "compact+shared": dump_shared_tables(tables, compact=True),
+    }
+    expected = _load(layouts["verbose"])
+    rows = []
+    for name, text in layouts.items():
+        if _load(text) != expected:
+            raise click.ClickException(f"{name} layout does not round-trip")
+        rows.append([
+            name,
+            len(text.encode("utf-8")),
+            round(_best_of(lambda: json.loads(text), repeat) * 1000, 1),
+            round(_best_of(lambda: _load(text), repeat) * 1000, 1),
+        ])
+    click.echo(tabulate(rows, headers=["layout", "bytes", "json.loads ms", "load + validate ms"], tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
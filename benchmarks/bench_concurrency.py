@@ -0,0 +1,135 @@
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+
+import click
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_tables
+from src.model.docs import load_docs
+from src.model.index import NameIndex
+from src.model.locking import consistent_read, namespace_writer
+from src.model.storage import dump_doc, write_atomic
+
+NAMESPACE = "bench"
+
+
+def _batch(tables: list[dict], marker: str) -> list[tuple[str, str]]:
+    """
+    Files of one write: every table carries the marker of the writer and round in its last field
+    """
+    files = []
+    for table in tables:
+        fields = [*table["table_fields"][:-1], {**table["table_fields"][-1], "field_name": marker}]
+        files.append((f"{NAMESPACE}-tableinfo-{table['table_name']}-config.json", dump_doc({**table, "table_fields": fields})))
+    return files
+
+
+def _write_unlocked(path: str, data: str):
+    # as the exports did before the locks: several writes, readers may see a part of them
+    with open(path, "w") as f:
+        for start in range(0, len(data), 512):
+            f.write(data[start:start + 512])
+            f.flush()
+
+
+def _writer(directory: str, writer: int, rounds: int, tables: list[dict], locked: bool, results):
+    index = NameIndex.load(directory)
+    for round_ in range(rounds):
+        files = _batch(tables, f"w{writer}_r{round_}")
+        if locked:
+            with namespace_writer(directory, NAMESPACE) as write:
+                for name, data in files:
+                    write.write(os.path.join(directory, name), data)
+                # a file of its own, every writer's file has to stay in the shared name index
+                own = os.path.join(directory, f"{NAMESPACE}-tableinfo-writer{writer}-config.json")
+                index.update_file(own, [tables[0]])
+                index.save()
+        else:
+            for name, data in files:
+                _write_unlocked(os.path.join(directory, name), data)
+    results.put(("writer", rounds))
+
+
+def _markers(docs) -> set[str]:
+    return {table.table_fields[-1].field_name for table in docs.tables.values()}
+
+
+def _reader(directory: str, locked: bool, stop, results):
+    reads = torn = mixed = 0
+    while not stop.is_set():
+        try:
+            if locked:
+                docs = consistent_read(directory, NAMESPACE, lambda: load_docs(directory, NAMESPACE))
+            else:
+                docs = load_docs(directory, NAMESPACE)
+        except ValueError:
+            # a half-written file, or a document validated on part of its content
+            torn += 1
+            continue
+        reads += 1
+        # writer files hold another table, only the shared batch is compared
+        if len({m for m in _markers(docs) if m.startswith("w")}) > 1:
+            mixed += 1
+    results.put(("reader", reads, torn, mixed))
+
+
+def run_stress(directory: str, n_writers: int, n_readers: int, rounds: int, tables: list[dict], locked: bool) -> list:
+    for name, data in _batch(tables, "w_init"):
+        write_atomic(os.path.join(directory, name), data)
+    results = multiprocessing.Queue()
+    stop = multiprocessing.Event()
+    readers = [multiprocessing.Process(target=_reader, args=(directory, locked, stop, results)) for _ in range(n_readers)]
+    writers = [
+        multiprocessing.Process(target=_writer, args=(directory, w, rounds, tables, locked, results))
+        for w in range(n_writers)
+    ]
+    start = time.perf_counter()
+    for process in readers + writers:
+        process.start()
+    for process in writers:
+        process.join()
+    seconds = time.perf_counter() - start
+    stop.set()
+    for process in readers:
+        process.join()
+    reads = torn = mixed = 0
+    for _ in range(n_readers + n_writers):
+        result = results.get()
+        if result[0] == "reader":
+            reads += result[1]
+            torn += result[2]
+            mixed += result[3]
+    lost = 0
+    if locked:
+        with open(NameIndex.index_path(directory), "r") as f:
+            indexed = json.load(f)["files"]
+        lost = sum(
+            os.path.join(directory, f"{NAMESPACE}-tableinfo-writer{w}-config.json") not in indexed
+            for w in range(n_writers)
+        )
+    writes = n_writers * rounds
+    return ["locked" if locked else "unlocked", writes, round(writes / seconds, 1), reads, torn, mixed, lost]
+
+
+@click.command(help="Parallel writers and readers on one namespace: torn files, mixed batches and lost index entries")
+@click.option("--writers", "n_writers", default=8, help="Writer processes")
+@click.option("--readers", "n_readers", default=4, help="Reader processes")
+@click.option("--rounds", default=20, help="Batches written by each writer")
+@click.option("--tables", "n_tables", default=20, help="Tables rewritten by each batch")
+@click.option("--unlocked", is_flag=True, default=False, help="Also run the writers without locks, for comparison")
+@click.option("--seed", default=0)
+def main(n_writers: int, n_readers: int, rounds: int, n_tables: int, unlocked: bool, seed: int):
+    tables = generate_tables(n_tables, 12, seed)
+    rows = []
+    for locked in ([True, False] if unlocked else [True]):
+        with tempfile.TemporaryDirectory() as directory:
+            rows.append(run_stress(directory, n_writers, n_readers, rounds, tables, locked))
+    headers = ["mode", "batches", "batches/s", "reads", "torn reads", "mixed reads", "lost index entries"]
+    click.echo(tabulate(rows, headers=headers, tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import os
+import tempfile
+import time
+
+import click
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_tables
+from src.data.generator import FORMATS, TableDataGenerator, np, write_data
+from src.model.intern import field_pool
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+@click.command(help="Rows per second of the data generator, per output format and number of workers")
+@click.option("--rows", default=200000, help="Rows to generate")
+@click.option("--fields", "n_fields", default=12, help="Number of fields of the table")
+@click.option("--workers", default=(1, 2, 4), multiple=True, help="Worker counts to measure")
+@click.option("--seed", default=0)
+def main(rows: int, n_fields: int, workers: tuple, seed: int):
+    table = field_pool.table(generate_tables(1, n_fields, seed)[0])
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for use_numpy in sorted({False, np is not None}):
+            generator = TableDataGenerator(table, rows, seed=seed, use_numpy=use_numpy)
+            elapsed = _timed(lambda: list(generator))
+            results.append(["numpy" if use_numpy else "python", "-", "-", round(rows / elapsed)])
+            for fmt in FORMATS:
+                for n in workers:
+                    path = os.path.join(directory, f"data.{fmt}")
+                    elapsed = _timed(lambda: write_data(path, generator, fmt, workers=n))
+                    results.append(["numpy" if use_numpy else "python", fmt, n, round(rows / elapsed)])
+    click.echo(tabulate(results, headers=["backend", "format", "workers", "rows/s"], tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from tabulate import tabulate
+
+from src.data.sequence import SequenceAllocator
+
+
+def _allocate(directory: str, ids: int, block_size: int) -> list[int]:
+    allocator = SequenceAllocator(directory, "bench", "table", "id", block_size=block_size)
+    return [allocator.next() for _ in range(ids)]
+
+
+def _threads(directory: str, workers: int, ids: int, block_size: int) -> list[int]:
+    allocator = SequenceAllocator(directory, "bench", "table", "id", block_size=block_size)
+    values = [[] for _ in range(workers)]
+
+    def allocate(i: int):
+        values[i] = [allocator.next() for _ in range(ids)]
+    threads = [threading.Thread(target=allocate, args=(i,)) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [value for chunk in values for value in chunk]
+
+
+def _processes(directory: str, workers: int, ids: int, block_size: int) -> list[int]:
+    with ProcessPoolExecutor(workers) as executor:
+        futures = [executor.submit(_allocate, directory, ids, block_size) for _ in range(workers)]
+        return [value for future in futures for value in future.result()]
+
+
+@click.command(help="Ids per second of the sequence allocator with N threads or processes sharing one sequence")
+@click.option("--ids", default=100000, help="Ids allocated per worker")
+@click.option("--workers", default=(1, 2, 4, 8), multiple=True, help="Worker counts to measure")
+@click.option("--block-size", "block_sizes", default=(1, 100, 1000), multiple=True, help="Ids reserved per lock")
+def main(ids: int, workers: tuple, block_sizes: tuple):
+    results = []
+    for mode, allocate in (("threads", _threads), ("processes", _processes)):
+        for block_size in block_sizes:
+            # one reservation per id is only measured on a slice, it is bound by the file lock
+            n_ids = ids if block_size > 1 else min(ids, 2000)
+            for n in workers:
+                with tempfile.TemporaryDirectory() as directory:
+                    start = time.perf_counter()
+                    values = allocate(directory, n, n_ids, block_size)
+                    elapsed = time.perf_counter() - start
+                if len(set(values)) != len(values):
+                    raise click.ClickException(f"Ids handed out twice with {n} {mode}")
+                results.append([mode, block_size, n, round(len(values) / elapsed)])
+    click.echo(tabulate(results, headers=["mode", "block size", "workers", "ids/s"], tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
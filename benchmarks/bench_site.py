@@ -0,0 +1,51 @@
+import json
+import os
+import tempfile
+import time
+
+import click
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_tables, write_namespace
+from src.view.site import FORMAT_HTML, SITE_FORMATS, build_site
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+@click.command(help="Time a full site build, a rebuild without change and a rebuild after one table changed")
+@click.option("--tables", "n_tables", default=20000, help="Number of tables, one file per table")
+@click.option("--fields", "n_fields", default=12, help="Number of fields per table")
+@click.option("--foreign-keys", "n_foreign_keys", default=2, help="Foreign keys per table")
+@click.option("--format", "fmt", type=click.Choice(SITE_FORMATS), default=FORMAT_HTML)
+@click.option("--workers", type=int, default=None, help="Worker processes, by default one per CPU")
+@click.option("--seed", default=0)
+def main(n_tables: int, n_fields: int, n_foreign_keys: int, fmt: str, workers: int, seed: int):
+    tables = generate_tables(n_tables, n_fields, seed, n_foreign_keys)
+    with tempfile.TemporaryDirectory() as directory:
+        docs_path = os.path.join(directory, "docs")
+        site_dir = os.path.join(directory, "site")
+        write_namespace(docs_path, tables=tables, per_table_files=True)
+
+        def build():
+            return build_site(docs_path, site_dir, "bench", fmt=fmt, workers=workers)
+
+        rows = []
+        for name in ("full build", "no change"):
+            seconds, result = _timed(build)
+            rows.append([name, result.files_read, result.rendered, round(seconds * 1000, 1)])
+        # a table referenced by others, its page and the pages linking to it are rendered again
+        table = tables[1]
+        table["table_fields"][-1]["field_required"] = not table["table_fields"][-1]["field_required"]
+        with open(f"{docs_path}/bench-tableinfo-{table['table_name']}-config.json", "w") as f:
+            f.write(json.dumps(table, indent=2))
+        seconds, result = _timed(build)
+        rows.append(["one table changed", result.files_read, result.rendered, round(seconds * 1000, 1)])
+    click.echo(tabulate(rows, headers=["build", "files read", "pages rendered", "ms"], tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import json
+import time
+
+import click
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_data_sources, generate_tables
+from src.model.snapshot import dump_snapshot, load_snapshot
+from src.model.storage import dump_doc
+
+
+def _best_of(func, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+@click.command(help="Compare size and load time of the binary snapshot with the JSON docs")
+@click.option("--tables", "n_tables", default=20000, help="Number of tables")
+@click.option("--fields", "n_fields", default=12, help="Number of fields per table")
+@click.option("--repeat", default=3, help="Runs per measure, the best one is kept")
+@click.option("--seed", default=0)
+def main(n_tables: int, n_fields: int, repeat: int, seed: int):
+    tables = generate_tables(n_tables, n_fields, seed)
+    data_sources = generate_data_sources(4, seed)
+    verbose = dump_doc(tables).encode("utf-8")
+    compact = dump_doc(tables, compact=True).encode("utf-8")
+    snapshot = dump_snapshot(data_sources, tables)
+    rows = [
+        ["json verbose", len(verbose), round(_best_of(lambda: json.loads(verbose), repeat) * 1000, 1)],
+        ["json compact", len(compact), round(_best_of(lambda: json.loads(compact), repeat) * 1000, 1)],
+        ["snapshot", len(snapshot), round(_best_of(lambda: load_snapshot(snapshot), repeat) * 1000, 1)],
+    ]
+    click.echo(tabulate(rows, headers=["format", "bytes", "load ms"], tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import csv
+import os
+import tempfile
+import time
+from typing import Optional
+
+import click
+from pydantic import Field, ValidationError, create_model
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_tables
+from src.data.generator import FORMATS, TableDataGenerator, write_data
+from src.data.validator import parse_block, validate_file
+from src.model.intern import field_pool
+from src.model.meta import FIELD_TYPES, TableInfo
+
+_CONSTRAINTS = {
+    "text": {"field_min_length": "min_length", "field_max_length": "max_length", "field_pattern": "pattern"},
+    "integer": {"field_gt": "gt", "field_ge": "ge", "field_lt": "lt", "field_le": "le"},
+    # pydantic only counts decimal places of Decimal values
+    "float": {"field_gt": "gt", "field_ge": "ge", "field_lt": "lt", "field_le": "le"},
+}
+
+
+def _pydantic_model(table: TableInfo):
+    """
+    The per-row pydantic model the compiled checker replaces, as a baseline
+    """
+    fields = {}
+    for field in table.table_fields:
+        constraints = {
+            name: getattr(field, key) for key, name in _CONSTRAINTS.get(field.field_type, {}).items()
+            if getattr(field, key) is not None
+        }
+        python_type = FIELD_TYPES[field.field_type]
+        if field.field_required:
+            fields[field.field_name] = (python_type, Field(**constraints))
+        else:
+            fields[field.field_name] = (Optional[python_type], Field(default=None, **constraints))
+    return create_model(table.table_name, **fields)
+
+
+def _timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+@click.command(help="Rows per second of validate-data against per-row pydantic validation")
+@click.option("--rows", default=200000, help="Rows of the data file")
+@click.option("--fields", "n_fields", default=12, help="Number of fields of the table")
+@click.option("--workers", default=(1, 2, 4), multiple=True, help="Worker counts to measure")
+@click.option("--seed", default=0)
+def main(rows: int, n_fields: int, workers: tuple, seed: int):
+    table = field_pool.table(generate_tables(1, n_fields, seed)[0])
+    generator = TableDataGenerator(table, rows, seed=seed)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for fmt in FORMATS:
+            path = os.path.join(directory, f"data.{fmt}")
+            write_data(path, generator, fmt, workers=1)
+            for n in workers:
+                elapsed = _timed(lambda: validate_file(path, table, fmt, workers=n))
+                results.append(["compiled", fmt, n, round(rows / elapsed)])
+        model = _pydantic_model(table)
+        path = os.path.join(directory, "data.csv")
+
+        def validate_with_pydantic():
+            with open(path, newline="") as f:
+                header = next(csv.reader([f.readline()]))
+                for row in parse_block(f.read(), "csv"):
+                    try:
+                        model(**{k: v or None for k, v in zip(header, row)})
+                    except ValidationError:
+                        pass
+        elapsed = _timed(validate_with_pydantic)
+        results.append(["pydantic", "csv", 1, round(rows / elapsed)])
+    click.echo(tabulate(results, headers=["validator", "format", "workers", "rows/s"], tablefmt="rounded_grid"))
+
+
+if __name__ == "__main__":
+    main()
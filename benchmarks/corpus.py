@@ -0,0 +1,129 @@
+import json
+import os
+import random
+from typing import Optional
+
+from src.model.meta import DATA_SOURCE_TYPES, FieldInfo
+
+# (weight, field definition) pairs, most tables repeat a few common definitions
+_COMMON_FIELDS = (
+    (10, {"field_name": "id", "field_type": "integer", "field_factory": "auto", "field_required": True, "field_unique": True}),
+    (6, {"field_name": "created_at", "field_type": "datetime", "field_required": True}),
+    (6, {"field_name": "updated_at", "field_type": "datetime"}),
+    (3, {"field_name": "uuid", "field_type": "uuid", "field_factory": "auto", "field_unique": True}),
+)
+
+
+def _random_field(rnd: random.Random, i: int) -> dict:
+    field_type = rnd.choice(("integer", "integer", "float", "text", "text", "text", "boolean", "datetime", "json"))
+    field = {"field_name": f"col_{i}", "field_type": field_type, "field_required": rnd.random() < 0.4}
+    if rnd.random() < 0.2:
+        field["field_alias"] = f"alias_{i}"
+    if field_type == "text":
+        if rnd.random() < 0.6:
+            field["field_max_length"] = rnd.choice((16, 32, 64, 255))
+        if rnd.random() < 0.2:
+            field["field_min_length"] = 1
+        if rnd.random() < 0.15:
+            field["field_pattern"] = r"^[a-z][a-z0-9_]*$"
+    elif field_type in ("integer", "float"):
+        if rnd.random() < 0.3:
+            field["field_ge"] = 0
+        if rnd.random() < 0.2:
+            field["field_le"] = rnd.choice((100, 1000, 1000000))
+        if field_type == "float" and rnd.random() < 0.5:
+            field["field_decimal_places"] = rnd.choice((2, 4))
+    if rnd.random() < 0.1:
+        field["field_unique"] = True
+    return field
+
+
+def _add_foreign_keys(rnd: random.Random, tables: list[dict], n_foreign_keys: int, defaults: dict):
+    """
+    Reference the id of earlier tables, a few references to later tables make cycles
+    """
+    with_id = [t for t, table in enumerate(tables) if table["table_fields"] and table["table_fields"][0]["field_name"] == "id"]
+    if not with_id:
+        return
+    for t, table in enumerate(tables):
+        foreign_keys = []
+        for k in range(n_foreign_keys):
+            if t == 0 or rnd.random() < 0.01:
+                ref = rnd.choice(with_id)
+            else:
+                ref = with_id[rnd.randrange(len(with_id))]
+                if ref >= t:
+                    continue
+            field_name = f"ref_{k}"
+            table["table_fields"].append({**defaults, "field_name": field_name, "field_type": "integer"})
+            foreign_keys.append({
+                "field_name": field_name,
+                "fk_table_name": tables[ref]["table_name"],
+                "fk_field_name": "id",
+                "fk_relate_name": None,
+            })
+        table["table_foreign_keys"] = foreign_keys or None
+
+
+def generate_tables(n_tables: int, n_fields: int = 12, seed: int = 0, n_foreign_keys: int = 0) -> list[dict]:
+    """
+    Reproducible tables in the verbose layout written by `configure-tables`
+    """
+    rnd = random.Random(seed)
+    defaults = {name: FieldInfo.get_default(info) for name, info in FieldInfo.model_fields.items()}
+    tables = []
+    for t in range(n_tables):
+        fields = []
+        for weight, field in _COMMON_FIELDS:
+            if rnd.random() < weight / 10:
+                fields.append({**defaults, **field})
+        for i in range(len(fields), n_fields):
+            fields.append({**defaults, **_random_field(rnd, i)})
+        tables.append({"table_name": f"table_{t}", "table_fields": fields})
+    if n_foreign_keys:
+        _add_foreign_keys(rnd, tables, n_foreign_keys, defaults)
+    return tables
+
+
+def generate_data_sources(n_data_sources: int, seed: int = 0) -> list[dict]:
+    rnd = random.Random(seed)
+    return [
+        {
+            "ds_name": f"source_{i}",
+            "ds_type": rnd.choice(list(DATA_SOURCE_TYPES)),
+            "ds_host": f"db-{i}.local",
+            "ds_port": rnd.choice((3306, 5432, 1521)),
+            "ds_user": "reader",
+            "ds_password": None,
+        }
+        for i in range(n_data_sources)
+    ]
+
+
+def write_namespace(
+    directory: str,
+    namespace: str = "bench",
+    n_tables: int = 1000,
+    n_fields: int = 12,
+    n_data_sources: int = 1,
+    seed: int = 0,
+    per_table_files: bool = False,
+    tables: Optional[list[dict]] = None,
+) -> list[dict]:
+    """
+    Write a synthetic namespace with the same file naming as the configure-* commands
+    """
+    os.makedirs(directory, exist_ok=True)
+    tables = tables if tables is not None else generate_tables(n_tables, n_fields, seed)
+    for ds in generate_data_sources(n_data_sources, seed):
+        with open(f"{directory}/{namespace}-datasourceinfo-{ds['ds_name']}-config.json", "w+") as f:
+            f.write(json.dumps(ds, indent=2))
+    if per_table_files:
+        for table in tables:
+            with open(f"{directory}/{namespace}-tableinfo-{table['table_name']}-config.json", "w+") as f:
+                f.write(json.dumps(table, indent=2))
+    else:
+        with open(f"{directory}/{namespace}-tableinfo-config.json", "w+") as f:
+            f.write(json.dumps(tables, indent=2))
+    return tables
+
@@ -0,0 +1,272 @@
+import contextlib
+import datetime
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, NamedTuple
+
+import click
+from tabulate import tabulate
+
+from benchmarks.corpus import generate_data_sources, generate_tables, write_namespace
+from src.configurator import run as run_module
+from src.configurator.configurator import DatasourceInfoConfigurator, FieldInfoConfigurator, TableInfoConfigurator
+from src.helpers.pretty_str import default_theme
+from src.logger.log import Logger
+from src.model.intern import field_pool
+from src.model.meta import DataSourceInfo, FieldInfo, TableInfo
+from src.model.storage import dump_doc
+
+DEFAULT_BASELINE = "benchmarks/baselines/latest.json"
+DEFAULT_THRESHOLD = 0.1
+LOG_RECORDS = 200
+
+
+class Corpus(NamedTuple):
+    tables: list[dict]
+    data_sources: list[dict]
+    directory: str
+    namespace: str
+
+
+class Result(NamedTuple):
+    name: str
+    items: int
+    best: float
+    median: float
+
+
+# name -> (corpus -> (timed function, number of items it handles))
+CASES: dict[str, Callable[[Corpus], tuple[Callable[[], None], int]]] = {}
+
+
+def case(name: str):
+    def decorator(func):
+        CASES[name] = func
+        return func
+    return decorator
+
+
+def _fields(corpus: Corpus) -> list[dict]:
+    return [field for table in corpus.tables for field in table["table_fields"]]
+
+
+@case("field_validation")
+def _field_validation(corpus: Corpus):
+    fields = _fields(corpus)
+    return lambda: [FieldInfo(**field) for field in fields], len(fields)
+
+
+@case("configure_ds_build")
+def _configure_ds_build(corpus: Corpus):
+    return lambda: [DatasourceInfoConfigurator(**ds).configure() for ds in corpus.data_sources], len(corpus.data_sources)
+
+
+@case("configure_ds_dict")
+def _configure_ds_dict(corpus: Corpus):
+    return lambda: [DatasourceInfoConfigurator().configure(ds) for ds in corpus.data_sources], len(corpus.data_sources)
+
+
+@case("configure_ds_model")
+def _configure_ds_model(corpus: Corpus):
+    models = [DataSourceInfo(**ds) for ds in corpus.data_sources]
+    return lambda: [DatasourceInfoConfigurator().configure(ds) for ds in models], len(models)
+
+
+@case("configure_table_build")
+def _configure_table_build(corpus: Corpus):
+    tables = [(table["table_name"], [FieldInfo(**f) for f in table["table_fields"]]) for table in corpus.tables]
+    return lambda: [TableInfoConfigurator(name, list(fields)).configure() for name, fields in tables], len(tables)
+
+
+@case("configure_table_dict")
+def _configure_table_dict(corpus: Corpus):
+    return lambda: [TableInfoConfigurator().configure(table) for table in corpus.tables], len(corpus.tables)
+
+
+@case("configure_table_model")
+def _configure_table_model(corpus: Corpus):
+    models = [TableInfo(**table) for table in corpus.tables]
+    return lambda: [TableInfoConfigurator().configure(table) for table in models], len(models)
+
+
+@case("configure_field_build")
+def _configure_field_build(corpus: Corpus):
+    fields = _fields(corpus)
+    return lambda: [FieldInfoConfigurator(**field).configure() for field in fields], len(fields)
+
+
+@case("configure_field_dict")
+def _configure_field_dict(corpus: Corpus):
+    fields = _fields(corpus)
+    return lambda: [FieldInfoConfigurator().configure(field) for field in fields], len(fields)
+
+
+@case("get_hint")
+def _get_hint(corpus: Corpus):
+    names = [
+        (configurator, name)
+        for configurator in (DatasourceInfoConfigurator, TableInfoConfigurator, FieldInfoConfigurator)
+        for name in configurator.model.model_fields
+    ] * 100
+    return lambda: [configurator.get_hint(name) for configurator, name in names], len(names)
+
+
+@case("table_view_render")
+def _table_view_render(corpus: Corpus):
+    configurators = [TableInfoConfigurator() for _ in corpus.tables]
+    for configurator, table in zip(configurators, corpus.tables):
+        configurator.configure(TableInfo(**table))
+    return lambda: [configurator.show_table(show_index=True) for configurator in configurators], len(configurators)
+
+
+def _command(corpus: Corpus, *args: str) -> Callable[[], None]:
+    def invoke():
+        run_module.run.main(["-n", corpus.namespace, "-o", corpus.directory, *args], standalone_mode=False)
+    return invoke
+
+
+@case("load_tables")
+def _load_tables(corpus: Corpus):
+    return _command(corpus, "load-tables", "-p", corpus.directory), len(corpus.tables)
+
+
+@case("load_ds_info")
+def _load_ds_info(corpus: Corpus):
+    return _command(corpus, "load-ds-info", "-p", corpus.directory), len(corpus.data_sources)
+
+
+@case("export")
+def _export(corpus: Corpus):
+    directory = os.path.join(corpus.directory, "export")
+    os.makedirs(directory, exist_ok=True)
+    docs = [
+        (f"{directory}/{corpus.namespace}-tableinfo-{table['table_name']}-config.json", dump_doc(table))
+        for table in corpus.tables
+    ]
+    return lambda: [run_module._export(path, data) for path, data in docs], len(docs)
+
+
+@case("logger_handler")
+def _logger_handler(corpus: Corpus):
+    directory = os.path.join(corpus.directory, "logs")
+    os.makedirs(directory, exist_ok=True)
+
+    def log():
+        logger = Logger("BENCH", directory, default_theme)
+        for i in range(LOG_RECORDS):
+            logger.info(f"Record {i} of the benchmark")
+        for handler in list(logger.handlers):
+            handler.close()
+            logger.removeHandler(handler)
+        os.remove(os.path.join(directory, "logs-out.log"))
+    return log, LOG_RECORDS
+
+
+def _reset():
+    """
+    Start every run cold: no docs, name index or interned field is reused from the previous one
+    """
+    run_module._docs.clear()
+    run_module._name_indexes.clear()
+    field_pool.clear()
+
+
+def measure(name: str, corpus: Corpus, repeat: int) -> Result:
+    func, items = CASES[name](corpus)
+    timings = []
+    for _ in range(repeat):
+        _reset()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return Result(name, items, min(timings), statistics.median(timings))
+
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+@click.group(help="Benchmarks of the hot paths on a synthetic namespace")
+def suite():
+    pass
+
+
+@suite.command("run", help="Time every case and store the results as a JSON baseline")
+@click.option("--tables", "n_tables", default=1000, help="Number of tables")
+@click.option("--fields", "n_fields", default=12, help="Number of fields per table")
+@click.option("--data-sources", "n_data_sources", default=50, help="Number of data sources")
+@click.option("--seed", default=0)
+@click.option("--repeat", default=5, help="Runs per case, the best and the median are kept")
+@click.option("-k", "--case", "selected", multiple=True, type=click.Choice(list(CASES)), help="Cases to run, all by default")
+@click.option("-o", "--output", help="Baseline file", default=DEFAULT_BASELINE)
+def run_suite(n_tables: int, n_fields: int, n_data_sources: int, seed: int, repeat: int, selected: tuple, output: str):
+    results = []
+    with tempfile.TemporaryDirectory() as directory, open(os.devnull, "w") as devnull:
+        tables = generate_tables(n_tables, n_fields, seed)
+        data_sources = generate_data_sources(n_data_sources, seed)
+        write_namespace(directory, "bench", tables=tables, n_data_sources=n_data_sources, seed=seed)
+        corpus = Corpus(tables, data_sources, directory, "bench")
+        # the commands print every table, only their time matters
+        with contextlib.redirect_stdout(devnull):
+            run_module.set_logger("BENCH", directory, default_theme)
+            run_module.set_theme(default_theme)
+            run_module.logger.setLevel(logging.WARNING)
+            for name in selected or CASES:
+                results.append(measure(name, corpus, repeat))
+                print(f"{name}: {results[-1].median * 1000:.2f} ms", file=sys.stderr)
+    baseline = {
+        "meta": {
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "tables": n_tables, "fields": n_fields, "data_sources": n_data_sources, "seed": seed, "repeat": repeat,
+        },
+        "results": {result.name: result._asdict() for result in results},
+    }
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(baseline, f, indent=2)
+    rows = [[r.name, r.items, round(r.best * 1000, 2), round(r.median * 1000, 2), round(r.median / r.items * 1e6, 2)]
+            for r in results]
+    click.echo(tabulate(rows, headers=["case", "items", "best ms", "median ms", "us/item"], tablefmt="rounded_grid"))
+    click.echo(f"Baseline written to {output}")
+
+
+@suite.command("compare", help="Compare two baselines, exit with 1 when a case is slower than the threshold")
+@click.argument("baseline")
+@click.argument("current")
+@click.option("--threshold", type=click.FloatRange(min=0), default=DEFAULT_THRESHOLD,
+              help="Allowed slowdown of the median, 0.1 is 10%")
+def compare(baseline: str, current: str, threshold: float):
+    old, new = _load(baseline), _load(current)
+    corpus_keys = ("tables", "fields", "data_sources", "seed")
+    if any(old["meta"].get(key) != new["meta"].get(key) for key in corpus_keys):
+        click.echo("Warning: the baselines were measured on different corpora", err=True)
+    rows = []
+    regressions = []
+    for name, result in new["results"].items():
+        before = old["results"].get(name)
+        if before is None:
+            rows.append([name, "-", round(result["median"] * 1000, 2), "-", "new"])
+            continue
+        change = result["median"] / before["median"] - 1
+        status = "regression" if change > threshold else "faster" if change < -threshold else "ok"
+        if status == "regression":
+            regressions.append(name)
+        rows.append([name, round(before["median"] * 1000, 2), round(result["median"] * 1000, 2),
+                     f"{change * 100:+.1f}%", status])
+    click.echo(tabulate(rows, headers=["case", "baseline ms", "current ms", "change", "status"], tablefmt="rounded_grid"))
+    if regressions:
+        click.echo(f"{len(regressions)} regressions over {threshold * 100:.0f}%: {', '.join(regressions)}", err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    suite()
@@ -1,16 +1,25 @@
 import os
 import sys
 
-from click import MissingParameter, Context
-
 sys.path.append(os.getcwd())
 
-from src.configurator.run import run, set_logger, set_theme
+from src.configurator import completion
 from src.helpers.pretty_str import default_theme
 
 theme = default_theme
 
 if __name__ == '__main__':
+    # completion and cached help are answered before the CLI and its dependencies are imported
+    prog_name = os.path.basename(sys.argv[0])
+    instruction = os.environ.get(completion.complete_var(prog_name))
+    if instruction:
+        sys.exit(completion.complete(prog_name, instruction))
+    help_text = completion.cached_help(prog_name, sys.argv[1:], completion.theme_key(theme))
+    if help_text is not None:
+        completion.echo(help_text)
+        sys.exit(0)
+
+    from src.configurator.run import run, set_logger, set_theme
     set_logger(name="DDOCS", theme=theme, output="./logs")
     set_theme(theme)
     run(obj={})
@@ -0,0 +1,398 @@
+import json
+import os
+import re
+import shlex
+import shutil
+import sys
+from typing import NamedTuple, Optional
+
+from src.helpers.lock import LockTimeout, file_lock
+
+# Answers shell completion and cached --help without importing run.py: no questionary, pydantic or
+# prompt_toolkit here, click itself is only imported to build the spec and the completion scripts.
+
+SPEC_VERSION = 1
+CACHE_ENV = "DDOCS_CACHE"
+SHELLS = ("bash", "zsh", "fish")
+# seconds a run waits for another one storing a help text, the help is not cached past it
+HELP_LOCK_TIMEOUT = 2.0
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RUN_MODULE = os.path.join(SRC_DIR, "configurator", "run.py")
+# modules declaring the choices of run.py options: DIALECTS, FORMATS, SITE_FORMATS and METRICS_FORMATS
+CHOICE_MODULES = tuple(
+    os.path.join(SRC_DIR, *module)
+    for module in (("model", "ddl.py"), ("data", "generator.py"), ("view", "site.py"), ("helpers", "metrics.py"))
+)
+
+KIND_CHOICE = "choice"
+KIND_FILE = "file"
+KIND_DIR = "dir"
+KIND_TABLE = "table"
+
+_ANSI = re.compile(r"\033\[[;?0-9]*[a-zA-Z]")
+
+GROUP_OUTPUT = ("-o", "--output")
+GROUP_NAMESPACE = ("-n", "--namespace")
+
+
+class CompletionItem(NamedTuple):
+    value: str
+    type: str = "plain"
+    help: Optional[str] = None
+
+
+def cache_dir() -> str:
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.environ.get(CACHE_ENV) or os.path.join(cache_home, "ddocs")
+
+
+def spec_path() -> str:
+    return os.path.join(cache_dir(), "completion-spec.json")
+
+
+def help_path() -> str:
+    return os.path.join(cache_dir(), "help.json")
+
+
+def source_stamp() -> list[int]:
+    """
+    Commands, options and help texts are declared in run.py and the option choices in a few modules,
+    the cached ones are dropped when one of them changes
+    """
+    return [os.stat(path).st_mtime_ns for path in (RUN_MODULE, *CHOICE_MODULES)]
+
+
+def complete_var(prog_name: str) -> str:
+    # the name click gives to the completion instruction variable
+    return f"_{prog_name}_COMPLETE".replace("-", "_").replace(".", "_").upper()
+
+
+def _read_json(path: str) -> Optional[dict]:
+    try:
+        with open(path, "r") as file:
+            data = json.load(file)
+    except (OSError, ValueError):
+        return None
+    if data.get("version") != SPEC_VERSION or data.get("stamp") != source_stamp():
+        return None
+    return data
+
+
+def _write_json(path: str, data: dict):
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(data, file)
+        os.replace(tmp_path, path)
+    except OSError:
+        # a read-only cache only costs speed
+        pass
+
+
+def value_kind(param) -> Optional[str]:
+    """
+    What the value of an option or argument completes to
+    """
+    import click
+    if getattr(param, "is_flag", False):
+        return None
+    if isinstance(param.type, click.Choice):
+        return KIND_CHOICE
+    if isinstance(param.type, click.Path) and param.type.dir_okay and not param.type.file_okay:
+        return KIND_DIR
+    name = param.name or ""
+    if isinstance(param.type, (click.Path, click.File)) or "path" in name or "file" in name or "dir" in name:
+        return KIND_FILE
+    if "table" in name:
+        return KIND_TABLE
+    return None
+
+
+def _param_spec(param) -> dict:
+    import click
+    return {
+        "opts": [*param.opts, *param.secondary_opts],
+        "flag": bool(getattr(param, "is_flag", False) or getattr(param, "count", False)),
+        "help": getattr(param, "help", None) or "",
+        "kind": value_kind(param),
+        "choices": list(param.type.choices) if isinstance(param.type, click.Choice) else [],
+        "default": param.default if isinstance(param.default, str) else None,
+    }
+
+
+def build_spec(group, ctx, name_index_file: str, table_file_pattern: str) -> dict:
+    """
+    Commands of the group with their options and arguments, enough to complete a command line
+    """
+    import click
+
+    def params(command) -> tuple[list, list]:
+        options = [_param_spec(p) for p in command.get_params(ctx) if isinstance(p, click.Option)]
+        arguments = [_param_spec(p) for p in command.params if isinstance(p, click.Argument)]
+        return options, arguments
+
+    group_options, _ = params(group)
+    commands = {}
+    for name in group.list_commands(ctx):
+        command = group.get_command(ctx, name)
+        options, arguments = params(command)
+        commands[name] = {"help": command.get_short_help_str(), "options": options, "arguments": arguments}
+    return {
+        "version": SPEC_VERSION,
+        "stamp": source_stamp(),
+        "name_index_file": name_index_file,
+        "table_file_pattern": table_file_pattern,
+        "options": group_options,
+        "commands": commands,
+    }
+
+
+def write_spec(spec: dict):
+    _write_json(spec_path(), spec)
+
+
+def has_spec() -> bool:
+    return _read_json(spec_path()) is not None
+
+
+def load_spec() -> dict:
+    spec = _read_json(spec_path())
+    if spec is None:
+        # first completion after an install or a change of run.py
+        from src.configurator.run import completion_spec
+        spec = completion_spec()
+        write_spec(spec)
+    return spec
+
+
+class ParsedLine(NamedTuple):
+    command: Optional[str]
+    # option still waiting for its value
+    pending: Optional[dict]
+    values: dict[str, str]
+    n_arguments: int
+    help: bool
+
+
+def _find_option(options: list[dict], opt: str) -> Optional[dict]:
+    for option in options:
+        if opt in option["opts"]:
+            return option
+    return None
+
+
+def parse_line(spec: dict, args: list[str]) -> ParsedLine:
+    command = None
+    pending = None
+    values = {}
+    n_arguments = 0
+    is_help = False
+    for arg in args:
+        if pending is not None:
+            values[pending["opts"][0]] = arg
+            pending = None
+            continue
+        options = spec["options"] if command is None else spec["commands"][command]["options"]
+        if arg.startswith("-") and arg != "-":
+            opt, _, value = arg.partition("=")
+            if opt == "--help":
+                is_help = True
+            option = _find_option(options, opt)
+            if option is not None and not option["flag"]:
+                if value:
+                    values[option["opts"][0]] = value
+                else:
+                    pending = option
+        elif command is None and arg in spec["commands"]:
+            command = arg
+        else:
+            n_arguments += 1
+    return ParsedLine(command, pending, values, n_arguments, is_help)
+
+
+def _group_value(values: dict, opts: tuple[str, ...], default: str) -> str:
+    for opt in opts:
+        if opt in values:
+            return values[opt]
+    return default
+
+
+def table_names(spec: dict, output: str, namespace: Optional[str]) -> list[str]:
+    """
+    Table names of the exported per-table files and of the name index, no document is parsed
+    """
+    names = {}
+    # per-table exports are named {namespace}-tableinfo-{table}-config.json
+    per_table = re.compile(rf"^{re.escape(namespace or '')}-tableinfo-(.+)-config\.json$")
+    try:
+        with os.scandir(output) as entries:
+            for entry in entries:
+                match = per_table.match(entry.name)
+                if match and re.match(spec["table_file_pattern"], entry.name):
+                    names[match.group(1)] = None
+    except OSError:
+        return []
+    try:
+        with open(os.path.join(output, spec["name_index_file"]), "r") as file:
+            index = json.load(file)
+        for postings in index.get("files", {}).values():
+            names.update((posting[1], None) for posting in postings if posting[0] == KIND_TABLE)
+    except (OSError, ValueError):
+        pass
+    return sorted(names)
+
+
+def _values(spec: dict, option: dict, parsed: ParsedLine, incomplete: str) -> list[CompletionItem]:
+    kind = option["kind"]
+    if kind == KIND_CHOICE:
+        return [CompletionItem(c) for c in option["choices"] if c.startswith(incomplete)]
+    if kind in (KIND_FILE, KIND_DIR):
+        # the shell completes paths itself
+        return [CompletionItem(incomplete, type=kind)]
+    if kind == KIND_TABLE:
+        output = _group_value(parsed.values, GROUP_OUTPUT, _default(spec, GROUP_OUTPUT))
+        namespace = _group_value(parsed.values, GROUP_NAMESPACE, _default(spec, GROUP_NAMESPACE))
+        return [CompletionItem(n) for n in table_names(spec, output, namespace) if n.startswith(incomplete)]
+    return []
+
+
+def _default(spec: dict, opts: tuple[str, ...]) -> Optional[str]:
+    option = _find_option(spec["options"], opts[-1])
+    return option.get("default") if option else None
+
+
+def completions(spec: dict, args: list[str], incomplete: str) -> list[CompletionItem]:
+    parsed = parse_line(spec, args)
+    if parsed.pending is not None:
+        return _values(spec, parsed.pending, parsed, incomplete)
+    command = spec["commands"].get(parsed.command) if parsed.command else None
+    if incomplete.startswith("-"):
+        options = command["options"] if command else spec["options"]
+        return [
+            CompletionItem(opt, help=option["help"] or None)
+            for option in options for opt in option["opts"] if opt.startswith(incomplete)
+        ]
+    if command is None:
+        return [CompletionItem(name, help=c["help"] or None)
+                for name, c in spec["commands"].items() if name.startswith(incomplete)]
+    arguments = command["arguments"]
+    if parsed.n_arguments < len(arguments):
+        return _values(spec, arguments[parsed.n_arguments], parsed, incomplete)
+    return []
+
+
+def _split(text: str) -> list[str]:
+    # as click does: an unclosed quote ends the last word
+    lexer = shlex.shlex(text, posix=True)
+    lexer.whitespace_split = True
+    lexer.commenters = ""
+    words = []
+    try:
+        for token in lexer:
+            words.append(token)
+    except ValueError:
+        words.append(lexer.token)
+    return words
+
+
+def _completion_args(shell: str) -> tuple[list[str], str]:
+    words = _split(os.environ.get("COMP_WORDS", ""))
+    if shell == "fish":
+        incomplete = os.environ.get("COMP_CWORD", "")
+        args = words[1:]
+        if incomplete and args and args[-1] == incomplete:
+            args.pop()
+        return args, incomplete
+    cword = int(os.environ.get("COMP_CWORD", len(words)))
+    return words[1:cword], words[cword] if cword < len(words) else ""
+
+
+def _format(shell: str, item: CompletionItem) -> str:
+    # the lines read by the click completion scripts
+    if shell == "zsh":
+        return f"{item.type}\n{item.value}\n{item.help if item.help else '_'}"
+    if shell == "fish" and item.help:
+        return f"{item.type},{item.value}\t{item.help}"
+    return f"{item.type},{item.value}"
+
+
+def source(shell: str, prog_name: str) -> str:
+    """
+    Completion script of a shell, it calls back `prog_name` with the completion variable set
+    """
+    from click.shell_completion import get_completion_class
+    return get_completion_class(shell)(None, {}, prog_name, complete_var(prog_name)).source()
+
+
+def complete(prog_name: str, instruction: str) -> int:
+    """
+    Entry point of the completion scripts, `instruction` is `{shell}_source` or `{shell}_complete`
+    """
+    shell, _, action = instruction.partition("_")
+    if shell not in SHELLS:
+        return 1
+    if action == "source":
+        print(source(shell, prog_name))
+        return 0
+    spec = load_spec()
+    args, incomplete = _completion_args(shell)
+    print("\n".join(_format(shell, item) for item in completions(spec, args, incomplete)))
+    return 0
+
+
+def help_width() -> int:
+    # the width click's HelpFormatter takes when neither the width nor the max width is set
+    return max(min(shutil.get_terminal_size().columns, 80) - 2, 50)
+
+
+def theme_key(theme) -> str:
+    # the escape sequences the help is colored with
+    return theme.h1("") + theme.normal("")
+
+
+def help_key(command_path: str, width: int, theme_key: str) -> str:
+    return f"{command_path}\x00{width}\x00{theme_key}"
+
+
+def read_help(key: str) -> Optional[str]:
+    data = _read_json(help_path())
+    return data["help"].get(key) if data else None
+
+
+def store_help(key: str, text: str):
+    """
+    Add a help text to the cache. The file is read and rewritten under a lock,
+    so runs storing different help texts at once keep each other's entries.
+    """
+    path = help_path()
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with file_lock(f"{path}.lock", timeout=HELP_LOCK_TIMEOUT):
+            data = _read_json(path) or {"version": SPEC_VERSION, "stamp": source_stamp(), "help": {}}
+            data["help"][key] = text
+            _write_json(path, data)
+    except (OSError, LockTimeout):
+        # a read-only or busy cache only costs speed
+        pass
+
+
+def cached_help(prog_name: str, args: list[str], theme_key: str) -> Optional[str]:
+    """
+    Help text rendered by an earlier run for this command line, None when it has to be rendered
+    """
+    if "--help" not in args:
+        return None
+    spec = _read_json(spec_path())
+    if spec is None:
+        return None
+    parsed = parse_line(spec, args)
+    if not parsed.help:
+        return None
+    command_path = f"{prog_name} {parsed.command}" if parsed.command else prog_name
+    return read_help(help_key(command_path, help_width(), theme_key))
+
+
+def echo(text: str):
+    # as click.echo: no colors when the output is not a terminal
+    print(text if sys.stdout.isatty() else _ANSI.sub("", text))
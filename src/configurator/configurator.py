@@ -6,7 +6,10 @@ from typing import Any
 from pydantic_core import PydanticUndefined
 from tabulate import tabulate
 
-from src.model.meta import DataSourceInfo, TableInfo, FieldInfo, Choices, FIELD_TYPES
+from src.helpers.profiler import span
+from src.model.intern import field_pool
+from src.model.meta import DataSourceInfo, TableInfo, FieldInfo, ForeignKeyInfo, Choices, FIELD_TYPES
+from src.model.storage import RE_DATA_SOURCE_INFO, RE_TABLE_INFO
 from src.view.TableView import TableView
 from multipledispatch import dispatch
 
@@ -15,9 +18,6 @@ from src.view.abstract import index_start_with_one
 NOT_SET = object()
 
 
-RE_DATA_SOURCE_INFO = r"^.*-datasourceinfo-.*(.json)$"
-RE_TABLE_INFO = r"^.*-tableinfo-.*(.json)$"
-
 DATA_SOURCE_INFO_LABEL = "datasourceinfo"
 TABLE_INFO_LABEL = "tableinfo"
 
@@ -121,9 +121,16 @@ class DatasourceInfoConfigurator(Configurator):
         self.data = self._obj.model_dump()
         return self._obj
 
+    @dispatch(DataSourceInfo)
+    def configure(self, datasource_info: DataSourceInfo):
+        with span("model dump"):
+            data = datasource_info.model_dump()
+        return self.configure(data)
+
     @dispatch(dict)
     def configure(self, datasource_info: dict):
-        self._obj = self.model(**datasource_info)
+        with span("validate"):
+            self._obj = self.model(**datasource_info)
         self.data = datasource_info
         self.ds_name = self._obj.ds_name
         self.ds_type = self._obj.ds_type
@@ -183,19 +190,34 @@ class TableInfoConfigurator(Configurator):
     def __init__(self, table_name=NOT_SET, table_fields=NOT_SET):
         self.table_name = table_name
         self.table_fields = table_fields
+        self._foreign_keys = None
 
     @dispatch()
     def configure(self) -> 'BaseModel':
-        self._obj = self.model(table_name=self.table_name, table_fields=self.table_fields)
+        self._obj = self.model(
+            table_name=self.table_name, table_fields=self.table_fields, table_foreign_keys=self._foreign_keys
+        )
         self.data = self._obj.model_dump()
         return self._obj
 
+    @dispatch(TableInfo)
+    def configure(self, table_info: TableInfo) -> 'BaseModel':
+        self._obj = table_info
+        with span("model dump"):
+            self.data = table_info.model_dump()
+        self.table_name = table_info.table_name
+        self.table_fields = table_info.table_fields
+        self._foreign_keys = table_info.table_foreign_keys
+        return self._obj
+
     @dispatch(dict)
     def configure(self, table_info: dict) -> 'BaseModel':
-        self._obj = self.model(**table_info)
+        with span("validate"):
+            self._obj = field_pool.table(table_info)
         self.data = table_info
         self.table_name = self._obj.table_name
         self.table_fields = self._obj.table_fields
+        self._foreign_keys = self._obj.table_foreign_keys
         return self._obj
 
     def set_table_name(self, name: str):
@@ -213,8 +235,15 @@ class TableInfoConfigurator(Configurator):
             self.table_fields = [field]
         return self
 
+    def add_foreign_key(self, foreign_key: ForeignKeyInfo):
+        if self._foreign_keys:
+            self._foreign_keys.append(foreign_key)
+        else:
+            self._foreign_keys = [foreign_key]
+        return self
+
     def validate(self, json_data: dict):
-        self.model(**json_data)
+        field_pool.table(json_data)
         return self
 
     def show_table(self, fmt="rounded_grid", show_index=False, show_details=True) -> str:
@@ -223,7 +252,14 @@ class TableInfoConfigurator(Configurator):
         :return: String only, so want to show it, use a function to print it
         """
         if self._obj:
-            view = TableView([*self.data.keys()], data=[[self.table_name, "|".join(map(lambda x: x.field_name, self._obj.table_fields))]])
+            headers = ["table_name", "table_fields"]
+            row = [self.table_name, "|".join(map(lambda x: x.field_name, self._obj.table_fields or []))]
+            if self._obj.table_foreign_keys:
+                headers.append("table_foreign_keys")
+                row.append("|".join(
+                    f"{fk.field_name}->{fk.fk_table_name}.{fk.fk_field_name}" for fk in self._obj.table_foreign_keys
+                ))
+            view = TableView(headers, data=[row])
             table_view = view.render(fmt=fmt, show_index=False)
             if (fields_data := self.data.get("table_fields")) and show_details:
                 field_view = TableView("keys", fields_data)
@@ -1,8 +1,10 @@
 import json
+import os
 import re
+import shlex
 import sys
 from functools import wraps
-from typing import Sequence, Tuple, List, Optional, Mapping, Any
+from typing import Sequence, Tuple, List, Optional, Mapping, Any, NamedTuple
 
 import click
 import questionary
@@ -10,22 +12,64 @@ from click import HelpFormatter, Abort
 from click_help_colors import HelpColorsGroup, HelpColorsCommand
 from pydantic import ValidationError
 from pydantic_core import PydanticUndefined
+from prompt_toolkit import PromptSession
+from prompt_toolkit.completion import Completer, Completion, PathCompleter
+from prompt_toolkit.document import Document
+from prompt_toolkit.history import FileHistory
 from questionary import Style, Choice, Question
 from questionary.constants import DEFAULT_KBI_MESSAGE
 
+from src.configurator import completion as shell_completion
 from src.configurator.configurator import (
     DatasourceInfoConfigurator,
     TableInfoConfigurator,
-    FieldInfoConfigurator, RE_DATA_SOURCE_INFO, RE_TABLE_INFO,
+    FieldInfoConfigurator, RE_TABLE_INFO,
 )
-from src.helpers.files import is_file, ls_all_files_in_directory
+from src.data.generator import (
+    DEFAULT_CHUNK_SIZE, DEFAULT_NULL_RATIO, FORMATS, TableDataGenerator, references_of, sequence_start,
+    write_data,
+)
+from src.data.sequence import SequenceAllocator
+from src.data.unique import DEFAULT_MEMORY_LIMIT
+from src.helpers.metrics import METRICS_FORMATS, metrics
+from src.helpers.profiler import profiler, span
+from src.helpers.watch import DEFAULT_DEBOUNCE, watch
+from src.data.validator import DEFAULT_BLOCK_SIZE, DEFAULT_MAX_VIOLATIONS, Violation, validate_file
 from src.logger.log import Logger
-from src.model.meta import TableInfo
+from src.model.ddl import DIALECTS, write_ddl
+from src.model.codegen import module_name, write_package
+from src.model.compaction import compact_directory, list_namespaces
+from src.model.diff import diff_docs
+from src.model.docs import FileDocs, data_source_files, docs_to_snapshot, load_docs, table_files
+from src.model.intern import dump_shared_tables
+from src.model.locking import consistent_read, file_writer
+from src.model.index import NAME_INDEX_FILE, NameIndex, KIND_TABLE, KIND_FIELD, KIND_ALIAS
+from src.model.graph import DanglingReference, ForeignKeyGraph
+from src.model.meta import SCHEMA_VERSION, DataSourceInfo, DatasourceDocs, ForeignKeyInfo, TableInfo
+from src.model.migration import (
+    STATUS_CURRENT, STATUS_FAILED, STATUS_MIGRATED, UNVERSIONED, doc_files, migrate_files
+)
+from src.model.snapshot import SNAPSHOT_EXTENSION
+from src.model.storage import dump_doc, snapshot_sources
+from src.server.client import DaemonClient, DaemonError
+from src.server.daemon import KIND_DATA_SOURCES, KIND_TABLES, DocsDaemon, data_source_view, table_view
 from src.view.TableView import TableView
+from src.view.site import FORMAT_HTML, SITE_FORMATS, build_site as render_site
 
 logger: 'Logger'
 theme: 'Theme'
 custom_style_fancy: 'Style'
+_name_indexes: dict[str, 'NameIndex'] = {}
+_docs: dict[tuple[str, Optional[str]], 'DatasourceDocs'] = {}
+# (kind, name) -> (document, (title, view)), a view is rendered again only when its document was replaced
+_views: dict[tuple[str, str], tuple[Any, tuple[str, str]]] = {}
+# help key (command path, width, theme) -> rendered help
+_help: dict[str, str] = {}
+
+_cache_requests = metrics.counter("cache_requests_total", "Lookups of the in-process caches, by cache and result")
+_bytes_written = metrics.counter("export_bytes_written_total", "Bytes written by exports")
+_validation_failures = metrics.counter("validation_failures_total", "Rejected values, by model field")
+_render_seconds = metrics.histogram("render_seconds", "Time to render and print one table view, by kind")
 
 
 class CustomQuestion(Question):
@@ -78,6 +122,63 @@ def theme_to_questionary_style(theme: 'Theme') -> 'Style':
     ])
 
 
+def get_docs(path: str, namespace: Optional[str] = None) -> 'DatasourceDocs':
+    """
+    Docs loaded once per (path, namespace) and shared by the load-* and configure-* commands
+    """
+    key = (os.path.normpath(path), namespace)
+    if key not in _docs:
+        _cache_requests.inc(cache="docs", result="miss")
+        if os.path.exists(path):
+            # not torn by a writer of the namespace running meanwhile
+            directory = path if os.path.isdir(path) else os.path.dirname(path) or "."
+            _docs[key] = consistent_read(directory, namespace, lambda: load_docs(path, namespace))
+        else:
+            _docs[key] = DatasourceDocs(namespace=namespace)
+    else:
+        _cache_requests.inc(cache="docs", result="hit")
+    return _docs[key]
+
+
+def _namespace_docs(ctx) -> 'DatasourceDocs':
+    return get_docs(ctx.obj["output"], ctx.obj["namespace"])
+
+
+def get_name_index(directory: str) -> 'NameIndex':
+    directory = os.path.normpath(directory)
+    if directory not in _name_indexes:
+        _cache_requests.inc(cache="name_index", result="miss")
+        _name_indexes[directory] = NameIndex.load(directory)
+    else:
+        _cache_requests.inc(cache="name_index", result="hit")
+    return _name_indexes[directory]
+
+
+class NameIndexCompleter(Completer):
+
+    def __init__(self, index: 'NameIndex', kind: Optional[str] = None):
+        self.index = index
+        self.kind = kind
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor.strip()
+        if not text:
+            return
+        for name in self.index.complete(text, kind=self.kind):
+            yield Completion(name, start_position=-len(document.text_before_cursor))
+
+
+_COMPLETED_FIELDS = {"field_name": KIND_FIELD, "field_alias": KIND_ALIAS}
+
+
+def _name_completer(kind: str) -> Optional['NameIndexCompleter']:
+    ctx = click.get_current_context(silent=True)
+    if not ctx or not ctx.obj or "output" not in ctx.obj or not os.path.isdir(ctx.obj["output"]):
+        return None
+    index = get_name_index(ctx.obj["output"])
+    return NameIndexCompleter(index, kind) if index.files else None
+
+
 def context_path(relative=""):
 
     def decorator(func):
@@ -168,16 +269,33 @@ class ColorFormatter(HelpFormatter):
         super().write_dl(colorized_rows, col_max, col_spacing)
 
 
+def _render_help(command: click.Command, ctx: click.Context) -> str:
+    """
+    Help colored once per (command, width, theme), also stored for the help served without importing run.py
+    """
+    formatter = ColorFormatter(
+        theme=theme, width=ctx.terminal_width, max_width=ctx.max_content_width
+    )
+    key = shell_completion.help_key(ctx.command_path, formatter.width, shell_completion.theme_key(theme))
+    if key in _help:
+        _cache_requests.inc(cache="help", result="hit")
+        return _help[key]
+    _cache_requests.inc(cache="help", result="miss")
+    command.format_help(ctx, formatter)
+    _help[key] = formatter.getvalue().rstrip("\n")
+    shell_completion.store_help(key, _help[key])
+    if not shell_completion.has_spec():
+        # the cached help is looked up by parsing the command line with the spec
+        shell_completion.write_spec(completion_spec())
+    return _help[key]
+
+
 class GroupColor(HelpColorsGroup):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
     def get_help(self, ctx: click.Context) -> str:
-        formatter = ColorFormatter(
-            theme=theme, width=ctx.terminal_width, max_width=ctx.max_content_width
-        )
-        self.format_help(ctx, formatter)
-        return formatter.getvalue().rstrip("\n")
+        return _render_help(self, ctx)
 
     @handle_error
     def __call__(self, *args, **kwargs):
@@ -191,11 +309,7 @@ class CommandColor(HelpColorsCommand):
         super().__init__()
 
     def get_help(self, ctx: click.Context) -> str:
-        formatter = ColorFormatter(
-            theme=theme, width=ctx.terminal_width, max_width=ctx.max_content_width
-        )
-        self.format_help(ctx, formatter)
-        return formatter.getvalue().rstrip("\n")
+        return _render_help(self, ctx)
 
     @handle_error
     def __call__(self, *args, **kwargs):
@@ -218,14 +332,60 @@ class CommandColor(HelpColorsCommand):
     required=True,
     default="./docs-out",
 )
+@click.option(
+    "--compact",
+    is_flag=True,
+    default=False,
+    help="Export docs without null and default values",
+)
+@click.option("--profile", is_flag=True, default=False, help="Print the time spent per phase at exit")
+@click.option("--profile-stats", help="Also dump cProfile statistics to this file", default=None)
+@click.option("--profile-trace", help="Also dump a Chrome trace-event JSON to this file", default=None)
+@click.option("--metrics-file", help="Dump the metrics to this file at exit, - for stderr", default=None)
+@click.option("--daemon/--no-daemon", default=True, help="Send load and search requests to the running daemon, if any")
+@click.option("--socket", "socket_path", help="Socket of the daemon", default=None)
+@click.option("--metrics-format", type=click.Choice(METRICS_FORMATS), help="Metrics dump format",
+              default=METRICS_FORMATS[0])
 @click.help_option("--help", help="Show command guide")
 @click.pass_context
 @handle_error
 @context_path(relative="Datasource docs")
-def run(ctx, namespace, output):
+def run(ctx, namespace, output, compact, profile, profile_stats, profile_trace, metrics_file, metrics_format, daemon,
+        socket_path):
     ctx.ensure_object(dict)
     ctx.obj["namespace"] = namespace
     ctx.obj["output"] = output
+    ctx.obj["compact"] = compact
+    ctx.obj["daemon"] = daemon
+    ctx.obj["socket"] = socket_path
+    if profile or profile_stats or profile_trace:
+        profiler.start(trace=bool(profile_trace), cprofile=bool(profile_stats))
+        ctx.call_on_close(lambda: _profile_report(profile_stats, profile_trace))
+    if metrics_file:
+        ctx.call_on_close(lambda: _dump_metrics(metrics_file, metrics_format))
+
+
+def _dump_metrics(metrics_file: str, metrics_format: str):
+    data = metrics.dump(metrics_format)
+    if metrics_file == "-":
+        click.echo(data, err=True, nl=False)
+        return
+    with open(metrics_file, "w") as f:
+        f.write(data)
+    logger.info(f"Metrics written to {metrics_file}")
+
+
+def _profile_report(profile_stats: Optional[str], profile_trace: Optional[str]):
+    elapsed = profiler.stop()
+    view = TableView(["phase", "calls", "total ms", "self ms", "%"], data=profiler.breakdown())
+    click.echo(theme.h2(f"Profile: {elapsed * 1000:.2f} ms"), err=True)
+    click.echo(view.render(), err=True)
+    if profile_stats:
+        profiler.dump_stats(profile_stats)
+        logger.info(f"cProfile statistics written to {profile_stats}")
+    if profile_trace:
+        profiler.dump_trace(profile_trace)
+        logger.info(f"Trace events written to {profile_trace}")
 
 
 DATA_SOURCE_INFO_ARGS_MAPPING = {
@@ -262,15 +422,17 @@ def configure_ds(
     while True:
         try:
             data_source_info = data_source_info_configurator.configure()
+            _namespace_docs(ctx).add_data_source(data_source_info)
             logger.info("Export data source info . . .")
             _export(
                 f"{ctx.obj['output']}/{ctx.obj['namespace']}-datasourceinfo-{data_source_name}-config.json",
-                data_source_info.model_dump_json(indent=2),
+                dump_doc(data_source_info, compact=ctx.obj.get("compact", False)),
             )
             return
         except (ValidationError, ValueError) as e:
             for err in e.errors():
                 field_name = err["loc"][0]
+                _validation_failures.inc(field=field_name)
                 format_name = DATA_SOURCE_INFO_ARGS_MAPPING[field_name].replace(
                     "_", " "
                 ).capitalize()
@@ -287,6 +449,9 @@ def configure_table(ctx, table_name, export=True) -> "TableInfo":
     """
     # try:
     ctx.ensure_object(dict)
+    docs = _namespace_docs(ctx)
+    if docs.get_table(table_name.strip()):
+        logger.warning(f"Table {table_name} is already documented, it will be replaced")
     table_info_configurator = TableInfoConfigurator()
     table_info_configurator.set_table_name(table_name.strip())
     table_info_configurator.set_table_name(table_name)
@@ -301,6 +466,7 @@ def configure_table(ctx, table_name, export=True) -> "TableInfo":
         except (ValidationError, ValueError) as e:
             for err in e.errors():
                 field_name = err["loc"][0]
+                _validation_failures.inc(field=field_name)
                 format_name = field_name.replace("_", " ").capitalize()
                 _process_field_error(table_info_configurator, err, field_name, format_name)
 
@@ -308,13 +474,14 @@ def configure_table(ctx, table_name, export=True) -> "TableInfo":
     configured_fields = _configure_fields(ctx, table_info_configurator)
     if configured_fields:
         logger.info(f"Table completely configured with fields: {', '.join(configured_fields)}")
+        _configure_foreign_keys(ctx, table_info_configurator, configured_fields)
     table_info = table_info_configurator.configure()
+    docs.add_table(table_info)
     if export:
         logger.info("Export table info . . .")
         _export(
             f"{ctx.obj['output']}/{ctx.obj['namespace']}-tableinfo-{table_name}-config.json",
-            table_info.model_dump_json(indent=2),
-            "w+",
+            dump_doc(table_info, compact=ctx.obj.get("compact", False)),
         )
     return table_info
     # except Exception as e:
@@ -348,6 +515,7 @@ def _configure_fields(ctx, table_configurator) -> list[str]:
         except (ValidationError, ValueError) as e:
             for err in e.errors():
                 field_name = err["loc"][0]
+                _validation_failures.inc(field=field_name)
                 format_name = field_name.replace("_", " ").capitalize()
                 _process_field_error(field_configurator, err, field_name, format_name)
 
@@ -356,6 +524,41 @@ def _configure_fields(ctx, table_configurator) -> list[str]:
     return configured_fields
 
 
+def _configure_foreign_keys(ctx, table_configurator, field_names: list[str]):
+    docs = _namespace_docs(ctx)
+    while CustomQuestion.instance(questionary.confirm(
+        "Do you want to add a foreign key?",
+        default=False,
+        style=custom_style_fancy
+    )).ask():
+        field_name = CustomQuestion.instance(questionary.select(
+            "Select field: ",
+            choices=field_names,
+            style=custom_style_fancy,
+        )).ask()
+        fk_table_name = CustomQuestion.instance(questionary.text(
+            "Enter referenced table name: ",
+            style=custom_style_fancy,
+            completer=_name_completer(KIND_TABLE),
+        )).ask().strip()
+        fk_field_name = CustomQuestion.instance(questionary.text(
+            "Enter referenced field name: ",
+            style=custom_style_fancy,
+            completer=_name_completer(KIND_FIELD),
+        )).ask().strip()
+        try:
+            foreign_key = ForeignKeyInfo(field_name=field_name, fk_table_name=fk_table_name, fk_field_name=fk_field_name)
+        except ValidationError as e:
+            for err in e.errors():
+                _validation_failures.inc(field=err["loc"][0])
+                logger.error(f"{err['loc'][0]}, {err['msg']}")
+            continue
+        is_self_reference = fk_table_name == table_configurator.table_name and fk_field_name in field_names
+        if not is_self_reference and not docs.get_field(fk_table_name, fk_field_name):
+            logger.warning(f"{fk_table_name}.{fk_field_name} is not documented yet")
+        table_configurator.add_foreign_key(foreign_key)
+
+
 def _process_field_error(configurator: 'Configurator', err: dict, field_name: str, display_name: str = "") -> Any:
     choices = configurator.get_choices(field_name)
     logger.error(f"{display_name}, {err['msg'] if not choices else str(list(choices.keys()))}")
@@ -373,51 +576,108 @@ def _build_choices(choices: dict, default: str = None):
     return _choices, first_choice
 
 
-def _process_field(configurator: 'Configurator', field_name: str, display_name: str = "") -> Any:
-    field_types = configurator.get_types(field_name)
-    is_hidden = field_name in _HIDDEN_FIELDS
+class PromptSpec(NamedTuple):
+    """
+    Everything a field prompt needs except the prompt_toolkit Application, built once per model field
+    """
+    field_name: str
+    message: str
+    kind: str
+    instruction: str
+    choices: tuple = ()
+    default_choice: Optional[Choice] = None
+    placeholder: Optional[str] = None
+    completer_kind: Optional[str] = None
+
+
+PROMPT_SELECT = "select"
+PROMPT_PASSWORD = "password"
+PROMPT_TEXT = "text"
+
+# (configurator class, field name, display name) -> spec
+_prompt_specs: dict[tuple[type, str, str], PromptSpec] = {}
+# field type -> FieldInfo fields asked for it, in model order
+_field_plans: dict[Any, tuple[str, ...]] = {}
+
+
+def _compile_prompt(configurator_cls: type, field_name: str, display_name: str) -> PromptSpec:
+    field_types = configurator_cls.get_types(field_name)
     is_boolean = bool in field_types
     is_optional = type(None) in field_types
-    choices = configurator.get_choices(field_name) if not is_boolean else {"True": True, "False": False}
-    default_value = configurator.get_default(field_name)
-    instruction = configurator.get_hint(field_name)
+    # a copy, the choices of the model are shared
+    choices = dict(configurator_cls.get_choices(field_name)) if not is_boolean else {"True": True, "False": False}
+    default_value = configurator_cls.get_default(field_name)
+    message = f"Enter {display_name}: "
+    instruction = configurator_cls.get_hint(field_name)
     if choices:
         if is_optional:
             choices["NOT SET"] = PydanticUndefined
         choices, first_choice = _build_choices(choices, default=default_value)
+        return PromptSpec(field_name, message, PROMPT_SELECT, instruction, tuple(choices), first_choice)
+    if is_optional:
+        placeholder = f"By default, set: {default_value}" if default_value else None
+    else:
+        placeholder = ""
+    if field_name in _HIDDEN_FIELDS:
+        return PromptSpec(field_name, message, PROMPT_PASSWORD, instruction,
+                          placeholder=placeholder or "[Your input is hidden]")
+    completer_kind = _COMPLETED_FIELDS.get(field_name) if configurator_cls is FieldInfoConfigurator else None
+    return PromptSpec(field_name, message, PROMPT_TEXT, instruction, placeholder=placeholder,
+                      completer_kind=completer_kind)
+
+
+def _prompt_spec(configurator: 'Configurator', field_name: str, display_name: str) -> PromptSpec:
+    key = (type(configurator), field_name, display_name)
+    spec = _prompt_specs.get(key)
+    if spec is None:
+        spec = _prompt_specs[key] = _compile_prompt(type(configurator), field_name, display_name)
+    return spec
+
+
+def _field_plan(field_type: Any) -> tuple[str, ...]:
+    """
+    FieldInfo fields that apply to a field type, the others are set to None without prompting
+    """
+    plan = _field_plans.get(field_type)
+    if plan is None:
+        plan = _field_plans[field_type] = tuple(
+            name for name in FieldInfoConfigurator.model.model_fields if _should_be_asked(name, field_type)
+        )
+    return plan
+
+
+def _question(spec: PromptSpec) -> 'CustomQuestion':
+    if spec.kind == PROMPT_SELECT:
         question = questionary.select(
-            f"Enter {display_name}: ",
-            choices=choices,
+            spec.message,
+            choices=list(spec.choices),
+            style=custom_style_fancy,
+            instruction=spec.instruction,
+            default=spec.default_choice
+        )
+    elif spec.kind == PROMPT_PASSWORD:
+        question = questionary.password(
+            spec.message,
+            instruction=spec.instruction,
             style=custom_style_fancy,
-            instruction=instruction,
-            default=first_choice
+            placeholder=spec.placeholder
         )
     else:
-        if is_optional:
-            placeholder = f"By default, set: {default_value}" if default_value else None
-        else:
-            placeholder = ""
-        if is_hidden:
-            question = questionary.password(
-                f"Enter {display_name}: ",
-                instruction=instruction,
-                style=custom_style_fancy,
-                # default=default_value if default_value else __NULL,
-                placeholder=placeholder or "[Your input is hidden]"
-            )
-        else:
-            question = questionary.text(
-                f"Enter {display_name}: ",
-                instruction=instruction,
-                style=custom_style_fancy,
-                placeholder=placeholder,
-                # default=default_value if default_value else __NULL
-            )
-    question = CustomQuestion.instance(question)
+        question = questionary.text(
+            spec.message,
+            instruction=spec.instruction,
+            style=custom_style_fancy,
+            placeholder=spec.placeholder,
+            completer=_name_completer(spec.completer_kind) if spec.completer_kind else None,
+        )
+    return CustomQuestion.instance(question)
+
+
+def _process_field(configurator: 'Configurator', field_name: str, display_name: str = "") -> Any:
     if isinstance(configurator, FieldInfoConfigurator):
-        field_value = _process_field_info(configurator, field_name, question)
+        field_value = _process_field_info(configurator, field_name, display_name)
     else:
-        field_value = question.ask() or None
+        field_value = _question(_prompt_spec(configurator, field_name, display_name)).ask() or None
         print("FIELD VALUE", type(field_value), field_value)
 
     configurator.__getattribute__(f"set_{field_name}")(
@@ -426,10 +686,10 @@ def _process_field(configurator: 'Configurator', field_name: str, display_name:
     return field_value
 
 
-def _process_field_info(configurator: 'Configurator', field_name: str, question: questionary.Question) -> Any:
+def _process_field_info(configurator: 'Configurator', field_name: str, display_name: str) -> Any:
     field_type_value = configurator.__getattribute__("field_type")
-    if _should_be_asked(field_name, field_type_value):
-        field_value = question.ask()
+    if field_name in _field_plan(field_type_value):
+        field_value = _question(_prompt_spec(configurator, field_name, display_name)).ask()
     else:
         field_value = None
     return field_value
@@ -452,9 +712,10 @@ def _should_be_asked(field_name: str, field_type: str):
 
 
 @run.command("configure-tables", cls=CommandColor, help="Configure tables")
+@click.option("--shared-fields", is_flag=True, default=False, help="Store identical field definitions once")
 @click.pass_context
 @context_path(relative="Configure tables")
-def configure_tables(ctx):
+def configure_tables(ctx, shared_fields: bool):
     """
     Configure table
     """
@@ -470,9 +731,10 @@ def configure_tables(ctx):
                 "Enter table name",
                 style=custom_style_fancy,
                 instruction=TableInfoConfigurator().get_hint("table_name"),
+                completer=_name_completer(KIND_TABLE),
             )).ask()
             table_info = ctx.invoke(configure_table.callback, table_name=table_name, export=False)
-            tables.append(table_info.model_dump())
+            tables.append(table_info.model_dump(mode="json"))
             configured_tables.append(table_info.table_name)
             add_more = CustomQuestion.instance(questionary.confirm(
                 "Do you want to add more another table?"
@@ -482,46 +744,124 @@ def configure_tables(ctx):
             if not add_more:
                 break
         logger.info("Export tables info . . .")
+        compact = ctx.obj.get("compact", False)
         _export(
             f"{ctx.obj['output']}/{ctx.obj['namespace']}-tableinfo-config.json",
-            json.dumps(tables, indent=2),
+            dump_shared_tables(tables, compact=compact) if shared_fields else dump_doc(tables, compact=compact),
         )
     except Exception as e:
         logger.error(f"Error: {e}")
         raise e
 
 
-def _export(path, data, mode="w+"):
-    with open(path, mode) as f:
-        f.write(data)
+def _export(path, data):
+    # writers of a namespace take turns, readers see whole files
+    with file_writer(path) as write:
+        write.write(path, data)
+        if re.match(RE_TABLE_INFO, os.path.basename(path)):
+            index = get_name_index(os.path.dirname(path) or ".")
+            index.update_export(path, data)
+            index.save()
+    _bytes_written.inc(len(data.encode("utf-8")))
+
+
+def _print_view(title: str, view: str):
+    with span("print"):
+        questionary.print(title, style=style_to_string(theme._h2))
+        questionary.print(view, style=style_to_string(theme._normal))
+
+
+def _cached_view(kind: str, name: str, doc: Any, render) -> tuple[str, str]:
+    cached = _views.get((kind, name))
+    if cached is None or cached[0] is not doc:
+        cached = _views[(kind, name)] = (doc, render(doc))
+    return cached[1]
+
+
+@_render_seconds.time(kind="data_source")
+def _show_ds_table(ds_info: 'DataSourceInfo'):
+    _print_view(*_cached_view(KIND_DATA_SOURCES, ds_info.ds_name, ds_info, data_source_view))
 
 
-def _show_ds_table(ds_info: dict):
-    ds_info_configurator = DatasourceInfoConfigurator().validate(ds_info)
-    ds_info_configurator.configure(ds_info)
-    table_view = ds_info_configurator.show_table()
-    questionary.print(f"Data Source: {ds_info_configurator.ds_name}", style=style_to_string(theme._h2))
-    questionary.print(table_view, style=style_to_string(theme._normal))
+@_render_seconds.time(kind="table")
+def _show_table(table_info: 'TableInfo'):
+    _print_view(*_cached_view(KIND_TABLES, table_info.table_name, table_info, table_view))
+
+
+def _daemon_request(ctx, op: str, **params):
+    """
+    Result of a request to the running daemon, None when no daemon answers
+    """
+    if not ctx.obj.get("daemon", True):
+        return None
+    client = DaemonClient.connect(ctx.obj.get("socket"))
+    if client is None:
+        return None
+    try:
+        with client:
+            return client.request(op, **params)
+    except (DaemonError, OSError) as e:
+        logger.warning(f"Daemon request failed, run locally: {e}")
+        return None
+
+
+def _watch_docs(path: str, files: 'FileDocs', show, label: str, debounce: float, polling: bool):
+    """
+    Show the documents under `path`, then re-read only the changed files and re-render only
+    the documents they changed, until interrupted
+    """
+    for doc in files.load(path).values():
+        show(doc)
+
+    def on_change(changed: set[str]):
+        rendered = 0
+        for file_path in sorted(changed):
+            if not files.matches(file_path):
+                continue
+            try:
+                changes = files.update(file_path)
+            except (ValidationError, ValueError, OSError) as e:
+                # most often a file caught in the middle of a write, the next event reads it again
+                logger.error(f"Skip {file_path}: {e}")
+                continue
+            for name, doc in sorted(changes.items()):
+                if doc is None:
+                    logger.warning(f"{label} {name} removed")
+                else:
+                    show(doc)
+                    rendered += 1
+        if rendered:
+            logger.info(f"{rendered} re-rendered, watching {path} . . .")
+
+    logger.info(f"Watching {path}, Ctrl+C to stop . . .")
+    try:
+        watch(path, on_change, debounce=debounce, polling=polling)
+    except KeyboardInterrupt:
+        logger.info("Stop watching")
 
 
 @run.command("load-ds-info", cls=CommandColor, help="Load data source info")
 @click.option("-p", "--source-path", help="Data source path", required=True)
+@click.option("--watch", "watch_files", is_flag=True, default=False, help="Re-render data sources when their files change")
+@click.option("--debounce", type=click.FloatRange(min=0), default=DEFAULT_DEBOUNCE,
+              help="Seconds without change before re-rendering")
+@click.option("--polling", is_flag=True, default=False, help="Poll modification times instead of using inotify")
 @click.pass_context
 @context_path(relative="Load data source info")
-def load_ds_info(ctx, source_path: str) -> 'DatasourceInfo':
+def load_ds_info(ctx, source_path: str, watch_files: bool, debounce: float, polling: bool) -> 'DatasourceInfo':
     ctx.ensure_object(dict)
     try:
         logger.info("Load data source info")
-        if is_file(source_path) and re.match(RE_DATA_SOURCE_INFO, source_path):
-            with open(source_path, "r") as file:
-                data = json.loads(file.read())
-            _show_ds_table(data)
-        else:
-            for directory, filename in ls_all_files_in_directory(source_path):
-                if re.match(RE_DATA_SOURCE_INFO, filename):
-                    with open(f"{directory}/{filename}", "r") as file:
-                        data = json.loads(file.read())
-                    _show_ds_table(data)
+        if watch_files:
+            _watch_docs(source_path, data_source_files(), _show_ds_table, "Data source", debounce, polling)
+            return
+        views = _daemon_request(ctx, "load", path=os.path.abspath(source_path), kind=KIND_DATA_SOURCES)
+        if views is not None:
+            for title, view in views:
+                _print_view(title, view)
+            return
+        for ds_info in get_docs(source_path).data_sources.values():
+            _show_ds_table(ds_info)
 
     except Exception as e:
         logger.error(f"Error: {e}")
@@ -530,36 +870,537 @@ def load_ds_info(ctx, source_path: str) -> 'DatasourceInfo':
 
 @run.command("load-tables", cls=CommandColor, help="Load tables info")
 @click.option("-p", "--tables-path", help="Tables path", required=True)
+@click.option("--watch", "watch_files", is_flag=True, default=False, help="Re-render tables when their files change")
+@click.option("--debounce", type=click.FloatRange(min=0), default=DEFAULT_DEBOUNCE,
+              help="Seconds without change before re-rendering")
+@click.option("--polling", is_flag=True, default=False, help="Poll modification times instead of using inotify")
 @click.pass_context
 @context_path(relative="Load tables info")
-def load_tables(ctx, tables_path: str) -> 'DatasourceInfo':
+def load_tables(ctx, tables_path: str, watch_files: bool, debounce: float, polling: bool) -> 'DatasourceInfo':
     ctx.ensure_object(dict)
     try:
         logger.info("Load tables info")
-        if is_file(tables_path) and re.match(RE_TABLE_INFO, tables_path):
-            with open(tables_path, "r") as file:
-                data = json.loads(file.read())
-            table_info_configurator = TableInfoConfigurator().validate(data)
-            table_info_configurator.configure(data)
-            table_view = table_info_configurator.show_table(show_index=True)
-            questionary.print(f"Table: {table_info_configurator.table_name}", style=style_to_string(theme._h2))
-            questionary.print(table_view, style=style_to_string(theme._normal))
+        if watch_files:
+            _watch_docs(tables_path, table_files(), _show_table, "Table", debounce, polling)
+            return
+        views = _daemon_request(ctx, "load", path=os.path.abspath(tables_path), kind=KIND_TABLES)
+        if views is not None:
+            for title, view in views:
+                _print_view(title, view)
+            return
+        for table in get_docs(tables_path).tables.values():
+            _show_table(table)
+
+    except Exception as e:
+        logger.error(f"Error: {e}")
+        raise e
+
+
+@run.command("search", cls=CommandColor, help="Search tables and fields by name")
+@click.option("-q", "--query", help="Name or prefix to search", required=True)
+@click.option("-p", "--docs-path", help="Docs directory, by default the output directory", default=None)
+@click.option("--fuzzy", is_flag=True, default=False, help="Rank names by similarity instead of prefix")
+@click.option("--rebuild", is_flag=True, default=False, help="Rebuild the name index from the docs files")
+@click.pass_context
+@context_path(relative="Search")
+def search(ctx, query: str, docs_path: str, fuzzy: bool, rebuild: bool):
+    ctx.ensure_object(dict)
+    docs_path = docs_path or ctx.obj["output"]
+    # the daemon keeps the index of the docs it serves up to date, a rebuild is always local
+    rows = None
+    if not rebuild:
+        search_params = {"fuzzy": query} if fuzzy else {"prefix": query}
+        rows = _daemon_request(ctx, "query", path=os.path.abspath(docs_path), **search_params)
+    if rows is None:
+        if rebuild or not os.path.isfile(NameIndex.index_path(docs_path)):
+            logger.info("Build name index . . .")
+            index = NameIndex.build(docs_path)
+            index.save(force=True)
+            _name_indexes[os.path.normpath(docs_path)] = index
+        else:
+            index = get_name_index(docs_path)
+        if fuzzy:
+            terms = [term for term, _ in index.fuzzy(query)]
         else:
+            terms = index.prefix(query)
+        rows = [posting[:4] for term in terms for posting in index.lookup(term)]
+    if not rows:
+        logger.warning(f"No table or field matches {query}")
+        return
+    view = TableView(["kind", "name", "table_name", "field_name"], data=rows)
+    questionary.print(view.render(), style=style_to_string(theme._normal))
+
+
+@run.command("diff", cls=CommandColor, help="Compare two versions of docs")
+@click.option("-a", "--old-path", help="Old docs directory or aggregated file", required=True)
+@click.option("-b", "--new-path", help="New docs directory or aggregated file", required=True)
+@click.option("-f", "--diff-file", help="Write the diff to this JSON file instead of the console", default=None)
+@click.pass_context
+@context_path(relative="Diff docs")
+def diff(ctx, old_path: str, new_path: str, diff_file: str):
+    ctx.ensure_object(dict)
+    result = diff_docs(old_path, new_path)
+    logger.info(
+        f"Added: {len(result['added'])}, removed: {len(result['removed'])}, "
+        f"modified: {len(result['modified'])}, unchanged: {result['unchanged']}"
+    )
+    if diff_file:
+        _export(diff_file, json.dumps(result, indent=2))
+    else:
+        click.echo(json.dumps(result, indent=2))
+
+
+@run.command("dedupe-fields", cls=CommandColor, help="Export tables with shared field definitions")
+@click.option("-p", "--tables-path", help="Tables path", required=True)
+@click.pass_context
+@context_path(relative="Dedupe fields")
+def dedupe_fields(ctx, tables_path: str):
+    ctx.ensure_object(dict)
+    tables = get_docs(tables_path).tables
+    data = dump_shared_tables(tables.values(), compact=ctx.obj.get("compact", False))
+    logger.info(f"Export {len(tables)} tables with shared fields . . .")
+    _export(f"{ctx.obj['output']}/{ctx.obj['namespace']}-tableinfo-shared-config.json", data)
 
-            for directory, filename in ls_all_files_in_directory(tables_path):
-                if re.match(RE_TABLE_INFO, filename):
-                    with open(f"{directory}/{filename}", "r") as file:
-                        data = json.loads(file.read())
-                    for table in data:
-                        table_info_configurator = TableInfoConfigurator().validate(table)
-                        table_info_configurator.configure(table)
-                        table_view = table_info_configurator.show_table(show_index=True)
-                        questionary.print(f"Table: {table_info_configurator.table_name}", style=style_to_string(theme._h2))
-                        questionary.print(table_view, style=style_to_string(theme._normal))
 
+@run.command("snapshot", cls=CommandColor, help="Write a binary snapshot of data sources and tables")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.pass_context
+@context_path(relative="Snapshot")
+def snapshot(ctx, docs_path: str):
+    ctx.ensure_object(dict)
+    namespace = ctx.obj["namespace"]
+    path = f"{ctx.obj['output']}/{namespace}-snapshot{SNAPSHOT_EXTENSION}"
+    with file_writer(path) as write:
+        # the loaders read the snapshot instead of these files until one of them changes
+        sources = snapshot_sources(docs_path, namespace)
+        docs = get_docs(docs_path, namespace)
+        logger.info(f"Export snapshot of {len(docs.data_sources)} data sources and {len(docs.tables)} tables . . .")
+        write.write(path, docs_to_snapshot(docs, sources))
+
+
+@run.command("compact", cls=CommandColor, help="Merge the tableinfo files of a namespace into one compacted file")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("--all-namespaces", is_flag=True, default=False, help="Compact every namespace of the directory")
+@click.option("--workers", type=click.IntRange(min=1), help="Worker processes, by default one per CPU", default=None)
+@click.pass_context
+@context_path(relative="Compact docs")
+def compact(ctx, docs_path: str, all_namespaces: bool, workers: Optional[int]):
+    ctx.ensure_object(dict)
+    namespaces = list_namespaces(docs_path) if all_namespaces else [ctx.obj["namespace"]]
+    logger.info(f"Compact {len(namespaces)} namespaces . . .")
+    results = compact_directory(docs_path, namespaces, compact=ctx.obj.get("compact", False), workers=workers)
+    index = get_name_index(docs_path)
+    for result in results:
+        for file_path in result.merged:
+            index.remove_file(file_path)
+        if result.tables:
+            index.update_postings(result.path, result.postings)
+    index.save()
+    # the cached docs were read from the merged files
+    for key in [key for key in _docs if key[0] == os.path.normpath(docs_path)]:
+        del _docs[key]
+    rows = [[r.namespace, len(r.merged), r.tables, len(r.conflicts), r.path] for r in results]
+    click.echo(TableView(["namespace", "merged files", "tables", "conflicts", "file"], data=rows).render())
+    for result in results:
+        if result.conflicts:
+            logger.warning(f"{result.namespace}: kept the most recent version of {', '.join(result.conflicts)}")
+
+
+@run.command("migrate", cls=CommandColor, help="Upgrade docs files to the current schema version")
+@click.option("-p", "--docs-path", help="Docs directory or file", required=True)
+@click.option("--to", "target", type=click.IntRange(UNVERSIONED, SCHEMA_VERSION), default=SCHEMA_VERSION,
+              help="Schema version to upgrade to")
+@click.option("--dry-run", is_flag=True, default=False, help="Report the files to upgrade without writing them")
+@click.option("--workers", type=click.IntRange(min=1), help="Worker processes, by default one per CPU", default=None)
+@click.pass_context
+@context_path(relative="Migrate docs")
+def migrate(ctx, docs_path: str, target: int, dry_run: bool, workers: Optional[int]):
+    ctx.ensure_object(dict)
+    counts = dict.fromkeys((STATUS_MIGRATED, STATUS_CURRENT, STATUS_FAILED), 0)
+    versions = {}
+    for result in migrate_files(doc_files(docs_path), target, dry_run=dry_run, workers=workers):
+        counts[result.status] += 1
+        if result.status == STATUS_FAILED:
+            logger.error(f"{result.path}: {result.error}")
+        elif result.status == STATUS_MIGRATED:
+            versions[result.version] = versions.get(result.version, 0) + 1
+    rows = [[f"{version} -> {target}", count] for version, count in sorted(versions.items())]
+    rows += [[status, count] for status, count in counts.items() if status != STATUS_MIGRATED]
+    click.echo(TableView(["files", "count"], data=rows).render())
+    if not dry_run and counts[STATUS_MIGRATED]:
+        # cached docs and indexes were read from the old files
+        _docs.clear()
+        _name_indexes.clear()
+        _views.clear()
+    logger.info(f"{'To upgrade' if dry_run else 'Upgraded'}: {counts[STATUS_MIGRATED]}, "
+                f"already at version {target}: {counts[STATUS_CURRENT]}, failed: {counts[STATUS_FAILED]}")
+    if counts[STATUS_FAILED]:
+        ctx.exit(1)
+
+
+@run.command("build-site", cls=CommandColor, help="Render the docs of a namespace as a static site")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("-s", "--site-dir", help="Site directory, by default {output}/{namespace}-site", default=None)
+@click.option("--format", "fmt", type=click.Choice(SITE_FORMATS), default=FORMAT_HTML, help="Page format")
+@click.option("--force", is_flag=True, default=False, help="Render every page, not only those of changed docs")
+@click.option("--workers", type=click.IntRange(min=1), help="Worker processes, by default one per CPU", default=None)
+@click.pass_context
+@context_path(relative="Build site")
+def build_site(ctx, docs_path: str, site_dir: Optional[str], fmt: str, force: bool, workers: Optional[int]):
+    ctx.ensure_object(dict)
+    site_dir = site_dir or f"{ctx.obj['output']}/{ctx.obj['namespace']}-site"
+    logger.info(f"Build site of {ctx.obj['namespace']} in {site_dir} . . .")
+    result = render_site(docs_path, site_dir, ctx.obj["namespace"], fmt=fmt, workers=workers, force=force)
+    rows = [["pages", result.pages], ["rendered", result.rendered], ["removed", result.removed],
+            ["files read", result.files_read], ["index rendered", result.index_rendered]]
+    click.echo(TableView(["site", "count"], data=rows).render())
+
+
+@run.command("codegen", cls=CommandColor, help="Generate a Python package of row dataclasses and models of the tables")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("-d", "--out-dir", help="Package directory, by default {output}/{namespace}_models", default=None)
+@click.option("--force", is_flag=True, default=False, help="Generate every module, not only those of changed tables")
+@click.pass_context
+@context_path(relative="Generate code")
+def codegen(ctx, docs_path: str, out_dir: Optional[str], force: bool):
+    ctx.ensure_object(dict)
+    # the directory is a package, the namespace may not be a Python name
+    package = module_name(re.sub(r"\W", "_", ctx.obj["namespace"]))
+    out_dir = out_dir or f"{ctx.obj['output']}/{package}_models"
+    docs = get_docs(docs_path)
+    logger.info(f"Generate the modules of {len(docs.tables)} tables in {out_dir} . . .")
+    result = write_package(out_dir, docs, force=force)
+    rows = [["generated", len(result.generated)], ["unchanged", result.unchanged], ["removed", len(result.removed)]]
+    click.echo(TableView(["modules", "count"], data=rows).render())
+
+
+@run.command("check-fk", cls=CommandColor, help="Check foreign keys: cycles, dangling references and load order")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("--order", is_flag=True, default=False, help="Print tables in load order, referenced tables first")
+@click.pass_context
+@context_path(relative="Check foreign keys")
+def check_fk(ctx, docs_path: str, order: bool):
+    ctx.ensure_object(dict)
+    graph = ForeignKeyGraph.from_docs(get_docs(docs_path))
+    cycles = graph.cycles()
+    logger.info(f"Tables: {len(graph.tables)}, cycles: {len(cycles)}, dangling references: {len(graph.dangling)}")
+    for cycle in cycles:
+        logger.warning(f"Cycle: {' <-> '.join(cycle)}")
+    if graph.dangling:
+        view = TableView(list(DanglingReference._fields), data=graph.dangling)
+        questionary.print(view.render(), style=style_to_string(theme._normal))
+    if order:
+        click.echo("\n".join(graph.topological_order()))
+
+
+@run.command("generate-ddl", cls=CommandColor, help="Generate CREATE TABLE statements for a data source type")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("-d", "--dialect", type=click.Choice(list(DIALECTS)), help="Data source type", default=None)
+@click.option("--data-source-name", help="Use the type of this data source", default=None)
+@click.option("-f", "--ddl-file", help="Output file, by default {namespace}-{dialect}-ddl.sql", default=None)
+@click.pass_context
+@context_path(relative="Generate DDL")
+def generate_ddl(ctx, docs_path: str, dialect: str, data_source_name: str, ddl_file: str):
+    ctx.ensure_object(dict)
+    docs = get_docs(docs_path)
+    if data_source_name:
+        ds_info = docs.get_data_source(data_source_name)
+        if ds_info is None:
+            raise click.BadParameter(f"Data source {data_source_name} is not documented", param_hint="--data-source-name")
+        dialect = dialect or ds_info.ds_type
+    if not dialect:
+        raise click.UsageError("Either --dialect or --data-source-name is required")
+    ddl_file = ddl_file or f"{ctx.obj['output']}/{ctx.obj['namespace']}-{dialect}-ddl.sql"
+    logger.info(f"Generate {dialect} DDL of {len(docs.tables)} tables . . .")
+    count = write_ddl(ddl_file, docs, dialect)
+    logger.info(f"{count} statements written to {ddl_file}")
+
+
+@run.command("generate-data", cls=CommandColor, help="Generate rows respecting the documented fields")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("-t", "--table-name", help="Table to generate, all tables by default", multiple=True)
+@click.option("-n", "--rows", type=click.IntRange(min=0), help="Rows per table", default=1000)
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Output format", default=FORMATS[0])
+@click.option("--seed", type=int, help="Same seed, same rows", default=0)
+@click.option("--workers", type=click.IntRange(min=1), help="Worker processes, by default one per CPU", default=None)
+@click.option("--chunk-size", type=click.IntRange(min=1), help="Rows generated at once", default=DEFAULT_CHUNK_SIZE)
+@click.option("--null-ratio", type=click.FloatRange(0, 1), help="Ratio of nulls in optional fields", default=DEFAULT_NULL_RATIO)
+@click.option("--reserve-ids/--no-reserve-ids", help="Number auto integer fields from the namespace sequences",
+              default=True)
+@click.pass_context
+@context_path(relative="Generate data")
+def generate_data(ctx, docs_path: str, table_name: tuple, rows: int, fmt: str, seed: int, workers: int,
+                  chunk_size: int, null_ratio: float, reserve_ids: bool):
+    ctx.ensure_object(dict)
+    docs = get_docs(docs_path)
+    tables = []
+    for name in table_name or list(docs.tables):
+        table = docs.get_table(name)
+        if table is None:
+            logger.error(f"Table {name} is not documented")
+            continue
+        tables.append(table)
+    # each chunk is numbered from a block of the namespace sequences, one block serves a round of workers.
+    # ids are reserved for every table first, so foreign keys know the ids of the tables they reference
+    ids = {}
+    if reserve_ids and rows:
+        block_size = min(rows, chunk_size * (workers or os.cpu_count() or 1))
+        for table in tables:
+            for field in table.table_fields or []:
+                if field.field_type == "integer" and field.field_factory == "auto":
+                    sequence = SequenceAllocator(ctx.obj['output'], ctx.obj['namespace'], table.table_name,
+                                                 field.field_name, block_size=block_size, start=sequence_start(field))
+                    ids[sequence.key] = sequence.blocks(rows, chunk_size)
+        if ids:
+            logger.info(f"{rows} ids reserved for {len(ids)} auto fields")
+    for table in tables:
+        name = table.table_name
+        table_ids = {
+            field.field_name: ids[f"{name}.{field.field_name}"] for field in table.table_fields or []
+            if f"{name}.{field.field_name}" in ids
+        }
+        generator = TableDataGenerator(table, rows, seed=seed, chunk_size=chunk_size, null_ratio=null_ratio,
+                                       references=references_of(table, docs, rows, ids), ids=table_ids)
+        path = f"{ctx.obj['output']}/{ctx.obj['namespace']}-{name}-data.{fmt}"
+        logger.info(f"Generate {rows} rows of {name} . . .")
+        write_data(path, generator, fmt, workers=workers)
+
+
+@run.command("validate-data", cls=CommandColor, help="Check a CSV/JSONL data file against a documented table")
+@click.option("-p", "--docs-path", help="Docs directory", required=True)
+@click.option("-t", "--table-name", help="Documented table of the data", required=True)
+@click.option("-f", "--data-file", help="CSV or JSONL data file", required=True)
+@click.option("--format", "fmt", type=click.Choice(FORMATS), help="Data format, by default the file extension", default=None)
+@click.option("--workers", type=click.IntRange(min=1), help="Worker processes, by default one per CPU", default=None)
+@click.option("--block-size", type=click.IntRange(min=1), help="Characters read and checked at once",
+              default=DEFAULT_BLOCK_SIZE)
+@click.option("--max-violations", type=click.IntRange(min=0), help="Violations listed, all are counted",
+              default=DEFAULT_MAX_VIOLATIONS)
+@click.option("--violations-file", help="Write the listed violations to this JSONL file", default=None)
+@click.option("--memory-limit", type=click.IntRange(min=1), help="Memory of the uniqueness check in MB, larger inputs spill to disk",
+              default=DEFAULT_MEMORY_LIMIT >> 20)
+@click.option("--spill-dir", help="Directory of the uniqueness check spill files, by default the temp directory", default=None)
+@click.pass_context
+@context_path(relative="Validate data")
+def validate_data(ctx, docs_path: str, table_name: str, data_file: str, fmt: str, workers: int, block_size: int,
+                  max_violations: int, violations_file: str, memory_limit: int, spill_dir: str):
+    ctx.ensure_object(dict)
+    table = get_docs(docs_path).get_table(table_name)
+    if table is None:
+        raise click.BadParameter(f"Table {table_name} is not documented", param_hint="--table-name")
+    logger.info(f"Validate {data_file} against {table_name} . . .")
+    report = validate_file(data_file, table, fmt, workers=workers, block_size=block_size, max_violations=max_violations,
+                           memory_limit=memory_limit << 20, spill_dir=spill_dir)
+    if report.missing_columns:
+        logger.error(f"Missing columns: {', '.join(report.missing_columns)}")
+    if report.unknown_columns:
+        logger.warning(f"Undocumented columns: {', '.join(report.unknown_columns)}")
+    logger.info(f"Rows: {report.rows}, violations: {report.total}")
+    metrics.counter("data_rows_validated_total", "Data rows checked by validate-data").inc(report.rows, table=table_name)
+    for (field_name, reason), count in report.counts.items():
+        _validation_failures.inc(count, field=field_name, reason=reason)
+    if report.counts:
+        view = TableView(["field_name", "reason", "count"], data=report.summary())
+        questionary.print(view.render(), style=style_to_string(theme._normal))
+    if violations_file:
+        _export(violations_file, "".join(json.dumps(v._asdict(), default=str) + "\n" for v in report.violations))
+    elif report.violations:
+        view = TableView(list(Violation._fields), data=report.violations)
+        questionary.print(view.render(), style=style_to_string(theme._normal))
+    if not report.is_valid:
+        ctx.exit(1)
+
+
+@run.command("serve", cls=CommandColor, help="Keep docs warm in a daemon answering requests on a Unix socket")
+@click.option("-p", "--docs-path", help="Docs directories to load at start", multiple=True)
+@click.option("--polling", is_flag=True, default=False, help="Poll modification times instead of using inotify")
+@click.option("--stop", is_flag=True, default=False, help="Stop the running daemon")
+@click.pass_context
+@context_path(relative="Serve")
+def serve(ctx, docs_path: tuple, polling: bool, stop: bool):
+    ctx.ensure_object(dict)
+    if stop:
+        client = DaemonClient.connect(ctx.obj.get("socket"))
+        if client is None:
+            logger.warning("No daemon is running")
+            return
+        with client:
+            client.request("stop")
+        logger.info("Daemon stopped")
+        return
+    daemon = DocsDaemon(ctx.obj.get("socket"), polling=polling, logger=logger)
+    logger.info(f"Serve on {daemon.socket_path}, Ctrl+C to stop . . .")
+    try:
+        daemon.run(docs_path)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    except KeyboardInterrupt:
+        logger.info("Daemon stopped")
+
+
+SHELL_BUILTINS = {
+    "help": "Show the commands, or the help of one command",
+    "reload": "Forget loaded docs, indexes and rendered views",
+    "exit": "Leave the shell",
+    "quit": "Leave the shell",
+}
+
+
+def _shell_table_names(ctx) -> list[str]:
+    names = {}
+    for docs in _docs.values():
+        names.update(dict.fromkeys(docs.tables))
+    output = ctx.obj["output"]
+    if os.path.isfile(NameIndex.index_path(output)) or os.path.normpath(output) in _name_indexes:
+        names.update(dict.fromkeys(get_name_index(output).names(KIND_TABLE)))
+    return list(names)
+
+
+class ShellCompleter(Completer):
+    """
+    Commands, their options and option values: table names from the loaded docs and the name index,
+    choices, paths
+    """
+
+    def __init__(self, ctx):
+        self.ctx = ctx
+        self.paths = PathCompleter(expanduser=True)
+
+    def _option(self, command: click.Command, name: str) -> Optional[click.Option]:
+        for param in command.params:
+            if isinstance(param, click.Option) and name in param.opts + param.secondary_opts:
+                return param
+        return None
+
+    def _values(self, option: click.Option, word: str, complete_event):
+        kind = shell_completion.value_kind(option)
+        if kind == shell_completion.KIND_CHOICE:
+            yield from (Completion(c, -len(word)) for c in option.type.choices if c.startswith(word))
+        elif kind in (shell_completion.KIND_FILE, shell_completion.KIND_DIR):
+            yield from self.paths.get_completions(Document(word, len(word)), complete_event)
+        elif kind == shell_completion.KIND_TABLE:
+            yield from (Completion(n, -len(word)) for n in _shell_table_names(self.ctx) if n.startswith(word))
+
+    def get_completions(self, document, complete_event):
+        text = document.text_before_cursor
+        words = text.split()
+        word = "" if not words or text[-1].isspace() else words[-1]
+        previous = words[:-1] if word else words
+        if not previous:
+            names = [*run.list_commands(self.ctx), *SHELL_BUILTINS]
+            yield from (Completion(n, -len(word)) for n in names if n.startswith(word))
+            return
+        command = run.get_command(self.ctx, previous[0])
+        if command is None:
+            if previous[0] == "help":
+                yield from (Completion(n, -len(word)) for n in run.list_commands(self.ctx) if n.startswith(word))
+            return
+        option = self._option(command, previous[-1]) if len(previous) > 1 else None
+        if option is not None and not option.is_flag:
+            yield from self._values(option, word, complete_event)
+            return
+        for param in command.params:
+            if isinstance(param, click.Option):
+                for opt in param.opts + param.secondary_opts:
+                    if opt.startswith("--") and opt.startswith(word):
+                        yield Completion(opt, -len(word), display_meta=param.help or "")
+
+
+def _shell_invoke(ctx, args: list[str]):
+    command = run.get_command(ctx, args[0])
+    if command is None or command.name == "shell":
+        logger.error(f"Unknown command {args[0]}, type help to list the commands")
+        return
+    # the breadcrumb printed by the command is the one of a single invocation
+    path = ctx.obj["path"]
+    ctx.obj["path"] = [path[0], getattr(command.callback, "context_path", None) or command.name]
+    try:
+        with command.make_context(args[0], args[1:], parent=ctx) as sub_ctx:
+            command.invoke(sub_ctx)
+    except click.ClickException as e:
+        e.show()
+    except (click.exceptions.Exit, SystemExit):
+        pass
+    except Abort:
+        logger.error("User cancelled")
     except Exception as e:
         logger.error(f"Error: {e}")
-        raise e
+    finally:
+        ctx.obj["path"] = path
+
+
+@run.command("shell", cls=CommandColor, help="Run the commands in a console keeping docs, indexes and views loaded")
+@click.pass_context
+@context_path(relative="Shell")
+def shell(ctx):
+    ctx.ensure_object(dict)
+    group_ctx = ctx.parent
+    os.makedirs(ctx.obj["output"], exist_ok=True)
+    session = PromptSession(
+        history=FileHistory(os.path.join(ctx.obj["output"], ".ddocs-history")),
+        completer=ShellCompleter(group_ctx),
+        style=custom_style_fancy,
+    )
+    logger.info("Type help to list the commands, exit to leave")
+    while True:
+        try:
+            line = session.prompt(f"{ctx.obj['namespace']}> ")
+        except KeyboardInterrupt:
+            continue
+        except EOFError:
+            break
+        try:
+            args = shlex.split(line)
+        except ValueError as e:
+            logger.error(f"Error: {e}")
+            continue
+        if not args:
+            continue
+        if args[0] in ("exit", "quit"):
+            break
+        if args[0] == "help":
+            command = run.get_command(group_ctx, args[1]) if len(args) > 1 else None
+            if command is not None:
+                with command.make_context(args[1], [], parent=group_ctx, resilient_parsing=True) as help_ctx:
+                    click.echo(command.get_help(help_ctx))
+            else:
+                rows = [[name, run.get_command(group_ctx, name).get_short_help_str()] for name in run.list_commands(group_ctx)]
+                rows += [[name, text] for name, text in SHELL_BUILTINS.items()]
+                click.echo(TableView(["command", "help"], data=rows).render())
+            continue
+        if args[0] == "reload":
+            _docs.clear()
+            _name_indexes.clear()
+            _views.clear()
+            logger.info("Docs, indexes and views will be loaded again")
+            continue
+        _shell_invoke(group_ctx, args)
+
+
+def completion_spec() -> dict:
+    ctx = click.Context(run, info_name="run", obj={})
+    return shell_completion.build_spec(run, ctx, NAME_INDEX_FILE, RE_TABLE_INFO)
+
+
+@run.command("completion", cls=CommandColor, help="Write the bash, zsh or fish completion script of the CLI")
+@click.argument("shell_name", type=click.Choice(shell_completion.SHELLS))
+@click.option("--prog-name", help="Command the shell completes", default="docs_run.py")
+@click.option("-f", "--file", "file_path", help="Script file, {output}/ddocs-complete.{shell} by default", default=None)
+@click.pass_context
+@context_path(relative="Completion")
+def completion(ctx, shell_name: str, prog_name: str, file_path: Optional[str]):
+    ctx.ensure_object(dict)
+    # completing a command line reads this spec instead of importing the CLI
+    shell_completion.write_spec(completion_spec())
+    file_path = file_path or f"{ctx.obj['output']}/ddocs-complete.{shell_name}"
+    os.makedirs(os.path.dirname(file_path) or ".", exist_ok=True)
+    with open(file_path, "w") as file:
+        file.write(shell_completion.source(shell_name, prog_name) + "\n")
+    logger.info(f"Completion script written to {file_path}")
+    if shell_name == "fish":
+        logger.info(f"Copy it to ~/.config/fish/completions/{prog_name}.fish")
+    else:
+        logger.info(f"Add `. {os.path.abspath(file_path)}` to ~/.{shell_name}rc, {prog_name} must be on the PATH")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,578 @@
+import bisect
+import csv
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import math
+import os
+import random
+import string
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from src.data.pattern import PatternLanguage, compile_pattern, pattern_language
+from src.data.sequence import DEFAULT_START
+from src.helpers.pool import bounded_map
+from src.model.meta import DatasourceDocs, FieldInfo, TableInfo
+
+FORMAT_CSV = "csv"
+FORMAT_JSONL = "jsonl"
+FORMATS = (FORMAT_CSV, FORMAT_JSONL)
+
+DEFAULT_CHUNK_SIZE = 10000
+DEFAULT_NULL_RATIO = 0.1
+DEFAULT_SPAN = 1_000_000
+DEFAULT_TEXT_LENGTH = 16
+UNIQUE_TOKEN_WIDTH = 8
+DATETIME_RANGE = (
+    int(datetime.datetime(2000, 1, 1, tzinfo=datetime.timezone.utc).timestamp()),
+    int(datetime.datetime(2030, 1, 1, tzinfo=datetime.timezone.utc).timestamp()),
+)
+_ALPHABET = string.ascii_letters + string.digits
+# random bytes -> alphabet characters, cheaper than choosing characters one by one
+_TO_ALPHABET = bytes(ord(_ALPHABET[b % len(_ALPHABET)]) for b in range(256))
+_DIGITS36 = string.digits + string.ascii_lowercase
+_SPREAD = 0x9E3779B97F4A7C15
+
+
+class Batch(NamedTuple):
+    """
+    One chunk of rows: `start` is the row number of its first row in the whole output
+    """
+    rnd: random.Random
+    rng: Any
+    start: int
+    count: int
+
+
+Column = Callable[[Batch], list]
+# ids of a sequential column as (first id, count) runs of consecutive ids, in row order
+IdBlocks = list[tuple[int, int]]
+
+
+def chunk_seed(seed: int, table_name: str, chunk: int) -> int:
+    """
+    Seed of a chunk, independent of the process generating it
+    """
+    digest = hashlib.blake2b(f"{seed}:{table_name}:{chunk}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "little")
+
+
+def _base36(value: int) -> str:
+    digits = []
+    while True:
+        value, digit = divmod(value, 36)
+        digits.append(_DIGITS36[digit])
+        if not value:
+            return "".join(reversed(digits))
+
+
+def int_bounds(field: FieldInfo) -> tuple[int, int]:
+    low = high = None
+    if field.field_ge is not None:
+        low = math.ceil(field.field_ge)
+    if field.field_gt is not None:
+        low = max(low if low is not None else -math.inf, math.floor(field.field_gt) + 1)
+    if field.field_le is not None:
+        high = math.floor(field.field_le)
+    if field.field_lt is not None:
+        high = min(high if high is not None else math.inf, math.ceil(field.field_lt) - 1)
+    if low is None:
+        low = 0 if high is None or high >= DEFAULT_SPAN else high - DEFAULT_SPAN
+    if high is None:
+        high = low + DEFAULT_SPAN
+    if low > high:
+        raise ValueError(f"Field {field.field_name} has no integer between its bounds")
+    return low, high
+
+
+def float_bounds(field: FieldInfo) -> tuple[float, float]:
+    """
+    Closed interval of valid values, open bounds are moved by one decimal step so rounding stays inside
+    """
+    step = 10 ** -field.field_decimal_places if field.field_decimal_places is not None else 0
+    low = high = None
+    if field.field_ge is not None:
+        low = field.field_ge
+    if field.field_gt is not None:
+        above = field.field_gt + step if step else math.nextafter(field.field_gt, math.inf)
+        low = max(low if low is not None else -math.inf, above)
+    if field.field_le is not None:
+        high = field.field_le
+    if field.field_lt is not None:
+        below = field.field_lt - step if step else math.nextafter(field.field_lt, -math.inf)
+        high = min(high if high is not None else math.inf, below)
+    if low is None:
+        low = 0.0 if high is None or high >= DEFAULT_SPAN else high - DEFAULT_SPAN
+    if high is None:
+        high = low + DEFAULT_SPAN
+    if low > high:
+        raise ValueError(f"Field {field.field_name} has no value between its bounds")
+    return float(low), float(high)
+
+
+def datetime_bounds(field: FieldInfo) -> tuple[int, int]:
+    """
+    Closed interval of valid datetimes in seconds, the bounds of a datetime field are UTC timestamps in milliseconds
+    """
+    low = high = None
+    if field.field_ge is not None:
+        low = math.ceil(field.field_ge / 1000)
+    if field.field_gt is not None:
+        low = max(low if low is not None else -math.inf, math.floor(field.field_gt / 1000) + 1)
+    if field.field_le is not None:
+        high = math.floor(field.field_le / 1000)
+    if field.field_lt is not None:
+        high = min(high if high is not None else math.inf, math.ceil(field.field_lt / 1000) - 1)
+    span = DATETIME_RANGE[1] - DATETIME_RANGE[0]
+    if low is None:
+        low = DATETIME_RANGE[0] if high is None or high >= DATETIME_RANGE[1] else high - span
+    if high is None:
+        high = max(DATETIME_RANGE[1], low + span)
+    if low > high:
+        raise ValueError(f"Field {field.field_name} has no datetime between its bounds")
+    return low, high
+
+
+def text_lengths(field: FieldInfo) -> tuple[int, int]:
+    min_length = field.field_min_length or 1
+    return min_length, field.field_max_length or max(min_length, DEFAULT_TEXT_LENGTH)
+
+
+def field_language(field: FieldInfo) -> PatternLanguage:
+    """
+    Values of a text field with a pattern, within its length bounds
+    """
+    language = pattern_language(field.field_pattern, field.field_min_length or 0, field.field_max_length)
+    if not language.count:
+        raise ValueError(f"Field {field.field_name} has no value matching its pattern between its length bounds")
+    return language
+
+
+def distinct_values(field: FieldInfo) -> Optional[int]:
+    """
+    Number of distinct values the generator has for a unique field, None when it does not run out
+    """
+    if not field.field_unique:
+        return None
+    if field.field_type == "float":
+        low, high = float_bounds(field)
+        return math.floor((high - low) / _float_step(field.field_decimal_places) + 1e-9) + 1
+    if field.field_type == "text" and field.field_pattern:
+        return field_language(field).count
+    if field.field_type == "text":
+        return 36 ** min(text_lengths(field)[1], UNIQUE_TOKEN_WIDTH)
+    if field.field_type == "datetime":
+        low, high = datetime_bounds(field)
+        return high - low + 1
+    return None
+
+
+def is_sequential(field: FieldInfo) -> bool:
+    """
+    Unique and auto integer columns are numbered from `sequence_start`
+    """
+    return field.field_type == "integer" and bool(field.field_unique or field.field_factory == "auto")
+
+
+def sequence_start(field: FieldInfo) -> int:
+    """
+    First id of a sequential column: auto ids start at DEFAULT_START as the sequences do, unless the field
+    bounds say otherwise, other columns at their lower bound
+    """
+    low, high = int_bounds(field)
+    explicit = field.field_ge is not None or field.field_gt is not None
+    if field.field_factory == "auto" and not explicit and DEFAULT_START <= high:
+        return DEFAULT_START
+    return low
+
+
+def _sequence(low: int) -> Column:
+    return lambda batch: list(range(low + batch.start, low + batch.start + batch.count))
+
+
+def _blocks(blocks: IdBlocks) -> Column:
+    offsets = list(itertools.accumulate((count for _, count in blocks), initial=0))
+
+    def column(batch: Batch) -> list:
+        values = []
+        row, end = batch.start, batch.start + batch.count
+        i = bisect.bisect_right(offsets, row) - 1
+        while row < end:
+            first, count = blocks[i]
+            stop = min(end, offsets[i] + count)
+            values.extend(range(first + row - offsets[i], first + stop - offsets[i]))
+            row, i = stop, i + 1
+        return values
+    return column
+
+
+def _references(blocks: IdBlocks) -> Column:
+    """
+    Ids drawn among the ids of `blocks`, a single run is drawn directly
+    """
+    if len(blocks) == 1:
+        low, count = blocks[0]
+        return _integers(low, low + count - 1)
+    offsets = list(itertools.accumulate((count for _, count in blocks), initial=0))
+    rows = _integers(0, offsets[-1] - 1)
+
+    def column(batch: Batch) -> list:
+        values = []
+        for row in rows(batch):
+            i = bisect.bisect_right(offsets, row) - 1
+            values.append(blocks[i][0] + row - offsets[i])
+        return values
+    return column
+
+
+def _integers(low: int, high: int) -> Column:
+    span = high - low + 1
+
+    def column(batch: Batch) -> list:
+        if batch.rng is not None:
+            return batch.rng.integers(low, high + 1, size=batch.count).tolist()
+        r = batch.rnd.random
+        return [low + int(r() * span) for _ in range(batch.count)]
+    return column
+
+
+def _floats(low: float, high: float, decimal_places: Optional[int]) -> Column:
+    width = high - low
+
+    def column(batch: Batch) -> list:
+        if batch.rng is not None:
+            values = batch.rng.uniform(low, high, size=batch.count)
+            return (values if decimal_places is None else values.round(decimal_places)).tolist()
+        r = batch.rnd.random
+        if decimal_places is None:
+            return [low + r() * width for _ in range(batch.count)]
+        return [round(low + r() * width, decimal_places) for _ in range(batch.count)]
+    return column
+
+
+def _float_step(decimal_places: Optional[int]) -> float:
+    return 10 ** -(decimal_places or 0)
+
+
+def _float_sequence(low: float, high: float, decimal_places: Optional[int]) -> Column:
+    step = _float_step(decimal_places)
+
+    def column(batch: Batch) -> list:
+        values = [round(low + (batch.start + i) * step, 10) for i in range(batch.count)]
+        if values and values[-1] > high:
+            raise ValueError(f"Too many rows for unique values between {low} and {high}")
+        return values
+    return column
+
+
+def _texts(min_length: int, max_length: int, unique: bool) -> Column:
+    # unique values end with the row number in base 36, fixed width so a prefix can not make two equal
+    width = min(max_length, UNIQUE_TOKEN_WIDTH)
+
+    def column(batch: Batch) -> list:
+        rnd = batch.rnd
+        r = rnd.random
+        spread = max_length - min_length + 1
+        lengths = [min_length + int(r() * spread) for _ in range(batch.count)]
+        if unique:
+            lengths = [max(length - width, 0) for length in lengths]
+        text = rnd.randbytes(sum(lengths)).translate(_TO_ALPHABET).decode("ascii")
+        values = []
+        end = 0
+        for length in lengths:
+            start, end = end, end + length
+            values.append(text[start:end])
+        if not unique:
+            return values
+        last = _base36(batch.start + batch.count - 1)
+        if len(last) > width:
+            raise ValueError(f"Too many rows for unique values of at most {max_length} characters")
+        return [value + _base36(batch.start + i).rjust(width, "0") for i, value in enumerate(values)]
+    return column
+
+
+def _patterns(pattern: str) -> Column:
+    generate = compile_pattern(pattern)
+    return lambda batch: [generate(batch.rnd) for _ in range(batch.count)]
+
+
+def _language_patterns(language: PatternLanguage) -> Column:
+    # uniform among the matching strings of an allowed length
+    count = language.count
+    return lambda batch: [language.nth(batch.rnd.randrange(count)) for _ in range(batch.count)]
+
+
+def _unique_patterns(language: PatternLanguage) -> Column:
+    # row numbers are spread over the matching strings by a multiplier coprime with their count
+    count = language.count
+    multiplier = _SPREAD % count or 1
+    while math.gcd(multiplier, count) != 1:
+        multiplier += 1
+
+    def column(batch: Batch) -> list:
+        if batch.start + batch.count > count:
+            raise ValueError(f"Too many rows for unique values, the pattern matches {count} values")
+        return [language.nth((batch.start + i) * multiplier % count) for i in range(batch.count)]
+    return column
+
+
+def _booleans(batch: Batch) -> list:
+    if batch.rng is not None:
+        return (batch.rng.random(batch.count) < 0.5).tolist()
+    r = batch.rnd.random
+    return [r() < 0.5 for _ in range(batch.count)]
+
+
+def _datetimes(low: int, high: int) -> Column:
+    fromtimestamp = datetime.datetime.fromtimestamp
+    utc = datetime.timezone.utc
+
+    def column(batch: Batch) -> list:
+        if batch.rng is not None:
+            seconds = batch.rng.integers(low, high + 1, size=batch.count).tolist()
+        else:
+            seconds = [batch.rnd.randint(low, high) for _ in range(batch.count)]
+        return [fromtimestamp(s, utc).isoformat() for s in seconds]
+    return column
+
+
+def _uuids(batch: Batch) -> list:
+    bits = batch.rnd.getrandbits
+    return [str(uuid.UUID(int=bits(128), version=4)) for _ in range(batch.count)]
+
+
+def _jsons(batch: Batch) -> list:
+    r = batch.rnd.random
+    return [{"key": f"value_{int(r() * DEFAULT_SPAN)}"} for _ in range(batch.count)]
+
+
+def _lists(batch: Batch) -> list:
+    rnd = batch.rnd
+    return [[rnd.randrange(DEFAULT_SPAN) for _ in range(rnd.randint(0, 4))] for _ in range(batch.count)]
+
+
+def _unique_datetimes(low: int) -> Column:
+    # one second apart from the start of the range
+    fromtimestamp = datetime.datetime.fromtimestamp
+    utc = datetime.timezone.utc
+    return lambda batch: [fromtimestamp(low + batch.start + i, utc).isoformat() for i in range(batch.count)]
+
+
+def _unique_jsons(batch: Batch) -> list:
+    return [{"key": f"value_{batch.start + i}"} for i in range(batch.count)]
+
+
+def _unique_lists(batch: Batch) -> list:
+    return [[batch.start + i] for i in range(batch.count)]
+
+
+def _with_nulls(column: Column, ratio: float) -> Column:
+    def nullable(batch: Batch) -> list:
+        values = column(batch)
+        r = batch.rnd.random
+        return [None if r() < ratio else v for v in values]
+    return nullable
+
+
+def column_generator(field: FieldInfo, null_ratio: float = DEFAULT_NULL_RATIO,
+                     reference: Optional[IdBlocks] = None, ids: Optional[IdBlocks] = None) -> Column:
+    """
+    Values of one field for a whole batch, the field is only inspected here.
+    `reference` holds the ids of a referenced sequential column,
+    `ids` the ids of a sequential column when they were reserved for it.
+    """
+    field_type = field.field_type
+    if reference is not None:
+        column = _references(reference)
+    elif field_type == "integer" and ids is not None:
+        column = _blocks(ids)
+    elif field_type == "integer" and is_sequential(field):
+        column = _sequence(sequence_start(field))
+    elif field_type == "integer":
+        column = _integers(*int_bounds(field))
+    elif field_type == "float" and field.field_unique:
+        column = _float_sequence(*float_bounds(field), field.field_decimal_places)
+    elif field_type == "float":
+        column = _floats(*float_bounds(field), field.field_decimal_places)
+    elif field_type == "text" and field.field_pattern and field.field_unique:
+        column = _unique_patterns(field_language(field))
+    elif field_type == "text" and field.field_pattern:
+        if field.field_min_length is None and field.field_max_length is None:
+            column = _patterns(field.field_pattern)
+        else:
+            column = _language_patterns(field_language(field))
+    elif field_type == "text":
+        column = _texts(*text_lengths(field), bool(field.field_unique))
+    elif field_type == "boolean":
+        column = _booleans
+    elif field_type == "datetime":
+        low, high = datetime_bounds(field)
+        column = _unique_datetimes(low) if field.field_unique else _datetimes(low, high)
+    elif field_type == "uuid":
+        column = _uuids
+    elif field_type == "json":
+        column = _unique_jsons if field.field_unique else _jsons
+    elif field_type == "list":
+        column = _unique_lists if field.field_unique else _lists
+    else:
+        raise ValueError(f"Field type {field_type} is not supported for data generation")
+    if null_ratio and not field.field_required and not field.field_unique and not is_sequential(field):
+        column = _with_nulls(column, null_ratio)
+    return column
+
+
+def references_of(table: TableInfo, docs: Optional[DatasourceDocs], rows: int,
+                  ids: Optional[dict[str, IdBlocks]] = None) -> dict[str, IdBlocks]:
+    """
+    Foreign keys to sequential columns draw their values among the ids generated for the referenced table,
+    assuming it is generated with the same number of rows. `ids` holds the ids reserved
+    for `table.field` sequences, the ids are numbered from `sequence_start` otherwise.
+    """
+    ids = ids or {}
+    references = {}
+    for fk in table.table_foreign_keys or []:
+        field = docs.get_field(fk.fk_table_name, fk.fk_field_name) if docs is not None else None
+        if field is not None and is_sequential(field):
+            references[fk.field_name] = ids.get(f"{fk.fk_table_name}.{fk.fk_field_name}", [(sequence_start(field), rows)])
+    return references
+
+
+class TableDataGenerator:
+    """
+    Rows of a table generated column by column, chunk by chunk. A chunk only depends on the seed,
+    the table and its index, so the output is the same for any number of workers.
+    NumPy draws numbers when it is installed, its output differs from the pure Python one.
+    """
+
+    def __init__(self, table: TableInfo, rows: int, seed: int = 0, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 null_ratio: float = DEFAULT_NULL_RATIO, references: Optional[dict[str, IdBlocks]] = None,
+                 ids: Optional[dict[str, IdBlocks]] = None, use_numpy: bool = True):
+        self.table = table
+        self.rows = rows
+        self.seed = seed
+        self.chunk_size = chunk_size
+        self.use_numpy = use_numpy and np is not None
+        references = references or {}
+        ids = ids or {}
+        # arguments rebuilding the same generator in a worker process
+        self.options = {
+            "rows": rows, "seed": seed, "chunk_size": chunk_size, "null_ratio": null_ratio,
+            "references": references, "ids": ids, "use_numpy": use_numpy,
+        }
+        fields = table.table_fields or []
+        for field in fields:
+            if field.field_name in ids:
+                blocks = ids[field.field_name]
+                reserved = sum(count for _, count in blocks)
+                if reserved != rows:
+                    raise ValueError(f"Field {field.field_name} has {reserved} ids reserved for {rows} rows")
+                # reserved ids only stop at an explicit upper bound
+                last = max((first + count - 1 for first, count in blocks), default=None)
+                if last is not None and (field.field_le is not None or field.field_lt is not None) \
+                        and last > int_bounds(field)[1]:
+                    raise ValueError(f"Field {field.field_name} can not hold id {last}, "
+                                     f"its upper bound is {int_bounds(field)[1]}")
+                continue
+            if not is_sequential(field) or not rows:
+                continue
+            low, high = sequence_start(field), int_bounds(field)[1]
+            if low + rows - 1 > high:
+                raise ValueError(f"Field {field.field_name} can not hold {rows} distinct values from {low}")
+        for field in fields:
+            available = distinct_values(field)
+            if available is not None and rows > available:
+                raise ValueError(f"Field {field.field_name} can not hold {rows} distinct values, it has {available}")
+        self.names = [field.field_name for field in fields]
+        self.columns = [
+            column_generator(field, null_ratio, references.get(field.field_name), ids.get(field.field_name))
+            for field in fields
+        ]
+
+    @property
+    def chunks(self) -> int:
+        return -(-self.rows // self.chunk_size)
+
+    def batch(self, chunk: int) -> Batch:
+        seed = chunk_seed(self.seed, self.table.table_name, chunk)
+        start = chunk * self.chunk_size
+        count = min(self.chunk_size, self.rows - start)
+        rng = np.random.default_rng(seed) if self.use_numpy else None
+        return Batch(random.Random(seed), rng, start, count)
+
+    def values(self, chunk: int) -> list[list]:
+        batch = self.batch(chunk)
+        return [column(batch) for column in self.columns]
+
+    def chunk(self, chunk: int) -> list[tuple]:
+        return list(zip(*self.values(chunk)))
+
+    def __iter__(self) -> Iterator[list[tuple]]:
+        for chunk in range(self.chunks):
+            yield self.chunk(chunk)
+
+    def header(self, fmt: str) -> str:
+        if fmt != FORMAT_CSV:
+            return ""
+        out = io.StringIO()
+        csv.writer(out).writerow(self.names)
+        return out.getvalue()
+
+    def render(self, chunk: int, fmt: str) -> str:
+        values = self.values(chunk)
+        if fmt == FORMAT_JSONL:
+            names = self.names
+            dumps = json.dumps
+            return "".join(dumps(dict(zip(names, row))) + "\n" for row in zip(*values))
+        # converted column by column, the csv writer already writes None as an empty value
+        for i, field in enumerate(self.table.table_fields or []):
+            if field.field_type == "boolean":
+                values[i] = [None if v is None else "true" if v else "false" for v in values[i]]
+            elif field.field_type in ("json", "list"):
+                encode = json.JSONEncoder().encode
+                values[i] = [None if v is None else encode(v) for v in values[i]]
+        out = io.StringIO()
+        csv.writer(out).writerows(zip(*values))
+        return out.getvalue()
+
+
+_worker_generator: Optional[TableDataGenerator] = None
+
+
+def _init_worker(table: dict, kwargs: dict):
+    global _worker_generator
+    _worker_generator = TableDataGenerator(TableInfo(**table), **kwargs)
+
+
+def _render_chunk(args: tuple[int, str]) -> str:
+    chunk, fmt = args
+    return _worker_generator.render(chunk, fmt)
+
+
+def write_data(path: str, generator: TableDataGenerator, fmt: str = FORMAT_CSV, workers: Optional[int] = None) -> int:
+    """
+    Stream the rows of `generator` to `path`, chunks are rendered by a process pool and written in order
+    """
+    if fmt not in FORMATS:
+        raise ValueError(f"Format {fmt} is not supported, use one of {', '.join(FORMATS)}")
+    with open(path, "w+", newline="") as f:
+        f.write(generator.header(fmt))
+        if generator.chunks > 1 and workers != 1:
+            initargs = (generator.table.model_dump(mode="json"), generator.options)
+            workers = workers or os.cpu_count() or 1
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+                tasks = ((chunk, fmt) for chunk in range(generator.chunks))
+                for text in bounded_map(executor, _render_chunk, tasks, window=2 * workers):
+                    f.write(text)
+        else:
+            for chunk in range(generator.chunks):
+                f.write(generator.render(chunk, fmt))
+    return generator.rows
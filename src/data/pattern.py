@@ -0,0 +1,254 @@
+import random
+import string
+from functools import lru_cache
+from typing import Callable, Iterable, Optional
+
+try:
+    from re import _parser as sre_parse
+    from re import _constants as sre_constants
+except ImportError:
+    import sre_parse
+    import sre_constants
+
+# unbounded repeats (*, +, {n,}) stop this many times after their minimum
+MAX_EXTRA_REPEAT = 8
+
+_CATEGORIES = {
+    sre_constants.CATEGORY_DIGIT: string.digits,
+    sre_constants.CATEGORY_NOT_DIGIT: string.ascii_letters,
+    sre_constants.CATEGORY_SPACE: " ",
+    sre_constants.CATEGORY_NOT_SPACE: string.ascii_letters + string.digits,
+    sre_constants.CATEGORY_WORD: string.ascii_letters + string.digits + "_",
+    sre_constants.CATEGORY_NOT_WORD: "-.,;:!",
+}
+_ANY = string.ascii_letters + string.digits
+
+Generate = Callable[[random.Random], str]
+
+
+def _charset(items) -> str:
+    chars = []
+    negate = False
+    for op, av in items:
+        if op == sre_constants.NEGATE:
+            negate = True
+        elif op == sre_constants.LITERAL:
+            chars.append(chr(av))
+        elif op == sre_constants.RANGE:
+            chars.extend(chr(c) for c in range(av[0], av[1] + 1))
+        elif op == sre_constants.CATEGORY:
+            chars.extend(_CATEGORIES[av])
+    if negate:
+        excluded = set(chars)
+        return "".join(c for c in _ANY if c not in excluded)
+    return "".join(dict.fromkeys(chars))
+
+
+def _compile(parsed) -> list[Generate]:
+    parts = []
+    for op, av in parsed:
+        if op == sre_constants.LITERAL:
+            parts.append(lambda rnd, c=chr(av): c)
+        elif op == sre_constants.NOT_LITERAL:
+            chars = _ANY.replace(chr(av), "")
+            parts.append(lambda rnd, chars=chars: rnd.choice(chars))
+        elif op == sre_constants.ANY:
+            parts.append(lambda rnd: rnd.choice(_ANY))
+        elif op == sre_constants.IN:
+            chars = _charset(av)
+            parts.append(lambda rnd, chars=chars: rnd.choice(chars))
+        elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+            low, high, sub = av
+            high = low + MAX_EXTRA_REPEAT if high == sre_constants.MAXREPEAT else high
+            item = _sequence(_compile(sub))
+            parts.append(lambda rnd, low=low, high=high, item=item: "".join(
+                item(rnd) for _ in range(rnd.randint(low, high))
+            ))
+        elif op == sre_constants.SUBPATTERN:
+            parts.append(_sequence(_compile(av[-1])))
+        elif op == sre_constants.BRANCH:
+            branches = [_sequence(_compile(branch)) for branch in av[1]]
+            parts.append(lambda rnd, branches=branches: rnd.choice(branches)(rnd))
+        elif op == sre_constants.AT:
+            continue
+        else:
+            raise ValueError(f"Pattern construct {op} is not supported for data generation")
+    return parts
+
+
+def _sequence(parts: list[Generate]) -> Generate:
+    if len(parts) == 1:
+        return parts[0]
+    return lambda rnd: "".join(part(rnd) for part in parts)
+
+
+def compile_pattern(pattern: str) -> Generate:
+    """
+    Generator of random strings matching `pattern`, the pattern is parsed once
+    """
+    return _sequence(_compile(sre_parse.parse(pattern)))
+
+
+class _Automaton:
+    """
+    Nondeterministic automaton of a pattern, repeats unrolled. Transitions only go to states created
+    after their source, so it has no cycle.
+    """
+
+    def __init__(self, parsed):
+        # state -> [(chars, target)], state -> [target] of the empty transitions
+        self.moves: list[list[tuple[str, int]]] = []
+        self.empty: list[list[int]] = []
+        self.start = self._state()
+        self.end = self._add(parsed, self.start)
+
+    def _state(self) -> int:
+        self.moves.append([])
+        self.empty.append([])
+        return len(self.moves) - 1
+
+    def _chars(self, chars: str, start: int) -> int:
+        end = self._state()
+        if chars:
+            self.moves[start].append((chars, end))
+        return end
+
+    def _add(self, parsed, start: int) -> int:
+        for op, av in parsed:
+            if op == sre_constants.LITERAL:
+                start = self._chars(chr(av), start)
+            elif op == sre_constants.NOT_LITERAL:
+                start = self._chars(_ANY.replace(chr(av), ""), start)
+            elif op == sre_constants.ANY:
+                start = self._chars(_ANY, start)
+            elif op == sre_constants.IN:
+                start = self._chars(_charset(av), start)
+            elif op in (sre_constants.MAX_REPEAT, sre_constants.MIN_REPEAT):
+                low, high, sub = av
+                high = low + MAX_EXTRA_REPEAT if high == sre_constants.MAXREPEAT else high
+                for _ in range(low):
+                    start = self._add(sub, start)
+                ends = [start]
+                for _ in range(high - low):
+                    start = self._add(sub, start)
+                    ends.append(start)
+                start = self._state()
+                for end in ends:
+                    self.empty[end].append(start)
+            elif op == sre_constants.SUBPATTERN:
+                start = self._add(av[-1], start)
+            elif op == sre_constants.BRANCH:
+                ends = []
+                for branch in av[1]:
+                    branch_start = self._state()
+                    self.empty[start].append(branch_start)
+                    ends.append(self._add(branch, branch_start))
+                start = self._state()
+                for end in ends:
+                    self.empty[end].append(start)
+            elif op == sre_constants.AT:
+                continue
+            else:
+                raise ValueError(f"Pattern construct {op} is not supported for data generation")
+        return start
+
+    def closure(self, states: Iterable[int]) -> frozenset[int]:
+        closed = set(states)
+        pending = list(closed)
+        while pending:
+            for target in self.empty[pending.pop()]:
+                if target not in closed:
+                    closed.add(target)
+                    pending.append(target)
+        return frozenset(closed)
+
+
+class _State:
+    """
+    State of the deterministic automaton: the characters leading to each next state,
+    and the number of strings of each length it accepts
+    """
+
+    def __init__(self, states: frozenset[int], accepting: bool):
+        self.states = states
+        self.accepting = accepting
+        self.moves: list[tuple[str, '_State']] = []
+        self.lengths: dict[int, int] = {}
+
+
+def _determinize(automaton: _Automaton) -> _State:
+    """
+    Subset construction: a string leads to one state only, so every string is counted once
+    """
+    def state_of(states: frozenset[int]) -> _State:
+        if states not in built:
+            built[states] = _State(states, automaton.end in states)
+            pending.append(built[states])
+        return built[states]
+
+    built: dict[frozenset[int], _State] = {}
+    pending = []
+    root = state_of(automaton.closure([automaton.start]))
+    while pending:
+        state = pending.pop()
+        targets: dict[str, set[int]] = {}
+        for source in state.states:
+            for chars, target in automaton.moves[source]:
+                for char in chars:
+                    targets.setdefault(char, set()).add(target)
+        # characters leading to the same states are one move
+        groups: dict[frozenset[int], list[str]] = {}
+        for char in sorted(targets):
+            groups.setdefault(automaton.closure(targets[char]), []).append(char)
+        state.moves = [(''.join(chars), state_of(states)) for states, chars in groups.items()]
+    # the automaton has no cycle and a state leads to states of a later first source state
+    for state in sorted(built.values(), key=lambda s: min(s.states), reverse=True):
+        lengths = {0: 1} if state.accepting else {}
+        for chars, target in state.moves:
+            for length, count in target.lengths.items():
+                lengths[length + 1] = lengths.get(length + 1, 0) + len(chars) * count
+        state.lengths = lengths
+    return root
+
+
+class PatternLanguage:
+    """
+    Strings matching a pattern with a length between `min_length` and `max_length`, numbered from 0 to `count`.
+    Distinct numbers are distinct strings, also when the pattern matches a string in several ways, e.g. `a?a?`.
+    """
+
+    def __init__(self, pattern: str, min_length: int = 0, max_length: Optional[int] = None):
+        self.root = _determinize(_Automaton(sre_parse.parse(pattern)))
+        self.lengths = sorted(
+            (length, count) for length, count in self.root.lengths.items()
+            if count and length >= min_length and (max_length is None or length <= max_length)
+        )
+        self.count = sum(count for _, count in self.lengths)
+
+    def nth(self, n: int) -> str:
+        for length, count in self.lengths:
+            if n < count:
+                return self._nth(n, length)
+            n -= count
+        raise IndexError(n)
+
+    def _nth(self, n: int, length: int) -> str:
+        state = self.root
+        chars = []
+        for remaining in range(length - 1, -1, -1):
+            for move_chars, target in state.moves:
+                count = target.lengths.get(remaining, 0)
+                if n < len(move_chars) * count:
+                    chars.append(move_chars[n // count])
+                    n %= count
+                    state = target
+                    break
+                n -= len(move_chars) * count
+            else:
+                raise IndexError(n)
+        return "".join(chars)
+
+
+@lru_cache(maxsize=256)
+def pattern_language(pattern: str, min_length: int = 0, max_length: Optional[int] = None) -> PatternLanguage:
+    return PatternLanguage(pattern, min_length, max_length)
@@ -0,0 +1,117 @@
+import json
+import os
+import threading
+from typing import Optional
+
+from src.helpers.lock import file_lock
+
+DEFAULT_BLOCK_SIZE = 1000
+DEFAULT_START = 1
+SEQUENCES_FILE = "{namespace}-sequences.json"
+
+
+def sequences_path(directory: str, namespace: str) -> str:
+    return os.path.join(directory, SEQUENCES_FILE.format(namespace=namespace))
+
+
+def _read(path: str) -> dict[str, int]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _write(path: str, sequences: dict[str, int]):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(sequences, f, indent=2, sort_keys=True)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def reserve_many(path: str, counts: dict[str, tuple[int, int]]) -> dict[str, int]:
+    """
+    Reserve contiguous ids of several sequences under one lock, `counts` maps a sequence to (count, start).
+    The next free ids are written before the lock is released, so a reserved id is never handed out again.
+    """
+    if any(count < 1 for count, _ in counts.values()):
+        raise ValueError("At least one id must be reserved")
+    firsts = {}
+    with file_lock(f"{path}.lock"):
+        sequences = _read(path)
+        for key, (count, start) in counts.items():
+            firsts[key] = max(sequences.get(key, start), start)
+            sequences[key] = firsts[key] + count
+        _write(path, sequences)
+    return firsts
+
+
+def reserve(path: str, key: str, count: int, start: int = DEFAULT_START) -> int:
+    """
+    Reserve `count` contiguous ids of sequence `key`, returns the first one
+    """
+    return reserve_many(path, {key: (count, start)})[key]
+
+
+class SequenceAllocator:
+    """
+    Ids of one (namespace, table, field) sequence. Ids are reserved from the sequences file a block
+    at a time and handed out from memory, so threads and processes only meet on the file once per block.
+    Ids of a block left unused when the process ends are skipped, never reused.
+    """
+
+    def __init__(self, directory: str, namespace: str, table_name: str, field_name: str,
+                 block_size: int = DEFAULT_BLOCK_SIZE, start: int = DEFAULT_START):
+        self.path = sequences_path(directory, namespace)
+        self.key = f"{table_name}.{field_name}"
+        self.block_size = block_size
+        self.start = start
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+
+    def next(self) -> int:
+        with self._lock:
+            if self._next >= self._end:
+                self._next = reserve(self.path, self.key, self.block_size, self.start)
+                self._end = self._next + self.block_size
+            value = self._next
+            self._next += 1
+            return value
+
+    def take(self, count: int) -> range:
+        """
+        `count` contiguous ids from the current block. A block short of them is replaced by a new one,
+        its remaining ids are skipped. More ids than a block holds are reserved on their own.
+        """
+        with self._lock:
+            if self._end - self._next < count <= self.block_size:
+                self._next = reserve(self.path, self.key, self.block_size, self.start)
+                self._end = self._next + self.block_size
+            if self._end - self._next >= count:
+                first = self._next
+                self._next += count
+            else:
+                first = reserve(self.path, self.key, count, self.start)
+            return range(first, first + count)
+
+    def blocks(self, rows: int, chunk_size: int) -> list[tuple[int, int]]:
+        """
+        Ids of `rows` rows taken chunk by chunk, as (first id, count) runs of consecutive ids in row order
+        """
+        blocks: list[tuple[int, int]] = []
+        for start in range(0, rows, chunk_size):
+            ids = self.take(min(chunk_size, rows - start))
+            if blocks and blocks[-1][0] + blocks[-1][1] == ids.start:
+                blocks[-1] = (blocks[-1][0], blocks[-1][1] + len(ids))
+            else:
+                blocks.append((ids.start, len(ids)))
+        return blocks
+
+    def peek(self) -> Optional[int]:
+        """
+        Next id a new reservation would get, for display
+        """
+        return _read(self.path).get(self.key)
@@ -0,0 +1,186 @@
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import pickle
+import tempfile
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+DEFAULT_MEMORY_LIMIT = 256 << 20
+# rough cost of one entry of the in-memory index: dict slot, tuple, location
+ENTRY_OVERHEAD = 160
+BLOOM_HASHES = 4
+_RUN_BATCH = 10000
+
+# () -> (value, location) pairs, called once more when the input is too large for memory
+Source = Callable[[], Iterable[tuple[Any, Any]]]
+
+
+class Duplicate(NamedTuple):
+    value: Any
+    locations: list
+
+
+def value_key(value: Any) -> Any:
+    """
+    Hashable form of a value, JSON values are compared on their canonical text
+    """
+    if isinstance(value, (str, int, float, bool)) or value is None:
+        return value
+    if isinstance(value, tuple):
+        return tuple(value_key(v) for v in value)
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+def _key_size(key: Any) -> int:
+    if type(key) is tuple:
+        return sum(len(k) if type(k) is str else 8 for k in key)
+    return len(key) if type(key) is str else 8
+
+
+def _digest(key: Any) -> bytes:
+    return hashlib.blake2b(repr(key).encode("utf-8"), digest_size=16).digest()
+
+
+class BloomFilter:
+    """
+    Bit array with `hashes` positions per value, derived from one 16 bytes digest (double hashing)
+    """
+
+    def __init__(self, size_bytes: int, hashes: int = BLOOM_HASHES):
+        self.bits = bytearray(max(size_bytes, 1))
+        self.size = len(self.bits) * 8
+        self.hashes = hashes
+
+    def _positions(self, digest: bytes) -> list[int]:
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, digest: bytes) -> bool:
+        """
+        Add a digest, True when it may have been added before
+        """
+        bits = self.bits
+        seen = True
+        for position in self._positions(digest):
+            index, mask = position >> 3, 1 << (position & 7)
+            if not bits[index] & mask:
+                seen = False
+                bits[index] |= mask
+        return seen
+
+    def __contains__(self, digest: bytes) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(digest))
+
+
+class ExternalSorter:
+    """
+    Sort records larger than memory: sorted runs are spilled to disk, then merged
+    """
+
+    def __init__(self, memory_limit: int, directory: str):
+        self.memory_limit = memory_limit
+        self.directory = directory
+        self.runs: list[str] = []
+        self._buffer: list[tuple] = []
+        self._size = 0
+
+    def add(self, record: tuple, size: int):
+        self._buffer.append(record)
+        self._size += size
+        if self._size >= self.memory_limit:
+            self._spill()
+
+    def _spill(self):
+        self._buffer.sort()
+        path = os.path.join(self.directory, f"run-{len(self.runs)}.pickle")
+        with open(path, "wb") as f:
+            for start in range(0, len(self._buffer), _RUN_BATCH):
+                pickle.dump(self._buffer[start:start + _RUN_BATCH], f, protocol=pickle.HIGHEST_PROTOCOL)
+        self.runs.append(path)
+        self._buffer = []
+        self._size = 0
+
+    @staticmethod
+    def _read_run(path: str) -> Iterator[tuple]:
+        with open(path, "rb") as f:
+            while True:
+                try:
+                    yield from pickle.load(f)
+                except EOFError:
+                    return
+
+    def __iter__(self) -> Iterator[tuple]:
+        self._buffer.sort()
+        return heapq.merge(*(self._read_run(path) for path in self.runs), self._buffer)
+
+
+def _in_memory(source: Source, memory_limit: int) -> Optional[list[Duplicate]]:
+    """
+    Duplicates found with a dict, None as soon as the index outgrows `memory_limit`
+    """
+    first: dict[Any, Any] = {}
+    duplicates: dict[Any, list] = {}
+    size = 0
+    setdefault = first.setdefault
+    for value, location in source():
+        count = len(first)
+        try:
+            # hashable values are their own key, only JSON values are converted
+            key = value
+            seen = setdefault(key, location)
+        except TypeError:
+            key = value_key(value)
+            seen = setdefault(key, location)
+        if len(first) > count:
+            size += ENTRY_OVERHEAD + _key_size(key)
+            if size > memory_limit:
+                return None
+            continue
+        size += ENTRY_OVERHEAD
+        if key in duplicates:
+            duplicates[key].append(location)
+        else:
+            duplicates[key] = [seen, location]
+    return [Duplicate(key, locations) for key, locations in duplicates.items()]
+
+
+def _external(source: Source, memory_limit: int, spill_dir: Optional[str]) -> Iterator[Duplicate]:
+    """
+    First pass: values already in a Bloom filter of all values go to a filter of candidates.
+    Second pass: only candidates, first occurrences included, are sorted on disk and grouped.
+    """
+    seen = BloomFilter(memory_limit // 2)
+    candidates = BloomFilter(memory_limit // 4)
+    for value, _ in source():
+        digest = _digest(value_key(value))
+        if seen.add(digest):
+            candidates.add(digest)
+    with tempfile.TemporaryDirectory(dir=spill_dir) as directory:
+        sorter = ExternalSorter(memory_limit // 4, directory)
+        for order, (value, location) in enumerate(source()):
+            key = value_key(value)
+            digest = _digest(key)
+            if digest in candidates:
+                # the order keeps the locations of a value in input order and avoids comparing locations
+                sorter.add((digest, repr(key), order, key, location), ENTRY_OVERHEAD + len(repr(key)))
+        for _, group in itertools.groupby(sorter, key=lambda record: (record[0], record[1])):
+            records = list(group)
+            if len(records) > 1:
+                yield Duplicate(records[0][3], [record[4] for record in records])
+
+
+def find_duplicates(source: Source, memory_limit: int = DEFAULT_MEMORY_LIMIT,
+                    spill_dir: Optional[str] = None) -> Iterator[Duplicate]:
+    """
+    Values seen more than once with all their locations. Small inputs are indexed in memory,
+    larger ones go through a Bloom filter pre-pass and an external sort bounded by `memory_limit`.
+    """
+    duplicates = _in_memory(source, memory_limit)
+    if duplicates is not None:
+        return iter(duplicates)
+    return _external(source, memory_limit, spill_dir)
@@ -0,0 +1,485 @@
+import csv
+import datetime
+import heapq
+import io
+import itertools
+import json
+import os
+import re
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional, Sequence, TextIO
+
+from src.data.generator import FORMAT_CSV, FORMATS
+from src.data.unique import DEFAULT_MEMORY_LIMIT, Source, find_duplicates, value_key
+from src.helpers.pool import bounded_map
+from src.model.meta import FieldInfo, TableInfo
+
+DEFAULT_BLOCK_SIZE = 1 << 22
+DEFAULT_MAX_VIOLATIONS = 1000
+
+REASON_REQUIRED = "required"
+REASON_TYPE = "type"
+REASON_MIN_LENGTH = "min_length"
+REASON_MAX_LENGTH = "max_length"
+REASON_PATTERN = "pattern"
+REASON_GT = "gt"
+REASON_GE = "ge"
+REASON_LT = "lt"
+REASON_LE = "le"
+REASON_DECIMAL_PLACES = "decimal_places"
+REASON_UNIQUE = "unique"
+
+_TRUE = frozenset(("true", "1", "t", "yes", "y"))
+_FALSE = frozenset(("false", "0", "f", "no", "n"))
+_UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}").fullmatch
+
+# column -> (position, reason) of each violation
+ColumnCheck = Callable[[Sequence], list[tuple[int, str]]]
+# (parsed values, their positions, raw column) -> violations
+ColumnConstraint = Callable[[list, Sequence[int], Sequence], list[tuple[int, str]]]
+
+
+class Violation(NamedTuple):
+    row: int
+    field_name: str
+    value: Any
+    reason: str
+
+
+def format_of(path: str) -> str:
+    extension = os.path.splitext(path)[1].lstrip(".").lower()
+    if extension not in FORMATS:
+        raise ValueError(f"Can not guess the format of {path}, use one of {', '.join(FORMATS)}")
+    return extension
+
+
+def _csv_bool(value: str) -> bool:
+    lowered = value.lower()
+    if lowered in _TRUE:
+        return True
+    if lowered in _FALSE:
+        return False
+    raise ValueError(value)
+
+
+def _json_of(expected: type) -> Callable[[str], Any]:
+    # the C scanner behind json.loads, without its wrappers
+    scan_once = json.JSONDecoder().scan_once
+
+    def parse(value: str) -> Any:
+        try:
+            parsed, end = scan_once(value, 0)
+        except StopIteration:
+            raise ValueError(value)
+        if end != len(value) or type(parsed) is not expected:
+            raise ValueError(value)
+        return parsed
+    return parse
+
+
+def _csv_uuid(value: str) -> str:
+    # the canonical form is matched without building a UUID
+    if _UUID(value):
+        return value
+    return str(uuid.UUID(value))
+
+
+def _typed(expected: tuple, parse: Optional[Callable] = None) -> Callable[[Any], Any]:
+    def check(value: Any) -> Any:
+        if type(value) not in expected:
+            raise ValueError(value)
+        return parse(value) if parse else value
+    return check
+
+
+# field_type -> value parser, raising ValueError/TypeError on a wrong value
+_CSV_PARSERS = {
+    "integer": int,
+    "float": float,
+    "text": str,
+    "datetime": datetime.datetime.fromisoformat,
+    "boolean": _csv_bool,
+    "json": _json_of(dict),
+    "list": _json_of(list),
+    "uuid": _csv_uuid,
+}
+_JSONL_PARSERS = {
+    "integer": _typed((int,)),
+    "float": _typed((int, float)),
+    "text": _typed((str,)),
+    "datetime": _typed((str,), datetime.datetime.fromisoformat),
+    "boolean": _typed((bool,)),
+    "json": _typed((dict,)),
+    "list": _typed((list,)),
+    "uuid": _typed((str,), uuid.UUID),
+}
+
+
+def _utc(value: datetime.datetime) -> datetime.datetime:
+    # datetimes without a time zone are taken as UTC, as the generator writes them
+    if value.tzinfo is None:
+        return value.replace(tzinfo=datetime.timezone.utc)
+    return value.astimezone(datetime.timezone.utc)
+
+
+def _epoch_millis(value: datetime.datetime) -> float:
+    """
+    A datetime as the bounds of a datetime field are given: a UTC timestamp in milliseconds
+    """
+    return _utc(value).timestamp() * 1000
+
+
+def _then(parse: Callable[[Any], Any], convert: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    return lambda value: convert(parse(value))
+
+
+def unique_key(field: FieldInfo, fmt: str = FORMAT_CSV) -> Callable[[Any], Any]:
+    """
+    Value of a field as the uniqueness check compares it, `1` and `01` are one integer.
+    Raises ValueError/TypeError on a wrong value, which the column check reports.
+    """
+    parse = (_CSV_PARSERS if fmt == FORMAT_CSV else _JSONL_PARSERS)[field.field_type]
+    field_type = field.field_type
+    if field_type == "datetime":
+        return _then(parse, lambda value: _utc(value).isoformat())
+    if field_type == "uuid":
+        return _then(parse, lambda value: str(uuid.UUID(str(value))))
+    if field_type == "float":
+        return _then(parse, float)
+    if field_type in ("json", "list"):
+        return _then(parse, value_key)
+    return parse
+
+
+def _decimal_places(value: float) -> int:
+    text = repr(value)
+    if "e" in text or "E" in text:
+        return len(f"{value:.16f}".rstrip("0").split(".")[1])
+    return len(text.split(".")[1].rstrip("0")) if "." in text else 0
+
+
+def _text_decimal_places(text: str) -> int:
+    if "e" in text or "E" in text:
+        return _decimal_places(float(text))
+    return len(text.partition(".")[2].rstrip("0"))
+
+
+def _parse_column(parse: Callable, values: Sequence, indexes: Sequence[int],
+                  violations: list[tuple[int, str]]) -> tuple[list, Sequence[int]]:
+    """
+    Parse a whole column at once, value by value only when some value is wrong
+    """
+    try:
+        return list(map(parse, values)), indexes
+    except (ValueError, TypeError):
+        pass
+    parsed = []
+    kept = []
+    for i, value in zip(indexes, values):
+        try:
+            parsed.append(parse(value))
+        except (ValueError, TypeError):
+            violations.append((i, REASON_TYPE))
+            continue
+        kept.append(i)
+    return parsed, kept
+
+
+def _bound(reason: str, accept: Callable[[Any], bool]) -> ColumnConstraint:
+    return lambda parsed, indexes, column: [(i, reason) for i, v in zip(indexes, parsed) if not accept(v)]
+
+
+def compile_field(field: FieldInfo, fmt: str = FORMAT_CSV) -> ColumnCheck:
+    """
+    Checker of one field over a column of values, returning the (position, reason) of each violation.
+    Constraints the field does not declare are not even tested, a column is parsed in one pass.
+    """
+    is_csv = fmt == FORMAT_CSV
+    parse = (_CSV_PARSERS if is_csv else _JSONL_PARSERS)[field.field_type]
+    if is_csv and field.field_type == "text":
+        parse = None
+    bounds = (field.field_gt, field.field_ge, field.field_lt, field.field_le)
+    if field.field_type == "datetime" and any(bound is not None for bound in bounds):
+        # compared with the bounds as timestamps
+        parse = _then(parse, _epoch_millis)
+    required = bool(field.field_required)
+    constraints: list[ColumnConstraint] = []
+    if field.field_type == "text":
+        if field.field_min_length is not None:
+            min_length = field.field_min_length
+            constraints.append(_bound(REASON_MIN_LENGTH, lambda v: len(v) >= min_length))
+        if field.field_max_length is not None:
+            max_length = field.field_max_length
+            constraints.append(_bound(REASON_MAX_LENGTH, lambda v: len(v) <= max_length))
+        if field.field_pattern:
+            search = re.compile(field.field_pattern).search
+            constraints.append(_bound(REASON_PATTERN, search))
+    elif field.field_type in ("integer", "float", "datetime"):
+        if field.field_gt is not None:
+            gt = field.field_gt
+            constraints.append(_bound(REASON_GT, lambda v: v > gt))
+        if field.field_ge is not None:
+            ge = field.field_ge
+            constraints.append(_bound(REASON_GE, lambda v: v >= ge))
+        if field.field_lt is not None:
+            lt = field.field_lt
+            constraints.append(_bound(REASON_LT, lambda v: v < lt))
+        if field.field_le is not None:
+            le = field.field_le
+            constraints.append(_bound(REASON_LE, lambda v: v <= le))
+        if field.field_type == "float" and field.field_decimal_places is not None:
+            places = field.field_decimal_places
+            if is_csv:
+                # counted on the text, as written in the file
+                constraints.append(lambda parsed, indexes, column: [
+                    (i, REASON_DECIMAL_PLACES) for i in indexes if _text_decimal_places(column[i]) > places
+                ])
+            else:
+                constraints.append(_bound(REASON_DECIMAL_PLACES, lambda v: _decimal_places(v) <= places))
+
+    def check(column: Sequence) -> list[tuple[int, str]]:
+        violations = []
+        missing = None
+        # membership tests run in C, most columns have no empty value to locate
+        if is_csv and ("" in column or None in column):
+            missing = [i for i, v in enumerate(column) if not v]
+        elif not is_csv and None in column:
+            missing = [i for i, v in enumerate(column) if v is None]
+        if missing:
+            if required:
+                violations.extend((i, REASON_REQUIRED) for i in missing)
+            skipped = set(missing)
+            indexes = [i for i in range(len(column)) if i not in skipped]
+            values = [column[i] for i in indexes]
+        else:
+            indexes = range(len(column))
+            values = column
+        if parse is not None:
+            values, indexes = _parse_column(parse, values, indexes, violations)
+        for constraint in constraints:
+            violations.extend(constraint(values, indexes, column))
+        return violations
+    return check
+
+
+class RowChecker:
+    """
+    A TableInfo compiled once into per-column checks. CSV rows are lists ordered by `header`,
+    JSONL rows are dicts. Rows are checked a block at a time, column by column.
+    """
+
+    def __init__(self, table: TableInfo, fmt: str = FORMAT_CSV, header: Optional[list[str]] = None):
+        self.table = table
+        self.fmt = fmt
+        self.missing: list[str] = []
+        self.unknown: list[str] = []
+        self.width = len(header or [])
+        fields = table.table_fields or []
+        if fmt == FORMAT_CSV:
+            positions = {name: i for i, name in enumerate(header or [])}
+            self.missing = [f.field_name for f in fields if f.field_name not in positions]
+            names = {f.field_name for f in fields}
+            self.unknown = [name for name in header or [] if name not in names]
+            self.columns = [
+                (positions[f.field_name], f.field_name, compile_field(f, fmt))
+                for f in fields if f.field_name in positions
+            ]
+        else:
+            self.columns = [(f.field_name, f.field_name, compile_field(f, fmt)) for f in fields]
+
+    def check(self, rows: Iterable, start: int, max_violations: int) -> tuple[int, Counter, list[Violation]]:
+        """
+        Count violations of `rows`, keep at most `max_violations` of them. `start` is the number of the first row.
+        """
+        rows = rows if isinstance(rows, list) else list(rows)
+        counts = Counter()
+        if not rows:
+            return 0, counts, []
+        if self.fmt == FORMAT_CSV:
+            width = self.width
+            if any(len(row) < width for row in rows):
+                rows = [row + [None] * (width - len(row)) if len(row) < width else row for row in rows]
+            transposed = list(zip(*rows))
+
+            def column_of(position: int) -> Sequence:
+                return transposed[position]
+        else:
+            def column_of(key: str) -> Sequence:
+                return [row.get(key) for row in rows]
+        found = []
+        for key, name, check in self.columns:
+            column = column_of(key)
+            for i, reason in check(column):
+                counts[(name, reason)] += 1
+                found.append((i, name, column[i], reason))
+        found.sort(key=lambda violation: violation[0])
+        violations = [Violation(start + i, name, value, reason) for i, name, value, reason in found[:max_violations]]
+        return len(rows), counts, violations
+
+
+class ValidationReport:
+
+    def __init__(self, table_name: str, max_violations: int = DEFAULT_MAX_VIOLATIONS):
+        self.table_name = table_name
+        self.max_violations = max_violations
+        self.rows = 0
+        self.counts: Counter = Counter()
+        self.violations: list[Violation] = []
+        self.missing_columns: list[str] = []
+        self.unknown_columns: list[str] = []
+
+    def add(self, rows: int, counts: Counter, violations: list[Violation]):
+        """
+        Add the result of the next block, its violations are numbered from 1 within the block
+        """
+        if violations and self.rows:
+            violations = [v._replace(row=v.row + self.rows) for v in violations[:self.max_violations - len(self.violations)]]
+        self.rows += rows
+        self.counts.update(counts)
+        self.violations.extend(violations[:self.max_violations - len(self.violations)])
+
+    def add_violations(self, violations: Iterable[Violation]):
+        """
+        Add violations found after the blocks, all are counted and the listed ones stay in row order
+        """
+        def counted() -> Iterator[Violation]:
+            for violation in violations:
+                self.counts[(violation.field_name, violation.reason)] += 1
+                yield violation
+        first = heapq.nsmallest(self.max_violations, counted(), key=lambda violation: violation.row)
+        merged = heapq.merge(self.violations, first, key=lambda violation: violation.row)
+        self.violations = list(itertools.islice(merged, self.max_violations))
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.total and not self.missing_columns
+
+    def summary(self) -> list[list]:
+        return [[name, reason, count] for (name, reason), count in sorted(self.counts.items())]
+
+
+def iter_blocks(f: TextIO, block_size: int, fmt: str) -> Iterator[str]:
+    """
+    Blocks of about `block_size` characters ending with a whole record. A CSV block never ends
+    inside a quoted value, which may span several lines.
+    """
+    while True:
+        block = f.read(block_size)
+        if not block:
+            return
+        parts = [block, f.readline()]
+        if fmt == FORMAT_CSV:
+            quotes = block.count('"') + parts[-1].count('"')
+            while quotes % 2:
+                line = f.readline()
+                if not line:
+                    break
+                parts.append(line)
+                quotes += line.count('"')
+        yield "".join(parts)
+
+
+def parse_block(text: str, fmt: str) -> Iterable:
+    if fmt == FORMAT_CSV:
+        return csv.reader(io.StringIO(text))
+    return [json.loads(line) for line in text.splitlines() if line and not line.isspace()]
+
+
+_worker_checker: Optional[RowChecker] = None
+
+
+def _init_worker(table: dict, fmt: str, header: Optional[list[str]]):
+    global _worker_checker
+    _worker_checker = RowChecker(TableInfo(**table), fmt, header)
+
+
+def _check_block(args: tuple[str, int]) -> tuple[int, Counter, list[Violation]]:
+    text, max_violations = args
+    return _worker_checker.check(parse_block(text, _worker_checker.fmt), 1, max_violations)
+
+
+def _unique_values(path: str, fmt: str, block_size: int, columns: list[tuple[Any, str, Callable]]) -> Source:
+    """
+    ((field name, value), row number) of the non empty values of unique columns, read again on each call.
+    Values are compared by `unique_key`, wrong values are left to the column checks.
+    """
+    def source() -> Iterator[tuple[tuple[str, Any], int]]:
+        with open(path, newline="" if fmt == FORMAT_CSV else None) as f:
+            if fmt == FORMAT_CSV:
+                f.readline()
+            row_number = 0
+            for text in iter_blocks(f, block_size, fmt):
+                for row in parse_block(text, fmt):
+                    row_number += 1
+                    for key, name, unique_key_of in columns:
+                        if fmt == FORMAT_CSV:
+                            value = row[key] if key < len(row) else None
+                        else:
+                            value = row.get(key)
+                        if value is None or value == "":
+                            continue
+                        try:
+                            yield (name, unique_key_of(value)), row_number
+                        except (ValueError, TypeError):
+                            continue
+    return source
+
+
+def check_unique(path: str, checker: RowChecker, report: ValidationReport, block_size: int = DEFAULT_BLOCK_SIZE,
+                 memory_limit: int = DEFAULT_MEMORY_LIMIT, spill_dir: Optional[str] = None):
+    """
+    Report every occurrence after the first of a value of a unique field, empty values excepted
+    """
+    unique = {f.field_name: f for f in checker.table.table_fields or [] if f.field_unique}
+    columns = [
+        (key, name, unique_key(unique[name], checker.fmt)) for key, name, _ in checker.columns if name in unique
+    ]
+    if not columns:
+        return
+    source = _unique_values(path, checker.fmt, block_size, columns)
+
+    def violations() -> Iterator[Violation]:
+        for duplicate in find_duplicates(source, memory_limit, spill_dir):
+            name, value = duplicate.value
+            for row_number in duplicate.locations[1:]:
+                yield Violation(row_number, name, value, REASON_UNIQUE)
+    report.add_violations(violations())
+
+
+def validate_file(path: str, table: TableInfo, fmt: Optional[str] = None, workers: Optional[int] = None,
+                  block_size: int = DEFAULT_BLOCK_SIZE, max_violations: int = DEFAULT_MAX_VIOLATIONS,
+                  memory_limit: int = DEFAULT_MEMORY_LIMIT, spill_dir: Optional[str] = None) -> ValidationReport:
+    """
+    Check every row of a CSV/JSONL data file against `table`, blocks of rows are checked by a process pool.
+    Unique fields are checked afterwards over the whole file.
+    """
+    fmt = fmt or format_of(path)
+    report = ValidationReport(table.table_name, max_violations)
+    with open(path, newline="" if fmt == FORMAT_CSV else None) as f:
+        header = None
+        if fmt == FORMAT_CSV:
+            header = next(csv.reader([f.readline()]), [])
+        checker = RowChecker(table, fmt, header)
+        report.missing_columns = checker.missing
+        report.unknown_columns = checker.unknown
+        blocks = iter_blocks(f, block_size, fmt)
+        # a single block is not worth starting processes
+        head = list(itertools.islice(blocks, 2))
+        if len(head) < 2 or workers == 1:
+            for text in itertools.chain(head, blocks):
+                report.add(*checker.check(parse_block(text, fmt), 1, max_violations))
+        else:
+            workers = workers or os.cpu_count() or 1
+            initargs = (table.model_dump(mode="json"), fmt, header)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as executor:
+                items = ((text, max_violations) for text in itertools.chain(head, blocks))
+                for result in bounded_map(executor, _check_block, items, window=2 * workers):
+                    report.add(*result)
+    check_unique(path, checker, report, block_size, memory_limit, spill_dir)
+    return report
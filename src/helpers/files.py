@@ -1,11 +1,13 @@
-from os import listdir
+from os import listdir, scandir
 from os.path import isfile, join
 
 
 def ls_all_files_in_directory(directory: str) -> [str]:
-    for f in listdir(directory):
-        if isfile(join(directory, f)):
-            yield directory, f
+    # the entry type comes with the listing, no stat per file
+    with scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                yield directory, entry.name
 
 
 def ls_all_directories_in_directory(directory: str) -> [str]:
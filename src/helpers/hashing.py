@@ -0,0 +1,14 @@
+import hashlib
+import json
+from typing import Any
+
+
+def digest(payload: str) -> str:
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def content_hash(value: Any) -> str:
+    """
+    Digest of a JSON value, independent of its key order
+    """
+    return digest(json.dumps(value, sort_keys=True, separators=(",", ":"), default=str))
@@ -0,0 +1,70 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from src.helpers.metrics import metrics
+
+_POLL_INTERVAL = 0.001
+_MAX_POLL_INTERVAL = 0.05
+
+lock_wait_seconds = metrics.histogram("lock_wait_seconds", "Time processes waited for a file lock")
+
+
+class LockTimeout(Exception):
+    pass
+
+
+def _try_lock(fd: int) -> bool:
+    if fcntl is not None:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return False
+        return True
+    os.lseek(fd, 0, os.SEEK_SET)
+    try:
+        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+    except OSError:
+        return False
+    return True
+
+
+def _unlock(fd: int):
+    if fcntl is None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+    # with flock, closing the descriptor releases the lock, also when the process dies
+
+
+@contextmanager
+def file_lock(path: str, timeout: Optional[float] = None) -> Iterator[None]:
+    """
+    Exclusive advisory lock between processes held on `path`, waiting at most `timeout` seconds for it.
+    flock where it exists, msvcrt on Windows.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        with lock_wait_seconds.time():
+            if timeout is None and fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                deadline = None if timeout is None else time.monotonic() + timeout
+                interval = _POLL_INTERVAL
+                while not _try_lock(fd):
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise LockTimeout(f"{path} is still locked after {timeout}s")
+                    time.sleep(interval)
+                    interval = min(interval * 2, _MAX_POLL_INTERVAL)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
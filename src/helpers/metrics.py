@@ -0,0 +1,209 @@
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+FORMAT_JSON = "json"
+FORMAT_PROMETHEUS = "prometheus"
+METRICS_FORMATS = (FORMAT_JSON, FORMAT_PROMETHEUS)
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+def _labels_key(labels: dict) -> tuple:
+    return tuple(sorted(labels.items())) if labels else ()
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels_text(key: tuple, extra: str = "") -> str:
+    labels = [f'{name}="{_escape(value)}"' for name, value in key]
+    if extra:
+        labels.append(extra)
+    return "{" + ",".join(labels) + "}" if labels else ""
+
+
+class _Sharded:
+    """
+    Values kept per thread: an update only touches the shard of its own thread, without any lock.
+    The lock is only taken to register a new shard and to read all of them.
+    """
+
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+
+class Counter(_Sharded):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        shard = self._shard()
+        key = _labels_key(labels)
+        shard[key] = shard.get(key, 0) + amount
+
+    def values(self) -> dict[tuple, float]:
+        totals = {}
+        with self._lock:
+            for shard in self._shards:
+                for key, value in list(shard.items()):
+                    totals[key] = totals.get(key, 0) + value
+        return totals
+
+
+class Histogram(_Sharded):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, help)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        shard = self._shard()
+        key = _labels_key(labels)
+        state = shard.get(key)
+        if state is None:
+            # bucket counts, +Inf last, then sum
+            state = shard[key] = [0] * (len(self.buckets) + 1) + [0.0]
+        state[bisect.bisect_left(self.buckets, value)] += 1
+        state[-1] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def values(self) -> dict[tuple, list]:
+        totals = {}
+        with self._lock:
+            for shard in self._shards:
+                for key, state in list(shard.items()):
+                    total = totals.setdefault(key, [0] * len(state))
+                    for i, value in enumerate(state):
+                        total[i] += value
+        return totals
+
+
+class Gauge:
+    """
+    Value read when the metrics are dumped, e.g. the hit rate of a cache
+    """
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, func: Callable[[], Optional[float]]):
+        self.name = name
+        self.help = help
+        self.func = func
+
+    def values(self) -> dict[tuple, float]:
+        value = self.func()
+        return {} if value is None else {(): value}
+
+    def reset(self):
+        pass
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics: dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory: Callable[[], object]):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, factory())
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(name, lambda: Counter(name, help))
+
+    def histogram(self, name: str, help: str = "", buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(name, lambda: Histogram(name, help, buckets))
+
+    def gauge(self, name: str, func: Callable[[], Optional[float]], help: str = "") -> Gauge:
+        return self._get(name, lambda: Gauge(name, help, func))
+
+    def reset(self):
+        for metric in self._metrics.values():
+            metric.reset()
+
+    def to_json(self) -> dict:
+        data = {}
+        for name, metric in sorted(self._metrics.items()):
+            samples = []
+            for key, value in metric.values().items():
+                sample = {"labels": dict(key)}
+                if metric.kind == "histogram":
+                    sample.update(
+                        buckets=dict(zip([*map(str, metric.buckets), "+Inf"], value[:-1])),
+                        sum=value[-1], count=sum(value[:-1]),
+                    )
+                else:
+                    sample["value"] = value
+                samples.append(sample)
+            if samples:
+                data[name] = {"type": metric.kind, "help": metric.help, "samples": samples}
+        return data
+
+    def to_prometheus(self) -> str:
+        lines = []
+        for name, metric in sorted(self._metrics.items()):
+            values = metric.values()
+            if not values:
+                continue
+            if metric.help:
+                lines.append(f"# HELP {name} {metric.help}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            for key, value in sorted(values.items()):
+                if metric.kind != "histogram":
+                    lines.append(f"{name}{_labels_text(key)} {value}")
+                    continue
+                cumulative = 0
+                for bound, count in zip([*map(str, metric.buckets), "+Inf"], value[:-1]):
+                    cumulative += count
+                    le = f'le="{bound}"'
+                    lines.append(f"{name}_bucket{_labels_text(key, le)} {cumulative}")
+                lines.append(f"{name}_sum{_labels_text(key)} {value[-1]}")
+                lines.append(f"{name}_count{_labels_text(key)} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, fmt: str = FORMAT_JSON) -> str:
+        if fmt == FORMAT_PROMETHEUS:
+            return self.to_prometheus()
+        return json.dumps(self.to_json(), indent=2)
+
+
+metrics = MetricsRegistry()
+
+
+def hit_rate(hits: Callable[[], int], misses: Callable[[], int]) -> Callable[[], Optional[float]]:
+    def rate() -> Optional[float]:
+        total = hits() + misses()
+        return hits() / total if total else None
+    return rate
@@ -0,0 +1,17 @@
+from collections import deque
+from concurrent.futures import Executor
+from typing import Callable, Iterable, Iterator
+
+
+def bounded_map(executor: Executor, func: Callable, items: Iterable, window: int) -> Iterator:
+    """
+    executor.map keeping at most `window` items in flight, the input is never read ahead entirely
+    and the results are never held all at once
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
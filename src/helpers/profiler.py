@@ -0,0 +1,109 @@
+import cProfile
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Iterator, Optional
+
+_DISABLED = nullcontext()
+
+
+class Profiler:
+    """
+    Wall time spent in named phases. A span nested in another one is subtracted from the self time
+    of its parent, so self times add up to the profiled time. Disabled, a span costs one attribute lookup.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.trace = False
+        # name -> [calls, total seconds, self seconds]
+        self.stats: dict[str, list] = {}
+        self.events: list[dict] = []
+        self.started = 0.0
+        self.elapsed = 0.0
+        self._local = threading.local()
+        self._cprofile: Optional[cProfile.Profile] = None
+
+    def start(self, trace: bool = False, cprofile: bool = False):
+        self.enabled = True
+        self.trace = trace
+        self.stats.clear()
+        self.events.clear()
+        if cprofile:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+        self.started = time.perf_counter()
+
+    def stop(self) -> float:
+        if self.enabled:
+            self.elapsed = time.perf_counter() - self.started
+            self.enabled = False
+            if self._cprofile is not None:
+                self._cprofile.disable()
+        return self.elapsed
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _DISABLED
+        return self._span(name)
+
+    @contextmanager
+    def _span(self, name: str) -> Iterator[None]:
+        stack = self._local.__dict__.setdefault("stack", [])
+        # child time of the span, added by the spans nested in it
+        frame = [0.0]
+        stack.append(frame)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            stack.pop()
+            if stack:
+                stack[-1][0] += duration
+            stat = self.stats.setdefault(name, [0, 0.0, 0.0])
+            stat[0] += 1
+            stat[1] += duration
+            stat[2] += duration - frame[0]
+            if self.trace:
+                self.events.append({
+                    "name": name, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+                    "ts": (start - self.started) * 1e6, "dur": duration * 1e6,
+                })
+
+    def breakdown(self) -> list[list]:
+        """
+        [phase, calls, total ms, self ms, % of the profiled time] rows, slowest phase first
+        """
+        elapsed = self.elapsed or 1e-9
+        rows = [
+            [name, calls, round(total * 1000, 2), round(self_time * 1000, 2), round(self_time / elapsed * 100, 1)]
+            for name, (calls, total, self_time) in self.stats.items()
+        ]
+        rows.sort(key=lambda row: row[3], reverse=True)
+        untracked = elapsed - sum(self_time for _, _, self_time in self.stats.values())
+        rows.append(["(outside spans)", "", "", round(untracked * 1000, 2), round(untracked / elapsed * 100, 1)])
+        return rows
+
+    def dump_stats(self, path: str):
+        """
+        cProfile statistics, readable with pstats or snakeviz
+        """
+        if self._cprofile is not None:
+            self._cprofile.dump_stats(path)
+
+    def dump_trace(self, path: str):
+        """
+        Chrome trace-event JSON, opened by chrome://tracing or Perfetto
+        """
+        with open(path, "w") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+profiler = Profiler()
+
+
+def span(name: str):
+    return profiler.span(name)
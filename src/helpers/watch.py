@@ -0,0 +1,154 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+from typing import Callable, Optional
+
+DEFAULT_DEBOUNCE = 0.3
+DEFAULT_POLL_INTERVAL = 1.0
+# a burst of events never delays the reload more than this
+MAX_DEBOUNCE_WAIT = 5.0
+
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_MODIFY
+
+
+class PollingWatcher:
+    """
+    Changed files found by comparing (mtime, size) of the directory entries between two scans.
+    One scandir per interval, no file is opened.
+    """
+
+    def __init__(self, path: str, interval: float = DEFAULT_POLL_INTERVAL):
+        self.path = path
+        self.interval = interval
+        self._state = self._scan()
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        if os.path.isfile(self.path):
+            stat = os.stat(self.path)
+            return {self.path: (stat.st_mtime_ns, stat.st_size)}
+        state = {}
+        try:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        state[os.path.join(self.path, entry.name)] = (stat.st_mtime_ns, stat.st_size)
+        except FileNotFoundError:
+            pass
+        return state
+
+    def changes(self, timeout: Optional[float]) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            state = self._scan()
+            changed = {path for path in state.keys() | self._state.keys() if state.get(path) != self._state.get(path)}
+            self._state = state
+            if changed:
+                return changed
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            delay = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            time.sleep(max(delay, 0))
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    Changed files reported by the kernel (Linux inotify through libc), no scan at all
+    """
+
+    def __init__(self, path: str):
+        libc_name = ctypes.util.find_library("c")
+        if libc_name is None:
+            raise OSError("libc not found")
+        libc = ctypes.CDLL(libc_name, use_errno=True)
+        if not hasattr(libc, "inotify_init1"):
+            raise OSError("inotify is not available")
+        self.path = path
+        # a file is watched through its directory, editors replace files instead of writing them
+        self.directory = os.path.dirname(path) if os.path.isfile(path) else path
+        self._only = path if os.path.isfile(path) else None
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(self._fd, os.fsencode(self.directory or "."), _MASK) < 0:
+            os.close(self._fd)
+            raise OSError(ctypes.get_errno(), f"Can not watch {self.directory}")
+
+    def _read(self) -> set[str]:
+        changed = set()
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                _, _, _, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                if name:
+                    path = os.path.join(self.directory, os.fsdecode(name))
+                    if self._only is None or path == self._only:
+                        changed.add(path)
+
+    def changes(self, timeout: Optional[float]) -> set[str]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            ready, _, _ = select.select([self._fd], [], [], remaining)
+            if not ready:
+                return set()
+            changed = self._read()
+            if changed:
+                return changed
+
+    def close(self):
+        os.close(self._fd)
+
+
+def make_watcher(path: str, poll_interval: float = DEFAULT_POLL_INTERVAL, polling: bool = False):
+    """
+    inotify where the platform has it, mtime polling otherwise
+    """
+    if not polling:
+        try:
+            return InotifyWatcher(path)
+        except (OSError, AttributeError):
+            pass
+    return PollingWatcher(path, poll_interval)
+
+
+def watch(path: str, on_change: Callable[[set[str]], None], debounce: float = DEFAULT_DEBOUNCE,
+          poll_interval: float = DEFAULT_POLL_INTERVAL, polling: bool = False):
+    """
+    Call `on_change` with the files changed under `path` until interrupted. Events are collected
+    until none arrives for `debounce` seconds, so a mass edit triggers one call.
+    """
+    watcher = make_watcher(path, poll_interval, polling)
+    try:
+        while True:
+            changed = watcher.changes(None)
+            started = time.monotonic()
+            while time.monotonic() - started < MAX_DEBOUNCE_WAIT:
+                more = watcher.changes(debounce)
+                if not more:
+                    break
+                changed |= more
+            on_change(changed)
+    finally:
+        watcher.close()
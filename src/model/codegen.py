@@ -0,0 +1,254 @@
+import json
+import keyword
+import os
+from typing import Iterable, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from src.model.diff import table_hash
+from src.model.meta import DatasourceDocs, FieldInfo, TableInfo
+from src.model.storage import write_atomic
+
+# increased when the generated code changes, every module is generated again
+CODEGEN_VERSION = 2
+CODEGEN_MANIFEST = ".codegen-manifest.json"
+
+# field_type -> (annotation, import it needs)
+TYPES = {
+    "integer": ("int", None),
+    "float": ("float", None),
+    "text": ("str", None),
+    "datetime": ("datetime.datetime", "import datetime"),
+    "boolean": ("bool", None),
+    "json": ("dict", None),
+    "list": ("list", None),
+    "uuid": ("uuid.UUID", "import uuid"),
+}
+DECIMAL = ("Decimal", "from decimal import Decimal")
+
+_LENGTH = {"str", "list", "dict"}
+_NUMBER = {"int", "float", "Decimal"}
+# FieldInfo attribute -> (pydantic Field argument, annotations it applies to),
+# pydantic refuses to build a model with a constraint its type does not support
+CONSTRAINTS = {
+    "field_min_length": ("min_length", _LENGTH),
+    "field_max_length": ("max_length", _LENGTH),
+    "field_pattern": ("pattern", {"str"}),
+    "field_gt": ("gt", _NUMBER),
+    "field_ge": ("ge", _NUMBER),
+    "field_lt": ("lt", _NUMBER),
+    "field_le": ("le", _NUMBER),
+    "field_decimal_places": ("decimal_places", {"Decimal"}),
+}
+
+# names a field can not take in a generated class: pydantic attributes and the names the module imports
+_RESERVED = set(dir(BaseModel)) | {
+    "to_row", "datetime", "uuid", "Decimal", "Optional", "dataclass", "dataclasses", "BaseModel", "ConfigDict", "Field",
+}
+
+
+class CodegenResult(NamedTuple):
+    path: str
+    generated: list[str]
+    unchanged: int
+    removed: list[str]
+
+
+def class_name(table_name: str) -> str:
+    return "".join(part[:1].upper() + part[1:] for part in table_name.split("_"))
+
+
+def attribute_name(name: str) -> str:
+    """
+    Python name of a documented field or table, keywords and pydantic attributes get a trailing underscore
+    """
+    if keyword.iskeyword(name) or name in _RESERVED:
+        return f"{name}_"
+    return name
+
+
+def module_name(table_name: str) -> str:
+    return attribute_name(table_name.lower())
+
+
+class _Field(NamedTuple):
+    name: str
+    annotation: str
+    # source of the default value, None when the field has none
+    default: Optional[str]
+    arguments: list[str]
+    # the default is a dict or a list, each instance gets its own copy
+    mutable: bool = False
+
+
+def _field(field: FieldInfo, imports: set[str]) -> _Field:
+    annotation, requirement = TYPES[field.field_type]
+    if field.field_type == "float" and field.field_decimal_places is not None:
+        # as the DDL: a float with decimal places is a decimal
+        annotation, requirement = DECIMAL
+    if requirement:
+        imports.add(requirement)
+    arguments = []
+    for attribute, (argument, annotations) in CONSTRAINTS.items():
+        value = getattr(field, attribute)
+        if value is not None and annotation in annotations:
+            arguments.append(f"{argument}={value!r}")
+    name = attribute_name(field.field_name)
+    alias = field.field_alias or (field.field_name if name != field.field_name else None)
+    if alias:
+        arguments.append(f"alias={alias!r}")
+    if field.field_unique:
+        # checked across rows, by the data source
+        arguments.append('json_schema_extra={"unique": True}')
+    default = None
+    value = field.field_default_value
+    if isinstance(value, (dict, list)):
+        default = f"lambda: {value!r}"
+    elif value is not None:
+        default = repr(value)
+    elif not field.field_required:
+        default = "None"
+    if not field.field_required:
+        imports.add("from typing import Optional")
+        annotation = f"Optional[{annotation}]"
+    return _Field(name, annotation, default, arguments, isinstance(value, (dict, list)))
+
+
+def _row_line(field: _Field) -> str:
+    if field.default is None:
+        return f"    {field.name}: {field.annotation}"
+    if field.mutable:
+        return f"    {field.name}: {field.annotation} = dataclasses.field(default_factory={field.default})"
+    return f"    {field.name}: {field.annotation} = {field.default}"
+
+
+def _model_line(field: _Field) -> str:
+    arguments = list(field.arguments)
+    if field.default is not None:
+        arguments.insert(0, f"default_factory={field.default}" if field.mutable else f"default={field.default}")
+    if not arguments:
+        return f"    {field.name}: {field.annotation}"
+    return f"    {field.name}: {field.annotation} = Field({', '.join(arguments)})"
+
+
+def generate_module(table: TableInfo, content_hash: str) -> str:
+    """
+    Source of the module of one table: a slotted dataclass for rows, and a pydantic model checking the
+    documented constraints which converts to it
+    """
+    imports = set()
+    fields = [_field(field, imports) for field in table.table_fields or []]
+    name = class_name(table.table_name)
+    imports.add("from dataclasses import dataclass")
+    if any(f.mutable for f in fields):
+        imports.add("import dataclasses")
+    stdlib = sorted(i for i in imports if i.startswith("import ")) + sorted(i for i in imports if i.startswith("from "))
+    foreign_keys = "".join(
+        f"\n    ({fk.field_name!r}, {fk.fk_table_name!r}, {fk.fk_field_name!r}),"
+        for fk in table.table_foreign_keys or []
+    )
+    row_body = "\n".join(_row_line(f) for f in fields) or "    pass"
+    model_body = "\n".join(_model_line(f) for f in fields)
+    to_row = "".join(f"\n            {f.name}=self.{f.name}," for f in fields)
+    return f'''# Generated by the codegen command from the docs of table {table.table_name}, do not edit.
+{chr(10).join(stdlib)}
+
+from pydantic import BaseModel, ConfigDict, Field
+
+TABLE_NAME = {table.table_name!r}
+CONTENT_HASH = {content_hash!r}
+# (field, referenced table, referenced field)
+FOREIGN_KEYS = ({foreign_keys}{chr(10) if foreign_keys else ""})
+
+
+@dataclass(slots=True, kw_only=True)
+class {name}Row:
+{row_body}
+
+
+class {name}Model(BaseModel):
+    model_config = ConfigDict(populate_by_name=True, protected_namespaces=())
+
+{model_body + chr(10) + chr(10) if model_body else ""}    def to_row(self) -> {name}Row:
+        return {name}Row({to_row}{chr(10) + "        " if to_row else ""})
+'''
+
+
+def generate_package(tables: dict[str, str]) -> str:
+    """
+    `__init__.py` of the generated package, table name -> module name. Modules are imported on demand.
+    """
+    names = ",\n".join(f"    {table_name!r}: {module!r}" for table_name, module in sorted(tables.items()))
+    return f'''# Generated by the codegen command, do not edit.
+import importlib
+
+MODULES = {{
+{names + "," if names else ""}
+}}
+
+
+def load(table_name: str):
+    return importlib.import_module(f"{{__name__}}.{{MODULES[table_name]}}")
+'''
+
+
+class CodeGenerator:
+    """
+    Python package of the tables of a namespace, one module per table. The manifest of the package keeps
+    the content hash each module was generated from, an unchanged table is not generated again.
+    """
+
+    def __init__(self, out_dir: str, force: bool = False):
+        self.out_dir = out_dir
+        self.force = force
+        self.manifest_path = os.path.join(out_dir, CODEGEN_MANIFEST)
+
+    def _load_manifest(self) -> dict:
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return {}
+        return manifest.get("modules", {}) if manifest.get("version") == CODEGEN_VERSION else {}
+
+    def generate(self, tables: Iterable[TableInfo]) -> CodegenResult:
+        os.makedirs(self.out_dir, exist_ok=True)
+        known = self._load_manifest()
+        modules = {}
+        generated = []
+        unchanged = 0
+        taken = set()
+        for table in tables:
+            module = module_name(table.table_name)
+            # table names only differing by case share a module name
+            while module in taken:
+                module = f"{module}_"
+            taken.add(module)
+            content_hash = table_hash(table.model_dump())
+            modules[table.table_name] = [module, content_hash]
+            path = os.path.join(self.out_dir, f"{module}.py")
+            if not self.force and known.get(table.table_name) == [module, content_hash] and os.path.exists(path):
+                unchanged += 1
+                continue
+            # an interrupted run leaves the previous module whole, it still matches the previous manifest
+            write_atomic(path, generate_module(table, content_hash).encode("utf-8"))
+            generated.append(path)
+        live = {module for module, _ in modules.values()}
+        removed = []
+        for module in {module for module, _ in known.values()} - live:
+            path = os.path.join(self.out_dir, f"{module}.py")
+            if os.path.exists(path):
+                os.remove(path)
+                removed.append(path)
+        if generated or removed or known.keys() != modules.keys():
+            write_atomic(
+                os.path.join(self.out_dir, "__init__.py"),
+                generate_package({table_name: module for table_name, (module, _) in modules.items()}),
+            )
+        write_atomic(self.manifest_path, json.dumps({"version": CODEGEN_VERSION, "modules": modules}))
+        return CodegenResult(self.out_dir, generated, unchanged, removed)
+
+
+def write_package(out_dir: str, docs: DatasourceDocs, force: bool = False) -> CodegenResult:
+    return CodeGenerator(out_dir, force).generate(docs.tables.values())
+
@@ -0,0 +1,91 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Optional
+
+from src.model.index import NameIndex
+from src.model.intern import dump_shared_tables, field_pool
+from src.model.locking import NamespaceWrite, namespace_writer
+from src.model.storage import (
+    COMPACTION_KEY, RE_TABLE_INFO, is_compacted, ls_doc_files, namespace_of, read_table_docs,
+)
+
+COMPACTION_VERSION = 1
+NAMESPACE_SEPARATOR = "-tableinfo-"
+
+
+class CompactionResult(NamedTuple):
+    namespace: str
+    path: str
+    # merged files, the compacted file itself excluded
+    merged: list[str]
+    tables: int
+    # tables found in several files, the one of the most recently modified file is kept
+    conflicts: list[str]
+    # name index postings of the compacted file
+    postings: list[list]
+
+
+def compacted_path(directory: str, namespace: str) -> str:
+    return os.path.join(directory, f"{namespace}{NAMESPACE_SEPARATOR}compacted.json")
+
+
+def list_namespaces(directory: str) -> list[str]:
+    namespaces = {namespace_of(file_path) for file_path in ls_doc_files(directory, RE_TABLE_INFO)}
+    return sorted(namespaces - {None})
+
+
+def compact_namespace(directory: str, namespace: str, compact: bool = False) -> CompactionResult:
+    """
+    Merge the tableinfo files of one namespace into its compacted file and remove them.
+    A table found in several files is taken from the most recently modified one.
+    """
+    with namespace_writer(directory, namespace) as write:
+        return _compact_locked(directory, namespace, compact, write)
+
+
+def _compact_locked(directory: str, namespace: str, compact: bool, write: NamespaceWrite) -> CompactionResult:
+    path = compacted_path(directory, namespace)
+    files = [
+        os.path.normpath(file_path) for file_path in ls_doc_files(directory, RE_TABLE_INFO, namespace)
+        if namespace_of(file_path) == namespace
+    ]
+    mtimes = {file_path: os.stat(file_path).st_mtime_ns for file_path in files}
+    tables = {}
+    seen_in = {}
+    for file_path in sorted(files, key=lambda f: (mtimes[f], not is_compacted(f), f)):
+        for table in read_table_docs(file_path):
+            # nothing is written when one document is invalid
+            table = field_pool.table(table)
+            tables[table.table_name] = table
+            seen_in.setdefault(table.table_name, set()).add(file_path)
+    merged = [file_path for file_path in files if file_path != os.path.normpath(path)]
+    postings = NameIndex.postings_of(os.path.normpath(path), (table.model_dump() for table in tables.values()))
+    if not merged:
+        return CompactionResult(namespace, path, merged, len(tables), [], postings)
+    header = {
+        COMPACTION_KEY: {
+            "version": COMPACTION_VERSION,
+            "sources": {os.path.basename(file_path): mtimes[file_path] for file_path in merged},
+        }
+    }
+    write.write(path, dump_shared_tables(tables.values(), compact=compact, header=header))
+    for file_path in merged:
+        write.remove(file_path)
+    conflicts = sorted(name for name, sources in seen_in.items() if len(sources) > 1)
+    return CompactionResult(namespace, path, merged, len(tables), conflicts, postings)
+
+
+def _compact_namespace(args: tuple) -> CompactionResult:
+    return compact_namespace(*args)
+
+
+def compact_directory(directory: str, namespaces: list[str], compact: bool = False,
+                      workers: Optional[int] = None) -> list[CompactionResult]:
+    """
+    Compact several namespaces of a directory, in parallel processes
+    """
+    tasks = [(directory, namespace, compact) for namespace in namespaces]
+    if len(tasks) > 1 and workers != 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(_compact_namespace, tasks))
+    return [compact_namespace(*task) for task in tasks]
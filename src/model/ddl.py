@@ -0,0 +1,258 @@
+import json
+from typing import Any, Callable, Collection, Iterable, Iterator, NamedTuple, Optional, TextIO
+
+from src.model.graph import ForeignKeyGraph
+from src.model.meta import DatasourceDocs, FieldInfo, TableInfo
+
+DEFAULT_PRECISION = 18
+
+
+class Dialect(NamedTuple):
+    name: str
+    # field_type -> SQL type, parametrized types are formatted with the field
+    types: dict[str, Callable[[FieldInfo], str]]
+    # SQL types of the columns of a unique constraint or a foreign key, where they differ from `types`
+    key_types: dict[str, Callable[[FieldInfo], str]]
+    quote: Callable[[str], str]
+    length_function: str
+    max_identifier_length: int
+    true: str
+    false: str
+
+
+def _decimal(default: str, decimal_type: str = "DECIMAL") -> Callable[[FieldInfo], str]:
+    def sql_type(field: FieldInfo) -> str:
+        if field.field_decimal_places is None:
+            return default
+        return f"{decimal_type}({DEFAULT_PRECISION}, {field.field_decimal_places})"
+    return sql_type
+
+
+def _varchar(default: str, varchar_type: str = "VARCHAR", suffix: str = "") -> Callable[[FieldInfo], str]:
+    def sql_type(field: FieldInfo) -> str:
+        if field.field_max_length is None:
+            return default
+        return f"{varchar_type}({field.field_max_length}{suffix})"
+    return sql_type
+
+
+def _fixed(sql_type: str) -> Callable[[FieldInfo], str]:
+    return lambda field: sql_type
+
+
+def _key_varchar(max_length: int, varchar_type: str = "VARCHAR", suffix: str = "") -> Callable[[FieldInfo], str]:
+    """
+    A text key column needs a bounded type, unbounded text is given the longest one a key takes
+    """
+    def sql_type(field: FieldInfo) -> str:
+        length = field.field_max_length
+        if length is not None and length > max_length:
+            raise ValueError(
+                f"Field {field.field_name} is a key, its max length {length} is over the {max_length} characters of a key"
+            )
+        return f"{varchar_type}({max_length if length is None else length}{suffix})"
+    return sql_type
+
+
+def _not_a_key(sql_type: str) -> Callable[[FieldInfo], str]:
+    def raise_error(field: FieldInfo) -> str:
+        raise ValueError(f"Field {field.field_name} is a key, a {sql_type} column can not be one")
+    return raise_error
+
+
+DIALECTS = {
+    "mysql": Dialect(
+        name="mysql",
+        types={
+            "integer": _fixed("BIGINT"),
+            "float": _decimal("DOUBLE"),
+            "text": _varchar("TEXT"),
+            "datetime": _fixed("DATETIME"),
+            "boolean": _fixed("TINYINT(1)"),
+            "json": _fixed("JSON"),
+            "list": _fixed("JSON"),
+            "uuid": _fixed("CHAR(36)"),
+        },
+        # a key is at most 3072 bytes, 4 bytes per utf8mb4 character
+        key_types={"text": _key_varchar(768), "json": _not_a_key("JSON"), "list": _not_a_key("JSON")},
+        quote=lambda name: f"`{name}`",
+        length_function="CHAR_LENGTH",
+        max_identifier_length=64,
+        true="1",
+        false="0",
+    ),
+    "postgresql": Dialect(
+        name="postgresql",
+        types={
+            "integer": _fixed("BIGINT"),
+            "float": _decimal("DOUBLE PRECISION", "NUMERIC"),
+            "text": _varchar("TEXT"),
+            "datetime": _fixed("TIMESTAMP"),
+            "boolean": _fixed("BOOLEAN"),
+            "json": _fixed("JSONB"),
+            "list": _fixed("JSONB"),
+            "uuid": _fixed("UUID"),
+        },
+        key_types={},
+        quote=lambda name: f'"{name}"',
+        length_function="CHAR_LENGTH",
+        max_identifier_length=63,
+        true="TRUE",
+        false="FALSE",
+    ),
+    "oracle": Dialect(
+        name="oracle",
+        types={
+            "integer": _fixed("NUMBER(19)"),
+            "float": _decimal("BINARY_DOUBLE", "NUMBER"),
+            "text": _varchar("CLOB", "VARCHAR2", " CHAR"),
+            "datetime": _fixed("TIMESTAMP"),
+            "boolean": _fixed("NUMBER(1)"),
+            "json": _fixed("CLOB"),
+            "list": _fixed("CLOB"),
+            "uuid": _fixed("CHAR(36)"),
+        },
+        # VARCHAR2 holds 4000 bytes, 4 bytes per AL32UTF8 character
+        key_types={
+            "text": _key_varchar(1000, "VARCHAR2", " CHAR"), "json": _not_a_key("CLOB"), "list": _not_a_key("CLOB"),
+        },
+        quote=lambda name: f'"{name}"',
+        length_function="LENGTH",
+        max_identifier_length=128,
+        true="1",
+        false="0",
+    ),
+}
+
+
+def _literal(dialect: Dialect, value: Any) -> str:
+    if isinstance(value, bool):
+        return dialect.true if value else dialect.false
+    if isinstance(value, float) and value.is_integer():
+        # bounds are stored as floats, 0.0 would not fit an integer column
+        return repr(int(value))
+    if isinstance(value, (int, float)):
+        return repr(value)
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value)
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class DDLGenerator:
+    """
+    CREATE TABLE statements of a namespace for one dialect. Tables come in foreign key order,
+    a foreign key to a table created later (a cycle) is added by an ALTER TABLE at the end.
+    Column definitions are compiled once per field definition, interned fields share them.
+    """
+
+    def __init__(self, dialect: str):
+        if dialect not in DIALECTS:
+            raise ValueError(f"Dialect {dialect} is not supported, use one of {', '.join(DIALECTS)}")
+        self.dialect = DIALECTS[dialect]
+        self._columns: dict[tuple[int, bool], tuple[FieldInfo, str]] = {}
+
+    def identifier(self, *parts: str) -> str:
+        return "_".join(parts)[:self.dialect.max_identifier_length]
+
+    def column(self, field: FieldInfo, key: bool = False) -> str:
+        """
+        Column definition of a field, `key` when it is in a foreign key
+        """
+        key = key or bool(field.field_unique)
+        cached = self._columns.get((id(field), key))
+        if cached is not None and cached[0] is field:
+            return cached[1]
+        definition = self._column(field, key)
+        # the field is kept with its definition so its id is not reused
+        self._columns[(id(field), key)] = (field, definition)
+        return definition
+
+    def _column(self, field: FieldInfo, key: bool) -> str:
+        dialect = self.dialect
+        name = dialect.quote(field.field_name)
+        types = dialect.key_types if key and field.field_type in dialect.key_types else dialect.types
+        parts = [name, types[field.field_type](field)]
+        if field.field_default_value is not None:
+            parts.append(f"DEFAULT {_literal(dialect, field.field_default_value)}")
+        if field.field_required:
+            parts.append("NOT NULL")
+        if field.field_unique:
+            parts.append("UNIQUE")
+        checks = []
+        for bound, operator in (("field_gt", ">"), ("field_ge", ">="), ("field_lt", "<"), ("field_le", "<=")):
+            value = getattr(field, bound)
+            if value is not None:
+                checks.append(f"{name} {operator} {_literal(dialect, value)}")
+        if field.field_type == "text" and field.field_min_length:
+            checks.append(f"{dialect.length_function}({name}) >= {field.field_min_length}")
+        if checks:
+            parts.append(f"CHECK ({' AND '.join(checks)})")
+        return " ".join(parts)
+
+    def foreign_key(self, table_name: str, fk) -> str:
+        quote = self.dialect.quote
+        name = self.identifier("fk", table_name, fk.field_name)
+        return (
+            f"CONSTRAINT {quote(name)} FOREIGN KEY ({quote(fk.field_name)}) "
+            f"REFERENCES {quote(fk.fk_table_name)} ({quote(fk.fk_field_name)})"
+        )
+
+    def create_table(self, table: TableInfo, foreign_keys: Iterable = (), keys: Collection[str] = ()) -> str:
+        """
+        `keys` are the fields of the table in a foreign key, its own ones or referenced by another table
+        """
+        try:
+            lines = [self.column(field, field.field_name in keys) for field in table.table_fields or []]
+        except ValueError as e:
+            raise ValueError(f"Table {table.table_name}: {e}") from e
+        lines.extend(self.foreign_key(table.table_name, fk) for fk in foreign_keys)
+        body = ",\n    ".join(lines)
+        return f"CREATE TABLE {self.dialect.quote(table.table_name)} (\n    {body}\n);\n"
+
+    def add_foreign_key(self, table_name: str, fk) -> str:
+        return f"ALTER TABLE {self.dialect.quote(table_name)} ADD {self.foreign_key(table_name, fk)};\n"
+
+    def statements(self, docs: DatasourceDocs, graph: Optional[ForeignKeyGraph] = None) -> Iterator[str]:
+        """
+        Statements one by one, the script itself is never built
+        """
+        graph = graph or ForeignKeyGraph.from_docs(docs)
+        dangling = {(r.table_name, r.field_name, r.fk_table_name, r.fk_field_name) for r in graph.dangling}
+        keys = {name: set() for name in docs.tables}
+        for name, table in docs.tables.items():
+            for fk in table.table_foreign_keys or []:
+                if (name, fk.field_name, fk.fk_table_name, fk.fk_field_name) not in dangling:
+                    keys[name].add(fk.field_name)
+                    keys[fk.fk_table_name].add(fk.fk_field_name)
+        created = set()
+        deferred = []
+        for name in graph.topological_order():
+            table = docs.tables[name]
+            inline = []
+            for fk in table.table_foreign_keys or []:
+                if (name, fk.field_name, fk.fk_table_name, fk.fk_field_name) in dangling:
+                    yield f"-- {name}.{fk.field_name} references undocumented {fk.fk_table_name}.{fk.fk_field_name}\n"
+                elif fk.fk_table_name in created or fk.fk_table_name == name:
+                    inline.append(fk)
+                else:
+                    deferred.append((name, fk))
+            created.add(name)
+            yield self.create_table(table, inline, keys[name])
+        for name, fk in deferred:
+            yield self.add_foreign_key(name, fk)
+
+    def write(self, f: TextIO, docs: DatasourceDocs) -> int:
+        count = 0
+        for statement in self.statements(docs):
+            f.write(statement)
+            if not statement.startswith("--"):
+                count += 1
+        return count
+
+
+def write_ddl(path: str, docs: DatasourceDocs, dialect: str) -> int:
+    """
+    Stream the DDL of `docs` to `path`, returns the number of statements written
+    """
+    with open(path, "w+") as f:
+        return DDLGenerator(dialect).write(f, docs)
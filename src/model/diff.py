@@ -0,0 +1,173 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Optional
+
+from src.helpers.hashing import content_hash, digest
+from src.model.snapshot import RE_SNAPSHOT
+from src.model.storage import (
+    RE_TABLE_INFO, SCHEMA_VERSION_KEY, doc_files, expand_table, is_snapshot, merged_sources, read_snapshot,
+    read_text, table_docs_from_data,
+)
+
+TABLE_FIELDS_KEY = "table_fields"
+
+
+def _canonical(value: Any) -> Any:
+    """
+    Drop null keys so a verbose and a compact export of the same docs compare equal
+    """
+    if isinstance(value, dict):
+        return {k: _canonical(v) for k, v in value.items() if v is not None}
+    if isinstance(value, list):
+        return [_canonical(v) for v in value]
+    return value
+
+
+def _canonical_table(table: dict) -> dict:
+    """
+    Flat version of `_canonical` for the table layout, hashing is the hot path of a diff
+    """
+    canonical = {k: v for k, v in table.items() if v is not None and k != SCHEMA_VERSION_KEY}
+    if fields := canonical.get(TABLE_FIELDS_KEY):
+        canonical[TABLE_FIELDS_KEY] = [{k: v for k, v in field.items() if v is not None} for field in fields]
+    return canonical
+
+
+def table_hash(table: dict) -> str:
+    return content_hash(_canonical_table(table))
+
+
+_decoder = json.JSONDecoder()
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+def hash_tables_file(file_path: str) -> list[tuple[str, str, Any]]:
+    """
+    (table name, hash, location) for each table of a tableinfo file.
+    Tables are decoded one by one and hashed on their raw JSON text, which avoids serializing them again.
+    The location is the (start, end) span of the table in the file, so only modified tables are decoded again later.
+    Equal text means equal table, different text (e.g. other indentation) only costs a field-level comparison.
+    """
+    if is_snapshot(file_path):
+        return [(t["table_name"], table_hash(t), t) for t in map(expand_table, read_snapshot(file_path).tables)]
+    text = read_text(file_path)
+    entries = []
+    idx = _SEPARATORS.match(text).end()
+    if text.startswith("[", idx):
+        idx += 1
+    while True:
+        idx = _SEPARATORS.match(text, idx).end()
+        if idx >= len(text) or text[idx] == "]":
+            return entries
+        table, end = _decoder.raw_decode(text, idx)
+        if "table_name" not in table:
+            entries.extend((t["table_name"], table_hash(t), t) for t in table_docs_from_data(table))
+        else:
+            entries.append((table["table_name"], digest(text[idx:end]), (idx, end)))
+        idx = end
+
+
+class HashedTables:
+    """
+    Hashes of all tables of one docs version, tables themselves are only decoded on demand
+    """
+
+    def __init__(self):
+        self.hashes: dict[str, str] = {}
+        self.locations: dict[str, tuple[str, Any]] = {}
+        self._texts: dict[str, str] = {}
+
+    def add(self, file_path: str, entries: list[tuple[str, str, Any]]):
+        # When a table appears in several files the last one read wins
+        for name, table_digest, location in entries:
+            self.hashes[name] = table_digest
+            self.locations[name] = (file_path, location)
+
+    def table(self, name: str) -> dict:
+        file_path, location = self.locations[name]
+        if isinstance(location, dict):
+            return location
+        if file_path not in self._texts:
+            self._texts[file_path] = read_text(file_path)
+        start, end = location
+        return expand_table(json.loads(self._texts[file_path][start:end]))
+
+
+def table_files(path: str) -> list[str]:
+    """
+    Tables files of a docs directory or aggregated file, as the loaders read them: the files merged by a
+    compaction and not modified since are skipped
+    """
+    files = doc_files(path, (RE_TABLE_INFO, RE_SNAPSHOT))
+    merged = set().union(*(merged_sources(file_path) for file_path in files))
+    return [file_path for file_path in files if os.path.normpath(file_path) not in merged]
+
+
+def load_table_hashes(*paths: str, workers: Optional[int] = None, chunk_size: int = 64) -> list[HashedTables]:
+    """
+    Hash the tables of each docs directory or aggregated file, files are hashed in parallel
+    """
+    files = [(i, file_path) for i, path in enumerate(paths) for file_path in table_files(path)]
+    results = [HashedTables() for _ in paths]
+    if len(files) > 1 and workers != 1:
+        # one file per table is common, files are sent to the workers in chunks
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            entries = executor.map(hash_tables_file, [file_path for _, file_path in files], chunksize=chunk_size)
+            for (i, file_path), file_entries in zip(files, entries):
+                results[i].add(file_path, file_entries)
+    else:
+        for i, file_path in files:
+            results[i].add(file_path, hash_tables_file(file_path))
+    return results
+
+
+def _fields_by_name(table: dict) -> dict[str, dict]:
+    return {field["field_name"]: _canonical(field) for field in table.get(TABLE_FIELDS_KEY) or []}
+
+
+def _changed_keys(old: dict, new: dict) -> dict[str, dict]:
+    return {
+        key: {"old": old.get(key), "new": new.get(key)}
+        for key in sorted(old.keys() | new.keys())
+        if old.get(key) != new.get(key)
+    }
+
+
+def diff_table(old: dict, new: dict) -> dict:
+    old_fields = _fields_by_name(old)
+    new_fields = _fields_by_name(new)
+    modified = {}
+    for name in old_fields.keys() & new_fields.keys():
+        if changes := _changed_keys(old_fields[name], new_fields[name]):
+            modified[name] = changes
+    old_attrs = _canonical({k: v for k, v in old.items() if k not in (TABLE_FIELDS_KEY, SCHEMA_VERSION_KEY)})
+    new_attrs = _canonical({k: v for k, v in new.items() if k not in (TABLE_FIELDS_KEY, SCHEMA_VERSION_KEY)})
+    return {
+        "fields_added": sorted(new_fields.keys() - old_fields.keys()),
+        "fields_removed": sorted(old_fields.keys() - new_fields.keys()),
+        "fields_modified": dict(sorted(modified.items())),
+        "attributes_modified": _changed_keys(old_attrs, new_attrs),
+    }
+
+
+def diff_docs(old_path: str, new_path: str, workers: Optional[int] = None) -> dict:
+    """
+    Compare two docs versions. Tables with equal content hashes are skipped before any field comparison.
+    """
+    old, new = load_table_hashes(old_path, new_path, workers=workers)
+    common = old.hashes.keys() & new.hashes.keys()
+    modified = {}
+    for name in sorted(common):
+        if old.hashes[name] == new.hashes[name]:
+            continue
+        changes = diff_table(old.table(name), new.table(name))
+        if any(changes.values()):
+            modified[name] = changes
+    return {
+        "added": sorted(new.hashes.keys() - old.hashes.keys()),
+        "removed": sorted(old.hashes.keys() - new.hashes.keys()),
+        "modified": modified,
+        "unchanged": len(common) - len(modified),
+    }
@@ -0,0 +1,144 @@
+import os
+import re
+from typing import Any, Callable, Optional
+
+from src.helpers.files import is_file
+from src.helpers.metrics import metrics
+from src.helpers.profiler import span
+from src.model.intern import field_pool
+from src.model.meta import DataSourceInfo, DatasourceDocs
+from src.model.snapshot import RE_SNAPSHOT, dump_snapshot
+from src.model.storage import (
+    RE_DATA_SOURCE_INFO, RE_TABLE_INFO, is_snapshot, iter_data_source_docs, iter_table_docs, ls_doc_files,
+    merged_sources, read_data_source_docs, read_table_docs, with_snapshots,
+)
+
+validated = metrics.counter("docs_validated_total", "Documents validated while loading docs, by kind")
+
+
+def load_docs(path: str, namespace: Optional[str] = None) -> DatasourceDocs:
+    """
+    Load the data sources and tables under `path` once, limited to one namespace when given.
+    When a data source or a table appears in several files the last one read wins.
+    """
+    docs = DatasourceDocs(namespace=namespace)
+    for _, ds_info in iter_data_source_docs(path, namespace):
+        with span("validate"):
+            docs.add_data_source(DataSourceInfo(**ds_info))
+        validated.inc(kind="data_source")
+    for _, tables in iter_table_docs(path, namespace):
+        with span("validate"):
+            for table in tables:
+                docs.add_table(field_pool.table(table))
+        validated.inc(len(tables), kind="table")
+    return docs
+
+
+def docs_to_snapshot(docs: DatasourceDocs, sources: Optional[dict[str, int]] = None) -> bytes:
+    return dump_snapshot(
+        (ds_info.model_dump(mode="json") for ds_info in docs.data_sources.values()),
+        (table.model_dump(mode="json") for table in docs.tables.values()),
+        sources,
+    )
+
+
+class FileDocs:
+    """
+    Documents of a docs directory kept per file, so a changed file is read and validated alone.
+    When a name appears in several files the last one read wins, as in `load_docs`.
+    """
+
+    def __init__(self, patterns: tuple[str, ...], read: Callable[[str], list[dict]],
+                 build: Callable[[dict], Any], name_of: Callable[[Any], str]):
+        self.patterns = patterns
+        self.read = read
+        self.build = build
+        self.name_of = name_of
+        self.path = None
+        # file path -> name -> document, in reading order
+        self.files: dict[str, dict[str, Any]] = {}
+        # files read again or dropped by the last update
+        self.updated: set[str] = set()
+        self._snapshots = False
+
+    def matches(self, file_path: str) -> bool:
+        return any(re.match(pattern, os.path.basename(file_path)) for pattern in self.patterns)
+
+    def load(self, path: str) -> dict[str, Any]:
+        self.path = path
+        self._select(set())
+        return self.documents()
+
+    def _select(self, changed: set[str]) -> set[str]:
+        """
+        Files in effect in reading order, only the new ones and the `changed` ones are read.
+        Returns the files read or dropped.
+        """
+        listed = [file_path for pattern in self.patterns for file_path in ls_doc_files(self.path, pattern)]
+        self._snapshots = any(map(is_snapshot, listed))
+        files = {}
+        merged = set()
+        for file_path in listed if is_file(self.path) else with_snapshots(self.path, listed):
+            file_path = os.path.normpath(file_path)
+            if file_path in merged:
+                continue
+            known = self.files.get(file_path)
+            files[file_path] = self._read(file_path) if known is None or file_path in changed else known
+            merged |= merged_sources(file_path)
+        updated = (files.keys() ^ self.files.keys()) | (changed & files.keys())
+        self.files = files
+        return updated
+
+    def _read(self, file_path: str) -> dict[str, Any]:
+        with span("validate"):
+            return {self.name_of(doc): doc for doc in map(self.build, self.read(file_path))}
+
+    def resolve(self, name: str, files: Optional[dict[str, dict[str, Any]]] = None) -> Optional[Any]:
+        doc = None
+        for documents in (self.files if files is None else files).values():
+            doc = documents.get(name, doc)
+        return doc
+
+    def documents(self) -> dict[str, Any]:
+        merged = {}
+        for documents in self.files.values():
+            merged.update(documents)
+        return merged
+
+    def update(self, file_path: str) -> dict[str, Optional[Any]]:
+        """
+        Read one changed file again, returns the names whose document changed with the document
+        now in effect, None when it was removed. Raises when the file can not be read or validated.
+        """
+        file_path = os.path.normpath(file_path)
+        if self._snapshots or is_snapshot(file_path):
+            # which of a snapshot and the JSON docs of its namespace is read depends on all of them
+            files = self.files
+            self.updated = self._select({file_path})
+            names = set()
+            for updated in self.updated:
+                names |= files.get(updated, {}).keys() | self.files.get(updated, {}).keys()
+            before = {name: self.resolve(name, files) for name in names}
+        else:
+            before = {name: self.resolve(name) for name in self.files.get(file_path, {})}
+            if os.path.isfile(file_path):
+                self.files[file_path] = self._read(file_path)
+            else:
+                self.files.pop(file_path, None)
+            self.updated = {file_path}
+        changes = {}
+        for name in before.keys() | self.files.get(file_path, {}).keys():
+            doc = self.resolve(name)
+            if doc != before.get(name):
+                changes[name] = doc
+        return changes
+
+
+def table_files() -> FileDocs:
+    return FileDocs((RE_TABLE_INFO, RE_SNAPSHOT), read_table_docs, field_pool.table, lambda t: t.table_name)
+
+
+def data_source_files() -> FileDocs:
+    return FileDocs(
+        (RE_DATA_SOURCE_INFO, RE_SNAPSHOT), read_data_source_docs, lambda d: DataSourceInfo(**d), lambda d: d.ds_name
+    )
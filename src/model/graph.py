@@ -0,0 +1,157 @@
+from collections import deque
+from typing import Iterable, NamedTuple
+
+from src.model.meta import DatasourceDocs, TableInfo
+
+
+class DanglingReference(NamedTuple):
+    table_name: str
+    field_name: str
+    fk_table_name: str
+    fk_field_name: str
+    reason: str
+
+
+class ForeignKeyGraph:
+    """
+    Adjacency lists of the foreign keys of a namespace, edges go from a table to the tables it references.
+    Self references do not constrain the order of tables and are kept apart.
+    """
+
+    def __init__(self, tables: Iterable[TableInfo]):
+        tables = list(tables)
+        fields = {table.table_name: {f.field_name for f in table.table_fields or []} for table in tables}
+        self.tables: list[str] = list(fields)
+        self.dependencies: dict[str, list[str]] = {name: [] for name in self.tables}
+        self.dependents: dict[str, list[str]] = {name: [] for name in self.tables}
+        self.self_references: list[str] = []
+        self.dangling: list[DanglingReference] = []
+        dependents = self.dependents
+        for table in tables:
+            if not table.table_foreign_keys:
+                continue
+            name = table.table_name
+            own_fields = fields[name]
+            dependencies = self.dependencies[name]
+            for fk in table.table_foreign_keys:
+                ref = fk.fk_table_name
+                ref_fields = fields.get(ref)
+                if fk.field_name not in own_fields:
+                    reason = f"Field {fk.field_name} is not a field of {name}"
+                elif ref_fields is None:
+                    reason = f"Table {ref} does not exist"
+                elif fk.fk_field_name not in ref_fields:
+                    reason = f"Field {fk.fk_field_name} is not a field of {ref}"
+                elif ref == name:
+                    if not self.self_references or self.self_references[-1] != name:
+                        self.self_references.append(name)
+                    continue
+                else:
+                    # a table referencing another one through several keys is one edge
+                    if ref not in dependencies:
+                        dependencies.append(ref)
+                        dependents[ref].append(name)
+                    continue
+                self.dangling.append(DanglingReference(name, fk.field_name, ref, fk.fk_field_name, reason))
+
+    @classmethod
+    def from_docs(cls, docs: DatasourceDocs) -> 'ForeignKeyGraph':
+        return cls(docs.tables.values())
+
+    def topological_order(self) -> list[str]:
+        """
+        Tables ordered so every table comes after the tables it references (Kahn's algorithm).
+        Tables on a cycle can not be ordered, when there are cycles each of them is placed as a whole
+        after its dependencies, its tables in name order.
+        """
+        in_degree = {name: len(deps) for name, deps in self.dependencies.items()}
+        queue = deque(name for name in self.tables if not in_degree[name])
+        order = []
+        while queue:
+            name = queue.popleft()
+            order.append(name)
+            for dependent in self.dependents[name]:
+                in_degree[dependent] -= 1
+                if not in_degree[dependent]:
+                    queue.append(dependent)
+        if len(order) < len(self.tables):
+            # components come out of Tarjan's algorithm after the components they reference
+            return [name for component in self._components() for name in component]
+        return order
+
+    def cycles(self) -> list[list[str]]:
+        """
+        Groups of tables referencing each other
+        """
+        return [component for component in self._components() if len(component) > 1]
+
+    def _components(self) -> list[list[str]]:
+        """
+        Strongly connected components (iterative Tarjan), a component follows the components it references
+        """
+        index = {}
+        low = {}
+        on_stack = set()
+        stack = []
+        components = []
+        counter = 0
+        for root in self.tables:
+            if root in index:
+                continue
+            work = [(root, 0)]
+            while work:
+                name, i = work.pop()
+                if i == 0:
+                    index[name] = low[name] = counter
+                    counter += 1
+                    stack.append(name)
+                    on_stack.add(name)
+                deps = self.dependencies[name]
+                if i < len(deps):
+                    work.append((name, i + 1))
+                    dep = deps[i]
+                    if dep not in index:
+                        work.append((dep, 0))
+                    elif dep in on_stack:
+                        low[name] = min(low[name], index[dep])
+                    continue
+                for dep in deps:
+                    if dep in on_stack:
+                        low[name] = min(low[name], low[dep])
+                if low[name] == index[name]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == name:
+                            break
+                    components.append(sorted(component))
+        return components
+
+    def has_cycles(self) -> bool:
+        return bool(self.cycles())
+
+    def _walk(self, table_name: str, edges: dict[str, list[str]], transitive: bool) -> list[str]:
+        if not transitive:
+            return list(edges[table_name])
+        seen = {table_name}
+        queue = deque([table_name])
+        reached = []
+        while queue:
+            for name in edges[queue.popleft()]:
+                if name not in seen:
+                    seen.add(name)
+                    reached.append(name)
+                    queue.append(name)
+        return reached
+
+    def dependents_of(self, table_name: str, transitive: bool = False) -> list[str]:
+        """
+        Tables referencing `table_name`, e.g. the tables impacted when it changes
+        """
+        return self._walk(table_name, self.dependents, transitive)
+
+    def dependencies_of(self, table_name: str, transitive: bool = False) -> list[str]:
+        return self._walk(table_name, self.dependencies, transitive)
+
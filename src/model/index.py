@@ -0,0 +1,277 @@
+import bisect
+import json
+import os
+from collections import defaultdict
+from itertools import islice
+from typing import Optional, Iterable
+
+from src.helpers.lock import file_lock
+from src.model.snapshot import RE_SNAPSHOT
+from src.model.storage import (
+    RE_TABLE_INFO, doc_files, merged_sources, read_table_docs, table_docs_from_data,
+)
+
+NAME_INDEX_FILE = "docs-nameindex.json"
+NAME_INDEX_VERSION = 2
+
+KIND_TABLE = "table"
+KIND_FIELD = "field"
+KIND_ALIAS = "alias"
+
+
+def _mtime(file_path: str) -> Optional[int]:
+    try:
+        return os.stat(file_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def trigrams(term: str) -> set[str]:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Inverted index from table names, field names and field aliases to their postings.
+    A posting is [kind, name, table_name, field_name, file]. Terms are stored lower-cased.
+    Postings are grouped by file so an exported file can be re-indexed without a full rebuild,
+    with the modification time of the file they were read from.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.files: dict[str, list[list]] = {}
+        self.mtimes: dict[str, Optional[int]] = {}
+        self.postings: dict[str, list[list]] = defaultdict(list)
+        self._terms: Optional[list[str]] = None
+        self._trigrams: Optional[dict[str, set[str]]] = None
+        self._dirty = False
+        # files updated or removed since the index was loaded or saved
+        self._changed: set[str] = set()
+
+    @classmethod
+    def index_path(cls, directory: str) -> str:
+        return os.path.join(directory, NAME_INDEX_FILE)
+
+    @classmethod
+    def load(cls, directory: str) -> 'NameIndex':
+        """
+        The saved index of `directory`, brought up to date with the docs files
+        """
+        index = cls(cls.index_path(directory))
+        files = index._read_files()
+        if files is None:
+            return cls.build(directory)
+        for file_path, saved in files.items():
+            index._add_postings(file_path, saved["postings"], saved["mtime"])
+        index.refresh(directory)
+        return index
+
+    def refresh(self, directory: str):
+        """
+        Re-index the files modified since they were indexed, drop the files no longer in `directory`
+        """
+        current = set()
+        merged = set()
+        for file_path in doc_files(directory, (RE_TABLE_INFO, RE_SNAPSHOT)):
+            file_path = os.path.normpath(file_path)
+            if file_path in merged:
+                continue
+            current.add(file_path)
+            mtime = _mtime(file_path)
+            if file_path not in self.files or mtime != self.mtimes.get(file_path):
+                self.update_file(file_path, read_table_docs(file_path), mtime)
+            merged |= merged_sources(file_path)
+        for file_path in self.files.keys() - current:
+            self.remove_file(file_path)
+
+    def _read_files(self) -> Optional[dict[str, dict]]:
+        """
+        Postings and modification time saved in the index file by file, None when the file has another version
+        """
+        if not os.path.isfile(self.path):
+            return {}
+        with open(self.path, "r") as file:
+            data = json.loads(file.read())
+        if data.get("version") != NAME_INDEX_VERSION:
+            return None
+        return data["files"]
+
+    @classmethod
+    def build(cls, directory: str) -> 'NameIndex':
+        index = cls(cls.index_path(directory))
+        index.refresh(directory)
+        return index
+
+    @staticmethod
+    def postings_of(file_path: str, tables: Iterable[dict]) -> list[list]:
+        postings = []
+        for table in tables:
+            table_name = table.get("table_name")
+            if not table_name:
+                continue
+            postings.append([KIND_TABLE, table_name, table_name, None, file_path])
+            for field in table.get("table_fields") or []:
+                field_name = field.get("field_name")
+                if not field_name:
+                    continue
+                postings.append([KIND_FIELD, field_name, table_name, field_name, file_path])
+                if field.get("field_alias"):
+                    postings.append([KIND_ALIAS, field["field_alias"], table_name, field_name, file_path])
+        return postings
+
+    def _add_postings(self, file_path: str, postings: list[list], mtime: Optional[int]):
+        self.files[file_path] = postings
+        self.mtimes[file_path] = mtime
+        for posting in postings:
+            self.postings[self._term_of(posting)].append(posting)
+
+    @staticmethod
+    def _term_of(posting: list) -> str:
+        return posting[1].lower()
+
+    def remove_file(self, file_path: str):
+        file_path = os.path.normpath(file_path)
+        self._changed.add(file_path)
+        self._drop(file_path)
+
+    def _drop(self, file_path: str):
+        self.mtimes.pop(file_path, None)
+        for posting in self.files.pop(file_path, []):
+            term = self._term_of(posting)
+            bucket = self.postings.get(term)
+            if bucket is None:
+                continue
+            bucket[:] = [p for p in bucket if p[4] != file_path]
+            if not bucket:
+                del self.postings[term]
+        self._invalidate()
+
+    def update_file(self, file_path: str, tables: Iterable[dict], mtime: Optional[int] = None):
+        """
+        Replace the postings of one file, the rest of the index is untouched.
+        `mtime` is the modification time of the file the tables were read from, by default its current one.
+        """
+        file_path = os.path.normpath(file_path)
+        self.update_postings(file_path, self.postings_of(file_path, tables), mtime)
+
+    def update_postings(self, file_path: str, postings: list[list], mtime: Optional[int] = None):
+        file_path = os.path.normpath(file_path)
+        if mtime is None:
+            mtime = _mtime(file_path)
+        self.remove_file(file_path)
+        self._add_postings(file_path, postings, mtime)
+        self._invalidate()
+
+    def update_export(self, file_path: str, data: str):
+        self.update_file(file_path, table_docs_from_data(json.loads(data)))
+
+    def _invalidate(self):
+        self._terms = None
+        self._trigrams = None
+        self._dirty = True
+
+    @property
+    def terms(self) -> list[str]:
+        if self._terms is None:
+            self._terms = sorted(self.postings)
+        return self._terms
+
+    def names(self, kind: Optional[str] = None) -> list[str]:
+        """
+        Distinct names as they were written, optionally limited to one kind
+        """
+        names = {}
+        for term in self.terms:
+            for posting in self.postings[term]:
+                if kind is None or posting[0] == kind:
+                    names.setdefault(posting[1], None)
+        return list(names)
+
+    def lookup(self, name: str) -> list[list]:
+        return list(self.postings.get(name.lower(), []))
+
+    def _iter_prefix(self, prefix: str):
+        prefix = prefix.lower()
+        terms = self.terms
+        for i in range(bisect.bisect_left(terms, prefix), len(terms)):
+            if not terms[i].startswith(prefix):
+                return
+            yield terms[i]
+
+    def prefix(self, prefix: str, limit: int = 50) -> list[str]:
+        return list(islice(self._iter_prefix(prefix), limit))
+
+    def complete(self, text: str, kind: Optional[str] = None, limit: int = 20) -> list[str]:
+        """
+        Names of the given kind starting with `text`, falls back to fuzzy matches when nothing starts with it
+        """
+        terms = self._iter_prefix(text)
+        if not self.prefix(text, limit=1) and len(text) >= 3:
+            terms = (term for term, _ in self.fuzzy(text, limit=limit))
+        names = {}
+        for term in terms:
+            for posting in self.postings[term]:
+                if kind is None or posting[0] == kind:
+                    names.setdefault(posting[1], None)
+            if len(names) >= limit:
+                break
+        return list(names)[:limit]
+
+    def fuzzy(self, query: str, limit: int = 10, threshold: float = 0.3) -> list[tuple[str, float]]:
+        """
+        Terms ranked by trigram similarity (Jaccard) with the query
+        """
+        if self._trigrams is None:
+            self._trigrams = defaultdict(set)
+            for term in self.postings:
+                for gram in trigrams(term):
+                    self._trigrams[gram].add(term)
+        query_grams = trigrams(query.lower())
+        shared = defaultdict(int)
+        for gram in query_grams:
+            for term in self._trigrams.get(gram, ()):
+                shared[term] += 1
+        scored = []
+        for term, count in shared.items():
+            score = count / (len(query_grams) + len(trigrams(term)) - count)
+            if score >= threshold:
+                scored.append((term, score))
+        scored.sort(key=lambda x: (-x[1], x[0]))
+        return scored[:limit]
+
+    def _merge_saved(self):
+        """
+        Take the postings other processes saved since this index was loaded, for the files it did not change
+        """
+        saved = self._read_files() or {}
+        for file_path in (saved.keys() | self.files.keys()) - self._changed:
+            entry = saved.get(file_path)
+            if entry is not None and entry["postings"] == self.files.get(file_path):
+                self.mtimes[file_path] = entry["mtime"]
+                continue
+            self._drop(file_path)
+            if entry is not None:
+                self._add_postings(file_path, entry["postings"], entry["mtime"])
+
+    def save(self, force: bool = False):
+        """
+        Write the index, merged with the one on disk so concurrent writers keep each other's files.
+        A forced save writes this index as the whole index, e.g. once rebuilt.
+        """
+        if not (self._dirty or force) or not self.path:
+            return
+        with file_lock(f"{self.path}.lock"):
+            if not force:
+                self._merge_saved()
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w+") as file:
+                files = {
+                    file_path: {"mtime": self.mtimes.get(file_path), "postings": postings}
+                    for file_path, postings in self.files.items()
+                }
+                file.write(json.dumps({"version": NAME_INDEX_VERSION, "files": files}))
+            os.replace(tmp_path, self.path)
+        self._dirty = False
+        self._changed = set()
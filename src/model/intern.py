@@ -0,0 +1,126 @@
+import json
+import weakref
+from typing import Iterable, Optional, Union
+
+from pydantic import ConfigDict
+
+from src.helpers.metrics import hit_rate, metrics
+from src.helpers.hashing import content_hash
+from src.model.meta import SCHEMA_VERSION, FieldInfo, TableInfo
+from src.model.storage import (
+    SCHEMA_VERSION_KEY, SHARED_FIELDS_KEY, TABLES_KEY, compact_doc, expand_doc, model_defaults,
+)
+
+FIELD_KEYS = tuple(FieldInfo.model_fields)
+
+
+class FrozenFieldInfo(FieldInfo):
+    """
+    Immutable FieldInfo, one instance is shared by every table declaring the same field
+    """
+    model_config = ConfigDict(frozen=True)
+
+
+def field_key(data: dict) -> tuple:
+    """
+    Key of a field definition, a compact definition has the key of its expanded form
+    """
+    defaults = model_defaults(FieldInfo)
+    key = tuple(data.get(name, defaults[name]) for name in FIELD_KEYS)
+    try:
+        hash(key)
+    except TypeError:
+        # json/list default values are not hashable
+        key = (json.dumps(key, sort_keys=True, default=str),)
+    return key
+
+
+def field_hash(data: dict) -> str:
+    return content_hash({k: v for k, v in data.items() if v is not None})[:16]
+
+
+class FieldInfoPool:
+    """
+    Interning pool for field definitions. A definition is validated once, later
+    occurrences of the same values reuse the validated frozen instance.
+    The pool only holds the definitions some loaded table still uses, it does not grow in a long-lived process.
+    """
+
+    def __init__(self):
+        self._fields: weakref.WeakValueDictionary[tuple, FrozenFieldInfo] = weakref.WeakValueDictionary()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._fields)
+
+    def intern(self, field: Union[FieldInfo, dict]) -> FrozenFieldInfo:
+        data = field.model_dump() if isinstance(field, FieldInfo) else field
+        key = field_key(data)
+        interned = self._fields.get(key)
+        if interned is not None:
+            self.hits += 1
+            return interned
+        self.misses += 1
+        if isinstance(field, FrozenFieldInfo):
+            interned = field
+        else:
+            interned = FrozenFieldInfo(**expand_doc(data, FieldInfo))
+        self._fields[key] = interned
+        return interned
+
+    def intern_all(self, fields: Iterable[Union[FieldInfo, dict]]) -> list[FrozenFieldInfo]:
+        return [self.intern(field) for field in fields]
+
+    def table(self, table: dict) -> TableInfo:
+        """
+        Build a TableInfo whose fields come from the pool
+        """
+        fields = table.get("table_fields")
+        return TableInfo(**{**table, "table_fields": self.intern_all(fields) if fields is not None else None})
+
+    def clear(self):
+        self._fields.clear()
+        self.hits = 0
+        self.misses = 0
+
+
+field_pool = FieldInfoPool()
+metrics.gauge(
+    "field_pool_hit_rate", hit_rate(lambda: field_pool.hits, lambda: field_pool.misses),
+    "Field definitions reused from the interning pool instead of validated again",
+)
+
+
+def dump_shared_tables(
+    tables: Iterable[Union[TableInfo, dict]], compact: bool = False, header: Optional[dict] = None
+) -> str:
+    """
+    Aggregated tables export storing each distinct field definition once, tables refer to them by hash.
+    `header` keys are written before them.
+    """
+    shared_fields = {}
+    hashes = {}
+    dumped_tables = []
+    for table in tables:
+        data = table.model_dump(mode="json") if isinstance(table, TableInfo) else table
+        refs = []
+        for field in data.get("table_fields") or []:
+            key = field_key(field)
+            if key not in hashes:
+                ref = field_hash(field)
+                while ref in shared_fields:
+                    ref = field_hash({**field, "_": ref})
+                hashes[key] = ref
+                shared_fields[ref] = compact_doc(field, FieldInfo) if compact else field
+            refs.append(hashes[key])
+        data = {**data, "table_fields": refs}
+        # the file is stamped once
+        data.pop(SCHEMA_VERSION_KEY, None)
+        dumped_tables.append(compact_doc(data, TableInfo) if compact else data)
+    data = {
+        SCHEMA_VERSION_KEY: SCHEMA_VERSION, **(header or {}), SHARED_FIELDS_KEY: shared_fields, TABLES_KEY: dumped_tables
+    }
+    if compact:
+        return json.dumps(data, separators=(",", ":"), default=str)
+    return json.dumps(data, indent=2, default=str)
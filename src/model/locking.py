@@ -0,0 +1,270 @@
+import os
+import re
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional, TypeVar, Union
+
+from src.helpers.lock import file_lock
+from src.helpers.metrics import metrics
+from src.model.storage import namespace_of, read_view, write_atomic
+
+# a writer waits at most this long for the lock of a namespace
+DEFAULT_LOCK_TIMEOUT = 60.0
+# files replaced or removed by writers are kept this long for the readers which started before
+VERSIONS_TTL = 300.0
+# reads started again when they ran longer than the versions are kept
+READ_ATTEMPTS = 3
+ABSENT_SUFFIX = ".absent"
+HORIZON_FILE = ".horizon"
+
+RE_GENERATION = re.compile(r"^\.(?P<namespace>.+)\.generation$")
+
+T = TypeVar("T")
+
+read_retries = metrics.counter("consistent_read_retries_total", "Reads started again because their versions expired")
+
+
+def lock_path(directory: str, namespace: str) -> str:
+    return os.path.join(directory, f".{namespace}.lock")
+
+
+def generation_path(directory: str, namespace: str) -> str:
+    return os.path.join(directory, f".{namespace}.generation")
+
+
+def versions_path(directory: str, namespace: str) -> str:
+    return os.path.join(directory, f".{namespace}.versions")
+
+
+def read_generation(directory: str, namespace: str) -> int:
+    try:
+        with open(generation_path(directory, namespace), "r") as file:
+            return int(file.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+def _write_generation(directory: str, namespace: str, generation: int):
+    # only ordered against the docs files, it is not worth a fsync
+    path = generation_path(directory, namespace)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write(str(generation))
+    os.replace(tmp_path, path)
+
+
+def generations(directory: str, namespace: Optional[str] = None) -> dict[str, int]:
+    """
+    Generation of one namespace, or of every namespace written under the lock when None
+    """
+    if namespace is not None:
+        return {namespace: read_generation(directory, namespace)}
+    if not os.path.isdir(directory):
+        return {}
+    result = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            match = RE_GENERATION.match(entry.name)
+            if match:
+                result[match.group("namespace")] = read_generation(directory, match.group("namespace"))
+    return result
+
+
+class NamespaceWrite:
+    """
+    Changes of the writer holding the lock of a namespace. Before its first change a file is kept, hard linked,
+    as it was in the generation readers may still be on; a file that did not exist is kept as a marker.
+    """
+
+    def __init__(self, directory: str, namespace: Optional[str], generation: int):
+        self.directory = directory
+        self.namespace = namespace
+        self.generation = generation
+        self._kept: set[str] = set()
+
+    def keep(self, path: str):
+        name = os.path.basename(path)
+        if self.namespace is None or name in self._kept:
+            return
+        version_dir = os.path.join(versions_path(self.directory, self.namespace), str(self.generation))
+        os.makedirs(version_dir, exist_ok=True)
+        version = os.path.join(version_dir, name)
+        try:
+            os.link(path, version)
+        except FileNotFoundError:
+            open(f"{version}{ABSENT_SUFFIX}", "w").close()
+        except FileExistsError:
+            # kept by a writer of the same generation which died
+            pass
+        except OSError:
+            # no hard links on this file system
+            shutil.copy2(path, version)
+        self._kept.add(name)
+
+    def write(self, path: str, data: Union[str, bytes]):
+        self.keep(path)
+        write_atomic(path, data)
+
+    def remove(self, path: str):
+        self.keep(path)
+        os.remove(path)
+
+
+def _collect_versions(directory: str, namespace: str, ttl: float = VERSIONS_TTL):
+    """
+    Drop the kept files older than `ttl`, a reader which started before them can not use its generation anymore
+    """
+    root = versions_path(directory, namespace)
+    horizon = None
+    deadline = time.time() - ttl
+    with os.scandir(root) as entries:
+        for entry in entries:
+            if entry.name.isdigit() and entry.stat().st_mtime < deadline:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                horizon = max(horizon or 0, int(entry.name) + 2)
+    if horizon is not None and horizon > read_horizon(directory, namespace):
+        write_atomic(os.path.join(root, HORIZON_FILE), str(horizon))
+
+
+def read_horizon(directory: str, namespace: str) -> int:
+    """
+    Oldest generation whose files are all kept
+    """
+    try:
+        with open(os.path.join(versions_path(directory, namespace), HORIZON_FILE), "r") as file:
+            return int(file.read() or 0)
+    except (OSError, ValueError):
+        return 0
+
+
+@contextmanager
+def namespace_writer(directory: str, namespace: str,
+                     timeout: Optional[float] = DEFAULT_LOCK_TIMEOUT) -> Iterator[NamespaceWrite]:
+    """
+    Hold the writer lock of a namespace. Its generation is odd while the writer is active and the next even
+    number once it is done. A writer that died left an odd generation, the next one goes on from there.
+    """
+    with file_lock(lock_path(directory, namespace), timeout):
+        generation = read_generation(directory, namespace)
+        active = generation + 1 if generation % 2 == 0 else generation + 2
+        _write_generation(directory, namespace, active)
+        try:
+            yield NamespaceWrite(directory, namespace, active - 1)
+        finally:
+            _write_generation(directory, namespace, active + 1)
+            if os.path.isdir(versions_path(directory, namespace)):
+                _collect_versions(directory, namespace)
+
+
+@contextmanager
+def file_writer(file_path: str, timeout: Optional[float] = DEFAULT_LOCK_TIMEOUT) -> Iterator[NamespaceWrite]:
+    """
+    Writer lock of the namespace of a docs file, other files are written without lock
+    """
+    namespace = namespace_of(file_path)
+    directory = os.path.dirname(file_path) or "."
+    if namespace is None:
+        yield NamespaceWrite(directory, None, 0)
+        return
+    with namespace_writer(directory, namespace, timeout) as write:
+        yield write
+
+
+# the kept version of a file does not exist: the file was created after the generation read
+_ABSENT = object()
+
+
+class SnapshotView:
+    """
+    Docs files as they were at one generation of each namespace: a file changed or removed since is read
+    from the oldest version kept at or after that generation, a file created since is left out.
+    """
+
+    def __init__(self, directory: str, bases: dict[str, int]):
+        self.directory = directory
+        self.bases = bases
+
+    def _versions(self, namespace: str) -> list[str]:
+        # directories of the generations from the base on, oldest first
+        base = self.bases.get(namespace, 0)
+        try:
+            names = os.listdir(versions_path(self.directory, namespace))
+        except FileNotFoundError:
+            return []
+        generations = sorted(int(name) for name in names if name.isdigit() and int(name) >= base)
+        return [os.path.join(versions_path(self.directory, namespace), str(g)) for g in generations]
+
+    def _version(self, name: str):
+        namespace = namespace_of(name)
+        if namespace is None:
+            return None
+        for version_dir in self._versions(namespace):
+            version = os.path.join(version_dir, name)
+            if os.path.exists(f"{version}{ABSENT_SUFFIX}"):
+                return _ABSENT
+            if os.path.exists(version):
+                return version
+        return None
+
+    def read_text(self, path: str, read: Callable[[str], T]) -> T:
+        name = os.path.basename(path)
+        version = self._version(name)
+        if version is None:
+            try:
+                text = read(path)
+            except FileNotFoundError:
+                text = None
+            # the file is kept before it is changed: replaced or removed while it was read, it is kept now
+            version = self._version(name)
+            if version is None and text is not None:
+                return text
+        if version is None or version is _ABSENT:
+            raise FileNotFoundError(path)
+        return read(version)
+
+    def list_files(self, directory: str, files: list[str], pattern: str, prefix: str) -> list[str]:
+        listed = {}
+        for file_path in files:
+            if self._version(os.path.basename(file_path)) is not _ABSENT:
+                listed[os.path.basename(file_path)] = file_path
+        # removed since the generation read
+        for namespace in self.bases:
+            seen = set()
+            for version_dir in self._versions(namespace):
+                for name in os.listdir(version_dir):
+                    absent = name.endswith(ABSENT_SUFFIX)
+                    kept = name[:-len(ABSENT_SUFFIX)] if absent else name
+                    if kept in seen:
+                        continue
+                    seen.add(kept)
+                    if not absent and name not in listed and name.startswith(prefix) and re.match(pattern, name):
+                        listed[name] = os.path.join(version_dir, name)
+        return list(listed.values())
+
+    def expired(self) -> bool:
+        return any(read_horizon(self.directory, namespace) > base for namespace, base in self.bases.items())
+
+
+def consistent_read(directory: str, namespace: Optional[str], read: Callable[[], T],
+                    attempts: int = READ_ATTEMPTS) -> T:
+    """
+    Result of `read` over the docs as they were when it started, whatever the writers do meanwhile.
+    Readers never take the lock: files are read from the versions the writers keep. A read is only
+    started again when it ran longer than the versions are kept.
+    """
+    for attempt in range(attempts):
+        # a writer is active on an odd generation, the files are read as they were before it
+        bases = {ns: g - g % 2 for ns, g in generations(directory, namespace).items()}
+        if namespace is not None:
+            bases.setdefault(namespace, 0)
+        view = SnapshotView(directory, bases)
+        token = read_view.set(view)
+        try:
+            result = read()
+        finally:
+            read_view.reset(token)
+        if not view.expired():
+            return result
+        read_retries.inc()
+    return result
@@ -6,11 +6,13 @@ import uuid
 from typing import Sequence, Any, Optional, List
 
 from annotated_types import BaseMetadata, SLOTS, MinLen, MaxLen, Ge, Le, Gt, Lt
-from pydantic import BaseModel, ConfigDict, Field, field_validator
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator
 from pydantic.dataclasses import dataclass
 from pydantic_core import PydanticUndefined
 from pydantic_core.core_schema import ValidationInfo
 
+from src.data.sequence import SequenceAllocator
+
 FIELD_TYPES = {
     "integer": int,
     "float": float,
@@ -31,10 +33,18 @@ FIELD_FACTORIES = {
 
 DEFAULT_FACTORY = "manual"
 
+# version of the docs layout stamped in exported files, increased with each registered migration
+SCHEMA_VERSION = 2
+
 
-def auto_field_factory(field_type: str):
+def auto_field_factory(field_type: str, sequence: Optional[SequenceAllocator] = None):
+    """
+    Default value of a field type, integers are the next id of the `sequence` of the field
+    """
     if field_type in ("int", "integer"):
-        return 0
+        if sequence is None:
+            raise ValueError("Auto integers are numbered by a sequence")
+        return sequence.next()
     if field_type in ("float", "double"):
         return 0.0
     if field_type in ("str", "text"):
@@ -123,17 +133,10 @@ class FieldDetailHelper:
 class ForeignKeyInfo(BaseModel):
     model_config = ConfigDict(validate_assignment=True)
 
-    field_name: str
-    fk_table_name: str
-    fk_field_name: str
-    fk_relate_name: str = Field(required=False)
-
-    def __init__(self, field_name: str, fk_table_name: str, fk_field_name: str, fk_relate_name: str = None):
-        super(BaseModel).__init__()
-        self.field_name = field_name
-        self.fk_table_name = fk_table_name
-        self.fk_field_name = fk_field_name
-        self.fk_relate_name = fk_relate_name
+    field_name: str = Field(min_length=1, max_length=64, pattern=r"^[a-zA-Z][a-zA-Z0-9_]*$")
+    fk_table_name: str = Field(min_length=1, max_length=64, pattern=r"^[a-zA-Z][a-zA-Z0-9_]*$")
+    fk_field_name: str = Field(min_length=1, max_length=64, pattern=r"^[a-zA-Z][a-zA-Z0-9_]*$")
+    fk_relate_name: Optional[str] = Field(required=False, default=None)
 
     def __str__(self):
         return f"ForeignKeyInfo(field_name={self.field_name}, fk_table_name={self.fk_table_name}, fk_field_name={self.fk_field_name})"
@@ -284,9 +287,10 @@ class TableInfo(BaseModel, FieldDetailHelper):
 
     table_name: str = Field(pattern="^[a-zA-Z][a-zA-Z0-9_]*$", min_length=1, max_length=64)
     table_fields: Optional[List[FieldInfo]]
+    table_foreign_keys: Optional[List[ForeignKeyInfo]] = Field(required=False, default=None)
 
     def __str__(self):
-        return f"TableInfo(table_name={self.table_name}, table_columns={self.table_fields})"
+        return f"TableInfo(table_name={self.table_name}, table_columns={self.table_fields}, table_foreign_keys={self.table_foreign_keys})"
 
 
 DATA_SOURCE_TYPES = {
@@ -311,29 +315,103 @@ class DataSourceInfo(BaseModel, FieldDetailHelper):
 
 
 class DatasourceDocs(BaseModel):
+    """
+    Docs of a namespace: its data sources and tables, indexed by name.
+    Tables and fields are added, replaced and removed in place, untouched tables are not validated again.
+    """
     model_config = ConfigDict(validate_assignment=True)
 
-    ds_info: DataSourceInfo
-    tables: dict[str, TableInfo]
+    namespace: Optional[str] = Field(default=None)
+    data_sources: dict[str, DataSourceInfo] = Field(default_factory=dict)
+    tables: dict[str, TableInfo] = Field(default_factory=dict)
 
-    def __init__(self, datasource: DataSourceInfo):
-        super().__init__()
-        self.ds_info: DataSourceInfo = datasource
-        self.tables: dict[str, TableInfo] = {}
+    _fields: dict[tuple[str, str], FieldInfo] = PrivateAttr(default_factory=dict)
+    # table name -> field name -> position of the field in table_fields
+    _positions: dict[str, dict[str, int]] = PrivateAttr(default_factory=dict)
+
+    def model_post_init(self, __context: Any):
+        for table in self.tables.values():
+            self._index_table(table)
 
     def __str__(self):
         return (
-            f"DatasourceDocs(database_info={self.ds_info}, db_engine={self.db_engine})"
+            f"DatasourceDocs(namespace={self.namespace}, data_sources={list(self.data_sources)}, tables={len(self.tables)})"
         )
 
+    @property
+    def ds_info(self) -> Optional[DataSourceInfo]:
+        return next(iter(self.data_sources.values()), None)
+
+    def _index_table(self, table: TableInfo):
+        positions = self._positions[table.table_name] = {}
+        for i, field in enumerate(table.table_fields or []):
+            self._fields[(table.table_name, field.field_name)] = field
+            positions[field.field_name] = i
+
+    def _unindex_table(self, table: TableInfo):
+        for field in table.table_fields or []:
+            self._fields.pop((table.table_name, field.field_name), None)
+        self._positions.pop(table.table_name, None)
+
+    def add_data_source(self, ds_info: DataSourceInfo):
+        self.data_sources[ds_info.ds_name] = ds_info
+
+    def get_data_source(self, ds_name: str) -> Optional[DataSourceInfo]:
+        return self.data_sources.get(ds_name)
+
+    def remove_data_source(self, ds_name: str) -> Optional[DataSourceInfo]:
+        return self.data_sources.pop(ds_name, None)
+
     def add_table(self, table: TableInfo):
+        """
+        Add a table, or replace the table with the same name
+        """
+        self.remove_table(table.table_name)
         self.tables[table.table_name] = table
+        self._index_table(table)
+
+    def get_table(self, table_name: str) -> Optional[TableInfo]:
+        return self.tables.get(table_name)
+
+    def remove_table(self, table_name: str) -> Optional[TableInfo]:
+        table = self.tables.pop(table_name, None)
+        if table is not None:
+            self._unindex_table(table)
+        return table
+
+    def get_field(self, table_name: str, field_name: str) -> Optional[FieldInfo]:
+        return self._fields.get((table_name, field_name))
 
     def add_field(self, table_name: str, field: FieldInfo):
-        if table_name in self.tables:
-            self.tables[table_name].table_fields.append(field)
+        """
+        Add a field to a table, or replace the field with the same name. The table is created if needed.
+        """
+        table = self.tables.get(table_name)
+        if table is None:
+            self.add_table(TableInfo(table_name=table_name, table_fields=[field]))
+            return
+        if table.table_fields is None:
+            table.table_fields = []
+        positions = self._positions[table_name]
+        position = positions.get(field.field_name)
+        # the list is changed in place, the table is not validated again
+        if position is None:
+            positions[field.field_name] = len(table.table_fields)
+            table.table_fields.append(field)
         else:
-            self.tables[table_name] = TableInfo(table_name, [field])
+            table.table_fields[position] = field
+        self._fields[(table_name, field.field_name)] = field
+
+    def remove_field(self, table_name: str, field_name: str) -> Optional[FieldInfo]:
+        field = self._fields.pop((table_name, field_name), None)
+        if field is not None:
+            fields = self.tables[table_name].table_fields
+            positions = self._positions[table_name]
+            position = positions.pop(field_name)
+            del fields[position]
+            for following in fields[position:]:
+                positions[following.field_name] -= 1
+        return field
 
 
 class DataSourceConfiguration:
@@ -0,0 +1,181 @@
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from typing import Callable, Iterable, Iterator, NamedTuple, Optional
+
+from src.model.locking import NamespaceWrite, file_writer
+from src.model.meta import SCHEMA_VERSION
+from src.model.storage import (
+    RE_DATA_SOURCE_INFO, RE_TABLE_INFO, SCHEMA_VERSION_KEY, SHARED_FIELDS_KEY, TABLES_KEY, dump_json, ls_doc_files,
+    read_text, stamp,
+)
+
+# docs exported before the version stamp
+UNVERSIONED = 1
+
+KIND_TABLE = "table"
+KIND_FIELD = "field"
+KIND_DATA_SOURCE = "data_source"
+
+STATUS_MIGRATED = "migrated"
+STATUS_CURRENT = "current"
+STATUS_FAILED = "failed"
+
+# bytes read to find the stamp, it is the first key of a document
+HEAD_SIZE = 256
+_HEAD_VERSION = re.compile(rf'^\s*\[?\s*{{\s*"{SCHEMA_VERSION_KEY}"\s*:\s*(\d+)')
+
+# (kind, version) -> function upgrading a document of this kind from `version` to `version + 1`.
+# A table migration does not touch its fields, they are upgraded by the field migrations.
+MIGRATIONS: dict[tuple[str, int], Callable[[dict], dict]] = {}
+
+
+class MigrationError(Exception):
+    pass
+
+
+class FileMigration(NamedTuple):
+    path: str
+    version: Optional[int]
+    status: str
+    error: Optional[str] = None
+
+
+def migration(kind: str, version: int):
+    def decorator(func: Callable[[dict], dict]):
+        MIGRATIONS[(kind, version)] = func
+        return func
+    return decorator
+
+
+@migration(KIND_TABLE, 1)
+def _add_table_foreign_keys(table: dict) -> dict:
+    return {**table, "table_foreign_keys": table.get("table_foreign_keys")}
+
+
+def _step(kind: str, version: int, doc: dict) -> dict:
+    func = MIGRATIONS.get((kind, version))
+    return func(doc) if func is not None else doc
+
+
+def version_of(doc: dict) -> int:
+    return doc.get(SCHEMA_VERSION_KEY, UNVERSIONED)
+
+
+def _check(version: int, target: int):
+    if version > target:
+        raise MigrationError(f"Version {version} is newer than {target}, docs are never downgraded")
+
+
+def upgrade_doc(kind: str, doc: dict, target: int = SCHEMA_VERSION) -> dict:
+    """
+    One table or data source upgraded version by version to `target`, the fields of a table with it
+    """
+    version = version_of(doc)
+    _check(version, target)
+    for step in range(version, target):
+        doc = _step(kind, step, doc)
+        if kind == KIND_TABLE and doc.get("table_fields"):
+            doc = {**doc, "table_fields": [_step(KIND_FIELD, step, field) for field in doc["table_fields"]]}
+    return stamp(doc, target)
+
+
+def upgrade_shared(data: dict, target: int = SCHEMA_VERSION) -> dict:
+    """
+    Shared fields export or compacted file: the file is stamped once, fields and tables are upgraded apart
+    """
+    version = version_of(data)
+    _check(version, target)
+    shared_fields = data[SHARED_FIELDS_KEY]
+    tables = data[TABLES_KEY]
+    for step in range(version, target):
+        shared_fields = {ref: _step(KIND_FIELD, step, field) for ref, field in shared_fields.items()}
+        tables = [_step(KIND_TABLE, step, table) for table in tables]
+    return stamp({**data, SHARED_FIELDS_KEY: shared_fields, TABLES_KEY: tables}, target)
+
+
+def content_version(data) -> int:
+    """
+    Oldest version of the documents of a file
+    """
+    if isinstance(data, dict):
+        return version_of(data)
+    return min((version_of(doc) for doc in data), default=SCHEMA_VERSION)
+
+
+def upgrade_content(data, target: int = SCHEMA_VERSION):
+    """
+    Content of a docs file in any layout written by the exports, upgraded to `target`
+    """
+    if isinstance(data, list):
+        return [upgrade_doc(KIND_TABLE, table, target) for table in data]
+    if SHARED_FIELDS_KEY in data:
+        return upgrade_shared(data, target)
+    if "table_name" in data:
+        return upgrade_doc(KIND_TABLE, data, target)
+    if "ds_name" in data:
+        return upgrade_doc(KIND_DATA_SOURCE, data, target)
+    raise MigrationError("Unknown docs layout")
+
+
+def head_version(path: str) -> Optional[int]:
+    """
+    Version stamped at the start of a file, None when the file has to be parsed to know it
+    """
+    with open(path, "r") as file:
+        match = _HEAD_VERSION.match(file.read(HEAD_SIZE))
+    return int(match.group(1)) if match else None
+
+
+def migrate_file(path: str, target: int = SCHEMA_VERSION, dry_run: bool = False) -> FileMigration:
+    """
+    Upgrade one docs file in place, keeping its layout and modification time.
+    Files already at `target` are only read up to their stamp.
+    """
+    try:
+        if head_version(path) == target:
+            return FileMigration(path, target, STATUS_CURRENT)
+        # a writer of the namespace could replace the file between its read and its upgrade
+        with nullcontext() if dry_run else file_writer(path) as write:
+            return _upgrade_file(path, target, write)
+    except (OSError, ValueError, KeyError, MigrationError) as e:
+        return FileMigration(path, None, STATUS_FAILED, f"{type(e).__name__}: {e}")
+
+
+def _upgrade_file(path: str, target: int, write: Optional[NamespaceWrite]) -> FileMigration:
+    text = read_text(path)
+    data = json.loads(text)
+    version = content_version(data)
+    if version == target:
+        return FileMigration(path, version, STATUS_CURRENT)
+    upgraded = upgrade_content(data, target)
+    if write is not None:
+        stat = os.stat(path)
+        # the loaders and the compaction order files by modification time
+        write.write(path, dump_json(upgraded, compact="\n" not in text.strip()))
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    return FileMigration(path, version, STATUS_MIGRATED)
+
+
+def _migrate_file(args: tuple) -> FileMigration:
+    return migrate_file(*args)
+
+
+def doc_files(path: str) -> Iterator[str]:
+    for pattern in (RE_TABLE_INFO, RE_DATA_SOURCE_INFO):
+        yield from ls_doc_files(path, pattern)
+
+
+def migrate_files(files: Iterable[str], target: int = SCHEMA_VERSION, dry_run: bool = False,
+                  workers: Optional[int] = None, chunk_size: int = 64) -> Iterator[FileMigration]:
+    """
+    Stream files through the migration chain in worker processes, results come in the order of `files`
+    """
+    tasks = ((path, target, dry_run) for path in files)
+    if workers == 1:
+        yield from map(_migrate_file, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        yield from executor.map(_migrate_file, tasks, chunksize=chunk_size)
@@ -0,0 +1,229 @@
+import json
+import struct
+from array import array
+from typing import Any, BinaryIO, Iterable, NamedTuple, Optional
+
+from pydantic import BaseModel
+
+from src.model.meta import DataSourceInfo, FieldInfo, TableInfo
+
+SNAPSHOT_MAGIC = b"DDSNAP"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_EXTENSION = ".ddsnap"
+RE_SNAPSHOT = r"^.*-snapshot(-.*)?(\.ddsnap)$"
+
+_PREAMBLE = struct.Struct("<6sHI")
+
+KIND_STR = "str"
+KIND_BOOL = "bool"
+KIND_INT = "int"
+KIND_FLOAT = "float"
+KIND_JSON = "json"
+
+_NUMBER_TYPECODES = {KIND_INT: "q", KIND_FLOAT: "d"}
+_BOOLS = (None, False, True)
+_STRING_SEPARATOR = "\x00"
+# field count of a table whose table_fields is None
+_NO_FIELDS = 0xFFFFFFFF
+
+
+class Snapshot(NamedTuple):
+    data_sources: list[dict]
+    tables: list[dict]
+
+
+def column_kind(model: type[BaseModel], name: str) -> str:
+    types = set(model.get_types(model.model_fields[name])) - {type(None)}
+    if types == {str}:
+        return KIND_STR
+    if types == {bool}:
+        return KIND_BOOL
+    if types == {int}:
+        return KIND_INT
+    if types == {float}:
+        return KIND_FLOAT
+    return KIND_JSON
+
+
+def model_columns(model: type[BaseModel], exclude: Iterable[str] = ()) -> list[list[str]]:
+    return [[name, column_kind(model, name)] for name in model.model_fields if name not in exclude]
+
+
+class _StringTable:
+
+    def __init__(self):
+        # index 0 is reserved for None
+        self.indexes: dict[str, int] = {}
+        self.strings: list[str] = [""]
+
+    def index(self, value: Any) -> int:
+        if value is None:
+            return 0
+        index = self.indexes.get(value)
+        if index is None:
+            if _STRING_SEPARATOR in value:
+                raise ValueError(f"Value {value!r} can not be stored in a snapshot")
+            index = self.indexes[value] = len(self.strings)
+            self.strings.append(value)
+        return index
+
+    def to_bytes(self) -> bytes:
+        return _STRING_SEPARATOR.join(self.strings).encode("utf-8")
+
+
+def _index_typecode(size: int) -> str:
+    for typecode in ("B", "H", "I"):
+        if size <= 1 << (8 * array(typecode).itemsize):
+            return typecode
+    raise ValueError(f"Too many values for a snapshot: {size}")
+
+
+def _encode_column(kind: str, values: list, strings: _StringTable) -> bytes:
+    # string indexes are stored as int32 first, narrowed once the string table is complete
+    if kind == KIND_STR:
+        return array("I", [strings.index(v) for v in values]).tobytes()
+    if kind == KIND_JSON:
+        return array("I", [strings.index(None if v is None else json.dumps(v, default=str)) for v in values]).tobytes()
+    if kind == KIND_BOOL:
+        return bytes(0 if v is None else 2 if v else 1 for v in values)
+    typecode = _NUMBER_TYPECODES[kind]
+    mask = bytes(v is not None for v in values)
+    return mask + array(typecode, [0 if v is None else v for v in values]).tobytes()
+
+
+def _narrow(chunk: bytes, typecode: str) -> bytes:
+    return array(typecode, array("I", chunk)).tobytes()
+
+
+def _decode_column(kind: str, data: memoryview, count: int, strings: list, typecode: str) -> list:
+    if kind == KIND_STR:
+        indexes = array(typecode)
+        indexes.frombytes(data)
+        return [strings[i] for i in indexes]
+    if kind == KIND_JSON:
+        indexes = array(typecode)
+        indexes.frombytes(data)
+        return [None if i == 0 else json.loads(strings[i]) for i in indexes]
+    if kind == KIND_BOOL:
+        return [_BOOLS[b] for b in data]
+    mask = data[:count]
+    values = array(_NUMBER_TYPECODES[kind])
+    values.frombytes(data[count:])
+    if all(mask):
+        return values.tolist()
+    return [v if m else None for v, m in zip(values, mask)]
+
+
+def dump_snapshot(data_sources: Iterable[dict], tables: Iterable[dict],
+                  sources: Optional[dict[str, int]] = None) -> bytes:
+    """
+    Binary snapshot of data sources and tables. Values are stored column by column,
+    strings and field definitions are deduplicated. The header describes the columns, so a
+    snapshot written by an older model stays readable. `sources` are the JSON docs files it was written from
+    with their modification time, the loaders only read it instead of them while they are unchanged.
+    """
+    data_sources = list(data_sources)
+    tables = list(tables)
+    field_columns = list(FieldInfo.model_fields)
+    distinct_fields = {}
+    field_refs = array("I")
+    for table in tables:
+        for field in table.get("table_fields") or []:
+            key = json.dumps([field.get(name) for name in field_columns], default=str)
+            field_refs.append(distinct_fields.setdefault(key, len(distinct_fields)))
+    fields = [json.loads(key) for key in distinct_fields]
+    fields = [dict(zip(field_columns, values)) for values in fields]
+    records = {
+        "DataSourceInfo": (data_sources, model_columns(DataSourceInfo)),
+        "TableInfo": (tables, model_columns(TableInfo, exclude=("table_fields",))),
+        "FieldInfo": (fields, model_columns(FieldInfo)),
+    }
+    strings = _StringTable()
+    sections = []
+    chunks = []
+    for model_name, (rows, columns) in records.items():
+        for name, kind in columns:
+            chunk = _encode_column(kind, [row.get(name) for row in rows], strings)
+            sections.append([model_name, name, kind, len(chunk)])
+            chunks.append(chunk)
+    field_counts = array("I", [
+        _NO_FIELDS if table.get("table_fields") is None else len(table["table_fields"]) for table in tables
+    ]).tobytes()
+    string_table = strings.to_bytes()
+    string_typecode = _index_typecode(len(strings.strings))
+    field_typecode = _index_typecode(len(fields))
+    for i, (_, _, kind, _) in enumerate(sections):
+        if kind in (KIND_STR, KIND_JSON):
+            chunks[i] = _narrow(chunks[i], string_typecode)
+            sections[i][3] = len(chunks[i])
+    field_refs = array(field_typecode, field_refs).tobytes()
+    header = json.dumps({
+        "version": SNAPSHOT_VERSION,
+        "counts": {model_name: len(rows) for model_name, (rows, _) in records.items()},
+        "sections": sections,
+        "strings": [len(string_table), string_typecode],
+        "field_counts": len(field_counts),
+        "field_refs": [len(field_refs), field_typecode],
+        **({"sources": sources} if sources is not None else {}),
+    }).encode("utf-8")
+    return b"".join([
+        _PREAMBLE.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(header)),
+        header, string_table, field_counts, field_refs, *chunks,
+    ])
+
+
+def load_snapshot(data: bytes) -> Snapshot:
+    magic, version, header_size = _PREAMBLE.unpack_from(data)
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a docs snapshot")
+    if version > SNAPSHOT_VERSION:
+        raise ValueError(f"Snapshot version {version} is not supported, upgrade the tool")
+    view = memoryview(data)
+    offset = _PREAMBLE.size
+    header = json.loads(bytes(view[offset:offset + header_size]))
+    offset += header_size
+    strings_size, string_typecode = header["strings"]
+    strings = [None, *bytes(view[offset:offset + strings_size]).decode("utf-8").split(_STRING_SEPARATOR)[1:]]
+    offset += strings_size
+    field_counts = array("I")
+    field_counts.frombytes(view[offset:offset + header["field_counts"]])
+    offset += header["field_counts"]
+    field_refs_size, field_typecode = header["field_refs"]
+    field_refs = array(field_typecode)
+    field_refs.frombytes(view[offset:offset + field_refs_size])
+    offset += field_refs_size
+
+    columns = {model_name: {} for model_name in header["counts"]}
+    for model_name, name, kind, size in header["sections"]:
+        count = header["counts"][model_name]
+        columns[model_name][name] = _decode_column(kind, view[offset:offset + size], count, strings, string_typecode)
+        offset += size
+
+    def rows(model_name: str) -> list[dict]:
+        names = list(columns[model_name])
+        if not names:
+            return [{} for _ in range(header["counts"][model_name])]
+        return [dict(zip(names, values)) for values in zip(*columns[model_name].values())]
+
+    # identical field definitions share one dict, copy a field before changing it
+    distinct_fields = rows("FieldInfo")
+    fields = [distinct_fields[i] for i in field_refs]
+    tables = rows("TableInfo")
+    start = 0
+    for table, count in zip(tables, field_counts):
+        if count == _NO_FIELDS:
+            table["table_fields"] = None
+            continue
+        table["table_fields"] = fields[start:start + count]
+        start += count
+    return Snapshot(rows("DataSourceInfo"), tables)
+
+
+def read_header(file: BinaryIO) -> dict:
+    """
+    Header of a snapshot, read without its columns
+    """
+    magic, version, header_size = _PREAMBLE.unpack(file.read(_PREAMBLE.size))
+    if magic != SNAPSHOT_MAGIC:
+        raise ValueError("Not a docs snapshot")
+    return json.loads(file.read(header_size))
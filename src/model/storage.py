@@ -0,0 +1,362 @@
+import json
+import os
+import re
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import Any, Callable, Iterable, Iterator, Optional, Tuple, Union
+
+from pydantic import BaseModel
+
+from src.helpers.files import is_file, ls_all_files_in_directory
+from src.helpers.metrics import hit_rate, metrics
+from src.helpers.profiler import span
+from src.model.meta import SCHEMA_VERSION, DataSourceInfo, FieldInfo, TableInfo
+from src.model.snapshot import RE_SNAPSHOT, Snapshot, load_snapshot, read_header
+
+RE_DATA_SOURCE_INFO = r"^.*-datasourceinfo-.*(.json)$"
+RE_TABLE_INFO = r"^.*-tableinfo-.*(.json)$"
+RE_COMPACTED = r"^.*-tableinfo-compacted(.json)$"
+# files of a namespace are named {namespace}-{kind}..., namespaces may contain "-"
+RE_NAMESPACE = re.compile(r"^(?P<namespace>.+?)-(?:tableinfo|datasourceinfo|snapshot)")
+
+SHARED_FIELDS_KEY = "shared_fields"
+TABLES_KEY = "tables"
+COMPACTION_KEY = "compaction"
+SCHEMA_VERSION_KEY = "schema_version"
+
+files_scanned = metrics.counter("docs_files_scanned_total", "Directory entries scanned for docs files")
+bytes_read = metrics.counter("docs_bytes_read_total", "Bytes of docs files read")
+
+# set while docs are read as of one generation of their namespaces, see `locking.consistent_read`
+read_view: ContextVar[Optional[Any]] = ContextVar("read_view", default=None)
+
+# compacted file -> (its mtime, {merged file name: mtime when merged}), recorded when it is read
+_compaction_sources: dict[str, tuple[int, dict[str, int]]] = {}
+
+
+@lru_cache(maxsize=None)
+def model_defaults(model: type[BaseModel]) -> dict[str, Any]:
+    """
+    Values a loader restores for keys missing from a document: the field default, or None
+    """
+    return {name: model.get_default(info) for name, info in model.model_fields.items()}
+
+
+metrics.gauge(
+    "model_defaults_cache_hit_rate",
+    hit_rate(lambda: model_defaults.cache_info().hits, lambda: model_defaults.cache_info().misses),
+    "Hit rate of the per-model defaults cache",
+)
+
+
+def namespace_of(file_path: str) -> Optional[str]:
+    match = RE_NAMESPACE.match(os.path.basename(file_path))
+    return match.group("namespace") if match else None
+
+
+def _is_default(value: Any, default: Any) -> bool:
+    # `type` check keeps 0 and False apart
+    return value is default or (type(value) is type(default) and value == default)
+
+
+def compact_doc(data: dict, model: type[BaseModel]) -> dict:
+    """
+    Drop the keys whose value the loader restores by itself, see `expand_doc`
+    """
+    defaults = model_defaults(model)
+    return {k: v for k, v in data.items() if k not in defaults or not _is_default(v, defaults[k])}
+
+
+def expand_doc(data: dict, model: type[BaseModel]) -> dict:
+    return {**model_defaults(model), **data}
+
+
+def compact_table(table: dict) -> dict:
+    compacted = compact_doc(table, TableInfo)
+    if fields := compacted.get("table_fields"):
+        compacted["table_fields"] = [compact_doc(field, FieldInfo) for field in fields]
+    return compacted
+
+
+def expand_table(table: dict) -> dict:
+    expanded = expand_doc(table, TableInfo)
+    if fields := expanded.get("table_fields"):
+        expanded["table_fields"] = [expand_doc(field, FieldInfo) for field in fields]
+    return expanded
+
+
+def stamp(data: dict, version: int = SCHEMA_VERSION) -> dict:
+    """
+    Document with its schema version first, so the version is read without parsing the whole file
+    """
+    return {SCHEMA_VERSION_KEY: version, **{k: v for k, v in data.items() if k != SCHEMA_VERSION_KEY}}
+
+
+def dump_json(data: Any, compact: bool = False) -> str:
+    if compact:
+        return json.dumps(data, separators=(",", ":"), default=str)
+    return json.dumps(data, indent=2, default=str)
+
+
+def dump_doc(doc: Union[BaseModel, dict, list], compact: bool = False) -> str:
+    """
+    Serialize a data source, a table or a list of tables, each stamped with the schema version.
+    The compact profile omits null and default values and drops the indentation.
+    """
+    if not compact:
+        if isinstance(doc, BaseModel):
+            data = stamp(doc.model_dump(mode="json"))
+        elif isinstance(doc, dict):
+            data = stamp(doc)
+        else:
+            data = [stamp(t.model_dump(mode="json") if isinstance(t, TableInfo) else t) for t in doc]
+        return dump_json(data)
+    if isinstance(doc, DataSourceInfo):
+        data = stamp(compact_doc(doc.model_dump(mode="json"), DataSourceInfo))
+    elif isinstance(doc, TableInfo):
+        data = stamp(compact_table(doc.model_dump(mode="json")))
+    elif isinstance(doc, dict):
+        data = stamp(compact_table(doc) if "table_name" in doc else compact_doc(doc, DataSourceInfo))
+    else:
+        data = [stamp(compact_table(t.model_dump(mode="json") if isinstance(t, TableInfo) else t)) for t in doc]
+    return dump_json(data, compact=True)
+
+
+def write_atomic(path: str, data: Union[str, bytes]):
+    """
+    Readers see the previous file or the new one, never a partial write
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_file(path: str, read: Callable[[str], Any]) -> Any:
+    """
+    Result of `read` on a docs file, on the version of the file in effect for the current read view
+    """
+    view = read_view.get()
+    if view is not None:
+        return view.read_text(path, read)
+    return read(path)
+
+
+def read_text(path: str) -> str:
+    return read_file(path, _read_text)
+
+
+def _read_text(path: str) -> str:
+    with span("read files"), open(path, "r") as file:
+        bytes_read.inc(os.fstat(file.fileno()).st_size)
+        return file.read()
+
+
+def _read_bytes(path: str) -> bytes:
+    with span("read files"), open(path, "rb") as file:
+        bytes_read.inc(os.fstat(file.fileno()).st_size)
+        return file.read()
+
+
+def _read_snapshot_header(path: str) -> dict:
+    with open(path, "rb") as file:
+        return read_header(file)
+
+
+def read_snapshot(path: str) -> Snapshot:
+    return load_snapshot(read_file(path, _read_bytes))
+
+
+def read_json(path: str) -> Any:
+    text = read_text(path)
+    with span("parse json"):
+        return json.loads(text)
+
+
+def expand_shared_tables(data: dict) -> list[dict]:
+    shared_fields = data[SHARED_FIELDS_KEY]
+    return [
+        {**table, "table_fields": [shared_fields[ref] for ref in table.get("table_fields") or []]}
+        for table in data[TABLES_KEY]
+    ]
+
+
+def table_docs_from_data(data) -> list[dict]:
+    """
+    Normalize the content of a tableinfo file to a list of table dicts
+    `configure-table` writes one table object, `configure-tables` writes an array,
+    a shared fields export writes field definitions once and tables referring to them
+    """
+    if isinstance(data, dict):
+        if SHARED_FIELDS_KEY in data:
+            return [expand_table(table) for table in expand_shared_tables(data)]
+        return [expand_table(data)]
+    return [expand_table(table) for table in data]
+
+
+def is_compacted(file_path: str) -> bool:
+    return re.match(RE_COMPACTED, os.path.basename(file_path)) is not None
+
+
+def ls_doc_files(path: str, pattern: str, namespace: Optional[str] = None) -> Iterator[str]:
+    """
+    Docs files of a directory, compacted files first: a file written after a compaction overrides them
+    """
+    prefix = f"{namespace}-" if namespace else ""
+    if is_file(path):
+        if re.match(pattern, path) and os.path.basename(path).startswith(prefix):
+            yield path
+        return
+    with span("list files"):
+        entries = list(ls_all_files_in_directory(path))
+        files = [
+            f"{directory}/{filename}" for directory, filename in entries
+            if re.match(pattern, filename) and filename.startswith(prefix)
+        ]
+        if (view := read_view.get()) is not None:
+            files = view.list_files(path, files, pattern, prefix)
+        files.sort(key=lambda f: not is_compacted(f))
+    files_scanned.inc(len(entries))
+    yield from files
+
+
+def is_snapshot(file_path: str) -> bool:
+    return re.match(RE_SNAPSHOT, os.path.basename(file_path)) is not None
+
+
+def snapshot_sources(path: str, namespace: str) -> dict[str, int]:
+    """
+    JSON docs files of a namespace with their modification time, the ones a snapshot of `path` is written from
+    """
+    return {
+        os.path.basename(file_path): os.stat(file_path).st_mtime_ns
+        for pattern in (RE_DATA_SOURCE_INFO, RE_TABLE_INFO)
+        for file_path in ls_doc_files(path, pattern, namespace)
+        if namespace_of(file_path) == namespace
+    }
+
+
+def is_fresh_snapshot(directory: str, file_path: str) -> bool:
+    """
+    A snapshot stands for the JSON docs of its namespace while none of them was created, changed or removed
+    since it was written, or when it is left alone. A snapshot written without its sources only while it is
+    newer than all of them.
+    """
+    current = snapshot_sources(directory, namespace_of(file_path))
+    if not current:
+        return True
+    sources = read_file(file_path, _read_snapshot_header).get("sources")
+    if sources is None:
+        return os.stat(file_path).st_mtime_ns >= max(current.values())
+    return sources == current
+
+
+def with_snapshots(directory: str, files: list[str]) -> list[str]:
+    """
+    Docs files of a directory the loaders read: a fresh snapshot instead of the JSON docs of its namespace,
+    the JSON docs rather than a stale snapshot
+    """
+    snapshots = [file_path for file_path in files if is_snapshot(file_path)]
+    if not snapshots:
+        return files
+    fresh = {file_path for file_path in snapshots if is_fresh_snapshot(directory, file_path)}
+    covered = {namespace_of(file_path) for file_path in fresh}
+    return [
+        file_path for file_path in files
+        if (file_path in fresh if is_snapshot(file_path) else namespace_of(file_path) not in covered)
+    ]
+
+
+def doc_files(path: str, patterns: Iterable[str], namespace: Optional[str] = None) -> list[str]:
+    """
+    Docs files matching one of `patterns` in the order they are read, see `with_snapshots`.
+    A snapshot given as `path` is read whatever its age.
+    """
+    files = [file_path for pattern in patterns for file_path in ls_doc_files(path, pattern, namespace)]
+    return files if is_file(path) else with_snapshots(path, files)
+
+
+def compaction_sources(file_path: str) -> dict[str, int]:
+    """
+    Files merged into a compacted file with their modification time when they were merged
+    """
+    if not is_compacted(file_path):
+        return {}
+    file_path = os.path.normpath(file_path)
+    mtime, sources = _compaction_sources.get(file_path, (None, {}))
+    current = os.stat(file_path).st_mtime_ns
+    if mtime != current:
+        data = read_json(file_path)
+        sources = data.get(COMPACTION_KEY, {}).get("sources", {}) if isinstance(data, dict) else {}
+        _compaction_sources[file_path] = (current, sources)
+    return sources
+
+
+def merged_sources(file_path: str, sources: Optional[dict[str, int]] = None) -> set[str]:
+    """
+    Files merged into a compacted file and not modified since, the loaders skip them.
+    They are only left when a compaction stopped before removing them.
+    """
+    if sources is None:
+        sources = compaction_sources(file_path)
+    directory = os.path.dirname(os.path.normpath(file_path))
+    merged = set()
+    for name, merged_mtime in sources.items():
+        source = os.path.join(directory, name)
+        try:
+            if os.stat(source).st_mtime_ns == merged_mtime:
+                merged.add(source)
+        except FileNotFoundError:
+            pass
+    return merged
+
+
+def read_table_docs(file_path: str) -> list[dict]:
+    """
+    Table dicts of one tableinfo file or snapshot
+    """
+    if is_snapshot(file_path):
+        return [expand_table(table) for table in read_snapshot(file_path).tables]
+    data = read_json(file_path)
+    if is_compacted(file_path) and isinstance(data, dict):
+        _compaction_sources[os.path.normpath(file_path)] = (
+            os.stat(file_path).st_mtime_ns, data.get(COMPACTION_KEY, {}).get("sources", {})
+        )
+    return table_docs_from_data(data)
+
+
+def read_data_source_docs(file_path: str) -> list[dict]:
+    """
+    Data source dicts of one datasourceinfo file or snapshot
+    """
+    if is_snapshot(file_path):
+        return [expand_doc(data_source, DataSourceInfo) for data_source in read_snapshot(file_path).data_sources]
+    return [expand_doc(read_json(file_path), DataSourceInfo)]
+
+
+def iter_table_docs(path: str, namespace: Optional[str] = None) -> Iterator[Tuple[str, list[dict]]]:
+    """
+    Yield (file path, table dicts) for every tableinfo file and snapshot under `path`
+    """
+    merged = set()
+    for file_path in doc_files(path, (RE_TABLE_INFO, RE_SNAPSHOT), namespace):
+        if os.path.normpath(file_path) in merged:
+            continue
+        yield file_path, read_table_docs(file_path)
+        merged |= merged_sources(file_path)
+
+
+def iter_data_source_docs(path: str, namespace: Optional[str] = None) -> Iterator[Tuple[str, dict]]:
+    """
+    Yield (file path, data source dict) for every datasourceinfo file and snapshot under `path`
+    """
+    for file_path in doc_files(path, (RE_DATA_SOURCE_INFO, RE_SNAPSHOT), namespace):
+        for data_source in read_data_source_docs(file_path):
+            yield file_path, data_source
@@ -0,0 +1,64 @@
+import itertools
+import json
+import os
+import socket
+from typing import Any, Optional
+
+from src.server.daemon import DAEMON_SUPPORTED, default_socket_path
+
+DEFAULT_TIMEOUT = 60.0
+
+
+class DaemonError(Exception):
+    pass
+
+
+class DaemonClient:
+    """
+    Blocking client of the docs daemon, one connection reused for every request
+    """
+
+    def __init__(self, sock: socket.socket):
+        self._sock = sock
+        self._file = sock.makefile("rb")
+        self._ids = itertools.count(1)
+
+    @classmethod
+    def connect(cls, socket_path: Optional[str] = None, timeout: float = DEFAULT_TIMEOUT) -> Optional['DaemonClient']:
+        """
+        A client when a daemon is listening, None otherwise
+        """
+        if not DAEMON_SUPPORTED:
+            return None
+        socket_path = socket_path or default_socket_path()
+        if not os.path.exists(socket_path):
+            return None
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(timeout)
+        try:
+            sock.connect(socket_path)
+        except OSError:
+            sock.close()
+            return None
+        return cls(sock)
+
+    def request(self, op: str, **params) -> Any:
+        request_id = next(self._ids)
+        self._sock.sendall(json.dumps({"id": request_id, "op": op, "params": params}).encode("utf-8") + b"\n")
+        line = self._file.readline()
+        if not line:
+            raise DaemonError("The daemon closed the connection")
+        response = json.loads(line)
+        if not response.get("ok"):
+            raise DaemonError(response.get("error"))
+        return response["result"]
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+    def __enter__(self) -> 'DaemonClient':
+        return self
+
+    def __exit__(self, *args):
+        self.close()
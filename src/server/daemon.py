@@ -0,0 +1,230 @@
+import asyncio
+import functools
+import json
+import os
+import signal
+import socket
+import tempfile
+import threading
+from typing import Any, Optional
+
+from pydantic import ValidationError
+
+from src.configurator.configurator import DatasourceInfoConfigurator, TableInfoConfigurator
+from src.helpers.watch import watch
+from src.model.docs import data_source_files, table_files
+from src.logger.log import Logger
+from src.model.index import NameIndex
+
+SOCKET_ENV = "DDOCS_SOCKET"
+LOGGER_NAME = "ddocs-daemon"
+KIND_TABLES = "tables"
+KIND_DATA_SOURCES = "data_sources"
+# a request or a response is one JSON document per line
+STREAM_LIMIT = 16 << 20
+# the daemon listens on a Unix socket, elsewhere the commands always run locally
+DAEMON_SUPPORTED = os.name == "posix"
+
+
+def default_socket_path() -> Optional[str]:
+    """
+    Socket of the daemon of the current user, None where the daemon is not supported
+    """
+    if not DAEMON_SUPPORTED:
+        return None
+    return os.environ.get(SOCKET_ENV) or os.path.join(tempfile.gettempdir(), f"ddocs-{os.getuid()}.sock")
+
+
+def table_view(table) -> tuple[str, str]:
+    configurator = TableInfoConfigurator()
+    configurator.configure(table)
+    return f"Table: {configurator.table_name}", configurator.show_table(show_index=True)
+
+
+def data_source_view(ds_info) -> tuple[str, str]:
+    configurator = DatasourceInfoConfigurator()
+    configurator.configure(ds_info)
+    return f"Data Source: {configurator.ds_name}", configurator.show_table()
+
+
+class DocsState:
+    """
+    Validated docs of one directory with their name index and rendered views, kept warm between requests.
+    A changed file only invalidates the views of the documents it changed.
+    """
+
+    def __init__(self, path: str, logger: Logger):
+        self.path = path
+        self.logger = logger
+        self.files = {KIND_TABLES: table_files(), KIND_DATA_SOURCES: data_source_files()}
+        self.render = {KIND_TABLES: table_view, KIND_DATA_SOURCES: data_source_view}
+        self.views: dict[tuple[str, str], tuple[str, str]] = {}
+        self.index = NameIndex()
+        for files in self.files.values():
+            files.load(path)
+        for file_path, tables in self.files[KIND_TABLES].files.items():
+            self.index.update_file(file_path, [table.model_dump() for table in tables.values()])
+
+    def documents(self, kind: str) -> dict[str, Any]:
+        return self.files[kind].documents()
+
+    def view(self, kind: str, name: str, doc: Any) -> tuple[str, str]:
+        key = (kind, name)
+        if key not in self.views:
+            self.views[key] = self.render[kind](doc)
+        return self.views[key]
+
+    def update(self, changed: set[str]):
+        for file_path in changed:
+            for kind, files in self.files.items():
+                if not files.matches(file_path):
+                    continue
+                try:
+                    changes = files.update(file_path)
+                except (ValidationError, ValueError, OSError) as e:
+                    self.logger.error(f"Skip {file_path}: {e}")
+                    continue
+                for name in changes:
+                    self.views.pop((kind, name), None)
+                if kind != KIND_TABLES:
+                    continue
+                for updated in files.updated:
+                    tables = files.files.get(updated)
+                    if tables is None:
+                        self.index.remove_file(updated)
+                    else:
+                        self.index.update_file(updated, [table.model_dump() for table in tables.values()])
+
+
+class DocsDaemon:
+    """
+    Answers JSON requests on a Unix socket from one asyncio event loop, clients are served concurrently.
+    Request: {"id": ..., "op": ..., "params": {...}}, response: {"id": ..., "ok": true, "result": ...}
+    or {"id": ..., "ok": false, "error": "..."}.
+    Without a `logger`, the daemon logs to the directory of its socket.
+    """
+
+    def __init__(self, socket_path: Optional[str] = None, polling: bool = False, logger: Optional[Logger] = None):
+        self.socket_path = socket_path or default_socket_path()
+        self.polling = polling
+        if logger is None and self.socket_path is not None:
+            logger = Logger(LOGGER_NAME, os.path.dirname(os.path.abspath(self.socket_path)))
+        self.logger = logger
+        self.states: dict[str, DocsState] = {}
+        # docs directories being loaded, requests for one of them wait for the same load
+        self._loading: dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopped: Optional[asyncio.Event] = None
+
+    async def state(self, path: str) -> DocsState:
+        """
+        Docs of a directory, loaded by a worker thread the first time so other clients are served meanwhile
+        """
+        path = os.path.abspath(path)
+        if path not in self.states:
+            if path not in self._loading:
+                self._loading[path] = self._loop.run_in_executor(None, functools.partial(DocsState, path, self.logger))
+            try:
+                state = await self._loading[path]
+            finally:
+                self._loading.pop(path, None)
+            if path not in self.states:
+                self.states[path] = state
+                self._watch(state)
+        return self.states[path]
+
+    def _watch(self, state: DocsState):
+        loop = self._loop
+
+        def on_change(changed: set[str]):
+            # the state is only touched from the event loop
+            loop.call_soon_threadsafe(state.update, changed)
+        threading.Thread(
+            target=watch, args=(state.path, on_change), kwargs={"polling": self.polling},
+            name=f"watch {state.path}", daemon=True,
+        ).start()
+
+    def op_ping(self) -> dict:
+        return {"pid": os.getpid(), "paths": list(self.states)}
+
+    async def op_load(self, path: str, kind: str = KIND_TABLES) -> list[tuple[str, str]]:
+        state = await self.state(path)
+        return [state.view(kind, name, doc) for name, doc in state.documents(kind).items()]
+
+    async def op_query(self, path: str, prefix: Optional[str] = None, fuzzy: Optional[str] = None) -> list:
+        """
+        Postings of the names starting with `prefix`, or similar to `fuzzy`, as the search command lists them
+        """
+        state = await self.state(path)
+        terms = [term for term, _ in state.index.fuzzy(fuzzy)] if fuzzy else state.index.prefix(prefix or "")
+        return [posting[:4] for term in terms for posting in state.index.lookup(term)]
+
+    def op_stop(self) -> bool:
+        self._stopped.set()
+        return True
+
+    async def dispatch(self, request: dict) -> dict:
+        response = {"id": request.get("id")}
+        handler = getattr(self, f"op_{request.get('op')}", None)
+        if handler is None:
+            return {**response, "ok": False, "error": f"Unknown operation {request.get('op')}"}
+        try:
+            result = handler(**request.get("params", {}))
+            if asyncio.iscoroutine(result):
+                result = await result
+            return {**response, "ok": True, "result": result}
+        except Exception as e:
+            self.logger.exception(f"Request {request.get('op')} failed")
+            return {**response, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.dispatch(json.loads(line))
+                except ValueError as e:
+                    response = {"id": None, "ok": False, "error": f"Invalid request: {e}"}
+                writer.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # client gone, or the daemon is stopping
+            pass
+        finally:
+            writer.close()
+
+    def _check_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            try:
+                sock.connect(self.socket_path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # left by a daemon that did not stop cleanly
+                os.unlink(self.socket_path)
+                return
+        raise RuntimeError(f"A daemon is already listening on {self.socket_path}")
+
+    async def serve(self, paths: tuple = ()):
+        if self.socket_path is None:
+            raise RuntimeError("The daemon needs Unix sockets, they are not available on this platform")
+        self._check_socket()
+        self._loop = asyncio.get_running_loop()
+        self._stopped = asyncio.Event()
+        self._loop.add_signal_handler(signal.SIGTERM, self._stopped.set)
+        for path in paths:
+            await self.state(path)
+        # the socket is created only readable and writable by its owner, there is no window before a chmod
+        umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self.handle, path=self.socket_path, limit=STREAM_LIMIT)
+        finally:
+            os.umask(umask)
+        try:
+            async with server:
+                await self._stopped.wait()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+    def run(self, paths: tuple = ()):
+        asyncio.run(self.serve(paths))
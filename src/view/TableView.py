@@ -2,6 +2,7 @@ from typing import Optional, Sequence, Any, Union, Iterable
 
 from tabulate import tabulate
 
+from src.helpers.profiler import span
 from src.view.abstract import View
 
 
@@ -12,12 +13,13 @@ class TableView(View):
         self.data = [data] if isinstance(data, str) else data
 
     def render(self, fmt="rounded_grid", show_index=False):
-        return tabulate(
-                            tabular_data=self.data,
-                            showindex=show_index,
-                            headers=self.headers,
-                            tablefmt=fmt,
-                            numalign="center",
-                            stralign="left",
-                            missingval="N/A"
-                        )
+        with span("render"):
+            return tabulate(
+                                tabular_data=self.data,
+                                showindex=show_index,
+                                headers=self.headers,
+                                tablefmt=fmt,
+                                numalign="center",
+                                stralign="left",
+                                missingval="N/A"
+                            )
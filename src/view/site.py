@@ -0,0 +1,325 @@
+import html
+import json
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, NamedTuple, Optional
+from urllib.parse import quote
+
+from src.helpers.files import is_file
+from src.helpers.hashing import content_hash
+from src.model.diff import table_hash
+from src.model.meta import DataSourceInfo, FieldInfo
+from src.model.snapshot import RE_SNAPSHOT
+from src.model.storage import (
+    RE_DATA_SOURCE_INFO, RE_TABLE_INFO, compaction_sources, is_compacted, ls_doc_files, merged_sources,
+    read_data_source_docs, read_table_docs, with_snapshots, write_atomic,
+)
+from src.view.TableView import TableView
+
+SITE_VERSION = 1
+SITE_MANIFEST = ".site-manifest.json"
+
+FORMAT_HTML = "html"
+FORMAT_MARKDOWN = "md"
+SITE_FORMATS = (FORMAT_HTML, FORMAT_MARKDOWN)
+
+KIND_TABLE = "table"
+KIND_DATA_SOURCE = "data_source"
+PAGE_DIRS = {KIND_TABLE: "tables", KIND_DATA_SOURCE: "data-sources"}
+# a data source page is published, its password is not
+HIDDEN_KEYS = {"ds_password"}
+
+_RE_DOC_FILE = re.compile(
+    f"(?P<table>{RE_TABLE_INFO})|(?P<data_source>{RE_DATA_SOURCE_INFO})|(?P<snapshot>{RE_SNAPSHOT})"
+)
+# snapshots hold both kinds
+_FILE_KINDS = {"table": KIND_TABLE, "data_source": KIND_DATA_SOURCE, "snapshot": None}
+
+# below it the pages are rendered faster than a worker pool starts
+MIN_PARALLEL_PAGES = 256
+
+
+class SiteResult(NamedTuple):
+    path: str
+    pages: int
+    rendered: int
+    removed: int
+    # files parsed, the others were known by the manifest
+    files_read: int
+    index_rendered: bool
+
+
+class Doc(NamedTuple):
+    kind: str
+    name: str
+    file_path: str
+    hash: str
+    # tables referenced through foreign keys
+    refs: list[str]
+
+
+def page_path(kind: str, name: str, fmt: str) -> str:
+    return f"{PAGE_DIRS[kind]}/{quote(name, safe='')}.{fmt}"
+
+
+def _doc_entries(kind: str, docs: list[dict]) -> list[list]:
+    if kind == KIND_DATA_SOURCE:
+        return [[doc.get("ds_name"), content_hash(doc), []] for doc in docs]
+    return [
+        [doc.get("table_name"), table_hash(doc),
+         list(dict.fromkeys(fk["fk_table_name"] for fk in doc.get("table_foreign_keys") or []))]
+        for doc in docs
+    ]
+
+
+def _name_key(kind: str) -> str:
+    return "table_name" if kind == KIND_TABLE else "ds_name"
+
+
+def _read_docs(kind: str, file_path: str) -> list[dict]:
+    return read_table_docs(file_path) if kind == KIND_TABLE else read_data_source_docs(file_path)
+
+
+def _escape(value: Any, fmt: str) -> str:
+    if value is None:
+        return ""
+    text = str(value)
+    return html.escape(text) if fmt == FORMAT_HTML else text.replace("|", "\\|").replace("\n", " ")
+
+
+def _link(text: str, target: str, fmt: str) -> str:
+    if fmt == FORMAT_HTML:
+        return f'<a href="{html.escape(target)}">{html.escape(text)}</a>'
+    return f"[{_escape(text, fmt)}]({target})"
+
+
+def _none(fmt: str) -> str:
+    return "None" if fmt == FORMAT_MARKDOWN else "<p>None</p>"
+
+
+def _table(headers: list[str], rows: list[list], fmt: str) -> str:
+    if not rows:
+        return _none(fmt)
+    if fmt == FORMAT_MARKDOWN:
+        return TableView(headers, data=rows).render(fmt="github")
+    # cells are escaped above, links are left as they are; a browser aligns the columns, tabulate would only
+    # pad them and it costs more than the rest of the page
+    head = "".join(f"<th>{html.escape(header)}</th>" for header in headers)
+    body = "\n".join("<tr>" + "".join(f"<td>{cell}</td>" for cell in row) + "</tr>" for row in rows)
+    return f"<table>\n<thead>\n<tr>{head}</tr>\n</thead>\n<tbody>\n{body}\n</tbody>\n</table>"
+
+
+def _page(title: str, sections: list[tuple[str, str]], fmt: str, home: str) -> str:
+    if fmt == FORMAT_MARKDOWN:
+        body = "\n\n".join(f"## {heading}\n\n{content}" for heading, content in sections)
+        return f"[Index]({home})\n\n# {title}\n\n{body}\n"
+    body = "\n".join(f"<h2>{html.escape(heading)}</h2>\n{content}" for heading, content in sections)
+    return (
+        f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{html.escape(title)}</title>\n</head>\n'
+        f'<body>\n<p><a href="{home}">Index</a></p>\n<h1>{html.escape(title)}</h1>\n{body}\n</body>\n</html>\n'
+    )
+
+
+def _list(items: list[str], fmt: str) -> str:
+    if not items:
+        return _none(fmt)
+    if fmt == FORMAT_MARKDOWN:
+        return "\n".join(f"- {item}" for item in items)
+    return "<ul>\n" + "\n".join(f"<li>{item}</li>" for item in items) + "\n</ul>"
+
+
+def render_table(doc: dict, referenced_by: list[str], existing: set[str], fmt: str) -> str:
+    """
+    Page of a table: its fields, its foreign keys and the tables referencing it.
+    A referenced table missing from the namespace is shown without a link.
+    """
+    fields = doc.get("table_fields") or []
+    # columns of the model, those null for every field left out
+    keys = [key for key in FieldInfo.model_fields if any(field.get(key) is not None for field in fields)]
+    field_rows = [[_escape(field.get(key), fmt) for key in keys] for field in fields]
+    fk_rows = []
+    for fk in doc.get("table_foreign_keys") or []:
+        ref = fk["fk_table_name"]
+        target = _link(ref, f"{quote(ref, safe='')}.{fmt}", fmt) if ref in existing else _escape(ref, fmt)
+        fk_rows.append([_escape(fk["field_name"], fmt), target, _escape(fk["fk_field_name"], fmt),
+                        _escape(fk.get("fk_relate_name"), fmt)])
+    referencing = [_link(name, f"{quote(name, safe='')}.{fmt}", fmt) for name in referenced_by]
+    return _page(f"Table: {doc['table_name']}", [
+        ("Fields", _table(keys, field_rows, fmt)),
+        ("Foreign keys", _table(["field_name", "fk_table_name", "fk_field_name", "fk_relate_name"], fk_rows, fmt)),
+        ("Referenced by", _list(referencing, fmt)),
+    ], fmt, f"../index.{fmt}")
+
+
+def render_data_source(doc: dict, fmt: str) -> str:
+    rows = [[key, _escape(doc.get(key), fmt)] for key in DataSourceInfo.model_fields if key not in HIDDEN_KEYS]
+    return _page(f"Data Source: {doc['ds_name']}", [("Connection", _table(["key", "value"], rows, fmt))],
+                 fmt, f"../index.{fmt}")
+
+
+def render_index(namespace: Optional[str], tables: list[str], data_sources: list[str], fmt: str) -> str:
+    sections = []
+    for title, kind, names in (("Data sources", KIND_DATA_SOURCE, data_sources), ("Tables", KIND_TABLE, tables)):
+        links = [_link(name, page_path(kind, name, fmt), fmt) for name in names]
+        sections.append((f"{title} ({len(names)})", _list(links, fmt)))
+    title = f"Docs: {namespace}" if namespace else "Docs"
+    return _page(title, sections, fmt, f"index.{fmt}")
+
+
+def _render(task: tuple) -> tuple[str, str]:
+    path, kind, doc, referenced_by, existing, fmt = task
+    if kind == KIND_TABLE:
+        return path, render_table(doc, referenced_by, existing, fmt)
+    return path, render_data_source(doc, fmt)
+
+
+class SiteBuilder:
+    """
+    Static site of the docs of a namespace: one page per table and data source, and an index.
+    The manifest in the site directory keeps the size, modification time and per-table hashes of every
+    docs file, and the content key of every page. An unchanged file is not read again, and a page is
+    rendered again only when its document, the tables it links to or the tables linking to it changed.
+    """
+
+    def __init__(self, docs_path: str, site_dir: str, namespace: Optional[str] = None,
+                 fmt: str = FORMAT_HTML, workers: Optional[int] = None, force: bool = False):
+        self.docs_path = docs_path
+        self.site_dir = site_dir
+        self.namespace = namespace
+        self.fmt = fmt
+        self.workers = workers
+        self.force = force
+        self.manifest_path = os.path.join(site_dir, SITE_MANIFEST)
+        # (kind, file path) -> documents parsed during this build, by name
+        self._parsed: dict[tuple[str, str], dict[str, dict]] = {}
+
+    def _load_manifest(self) -> dict:
+        empty = {"version": SITE_VERSION, "format": self.fmt, "files": {}, "pages": {}, "index": None}
+        try:
+            with open(self.manifest_path, "r") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError):
+            return empty
+        if manifest.get("version") != SITE_VERSION:
+            return empty
+        return manifest
+
+    def _sources(self) -> list[tuple[str, str]]:
+        # the directory is listed once, its files are split by kind keeping the order of the loaders
+        listed = list(ls_doc_files(self.docs_path, _RE_DOC_FILE.pattern, self.namespace))
+        if not is_file(self.docs_path):
+            listed = with_snapshots(self.docs_path, listed)
+        matching = {KIND_TABLE: [], KIND_DATA_SOURCE: [], None: []}
+        for file_path in listed:
+            match = _RE_DOC_FILE.match(file_path.rpartition("/")[2])
+            matching[_FILE_KINDS[match.lastgroup]].append(file_path)
+        # snapshots come last, as when the docs are loaded
+        return [
+            (kind, file_path)
+            for kind in (KIND_TABLE, KIND_DATA_SOURCE) for file_path in matching[kind] + matching[None]
+        ]
+
+    def scan(self, known: dict) -> tuple[dict, dict[str, dict[str, Doc]], int]:
+        """
+        Manifest entries of the docs files and the documents they define, the last file defining a name wins
+        """
+        files = {}
+        docs = {KIND_TABLE: {}, KIND_DATA_SOURCE: {}}
+        files_read = 0
+        merged = set()
+        for kind, file_path in self._sources():
+            file_path = os.path.normpath(file_path)
+            if file_path in merged:
+                continue
+            key = f"{kind}:{file_path}"
+            stat = os.stat(file_path)
+            entry = known.get(key)
+            if entry is None or entry[0] != stat.st_mtime_ns or entry[1] != stat.st_size:
+                parsed = _read_docs(kind, file_path)
+                files_read += 1
+                sources = compaction_sources(file_path) if kind == KIND_TABLE and is_compacted(file_path) else {}
+                entry = [stat.st_mtime_ns, stat.st_size, _doc_entries(kind, parsed), sources]
+                self._parsed[(kind, file_path)] = {doc.get(_name_key(kind)): doc for doc in parsed}
+            files[key] = entry
+            for name, doc_hash, refs in entry[2]:
+                docs[kind][name] = Doc(kind, name, file_path, doc_hash, refs)
+            if entry[3]:
+                merged |= merged_sources(file_path, entry[3])
+        return files, docs, files_read
+
+    def _doc(self, doc: Doc) -> dict:
+        key = (doc.kind, doc.file_path)
+        if key not in self._parsed:
+            self._parsed[key] = {d.get(_name_key(doc.kind)): d for d in _read_docs(doc.kind, doc.file_path)}
+        return self._parsed[key][doc.name]
+
+    def _render_all(self, tasks: list[tuple]) -> list[tuple[str, str]]:
+        if len(tasks) > MIN_PARALLEL_PAGES and self.workers != 1:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                return list(executor.map(_render, tasks, chunksize=64))
+        return [_render(task) for task in tasks]
+
+    def _write(self, path: str, text: str):
+        path = os.path.join(self.site_dir, path)
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+
+    def build(self) -> SiteResult:
+        manifest = self._load_manifest()
+        # forced or other format: every file is read and every page rendered, the pages of removed docs still go
+        rebuild = self.force or manifest["format"] != self.fmt
+        known = {"files": {}, "pages": {}, "index": None} if rebuild else manifest
+        files, docs, files_read = self.scan(known["files"])
+        tables = docs[KIND_TABLE]
+        referenced_by = {}
+        for doc in tables.values():
+            for ref in doc.refs:
+                if ref != doc.name and ref in tables:
+                    referenced_by.setdefault(ref, []).append(doc.name)
+        pages = {}
+        stale = []
+        for kind, named in docs.items():
+            for name, doc in named.items():
+                path = page_path(kind, name, self.fmt)
+                if kind == KIND_TABLE:
+                    # a page shows whether the tables it links to exist, and the tables linking to it
+                    links = sorted(referenced_by.get(name, []))
+                    targets = [f"{ref}:{int(ref in tables)}" for ref in doc.refs]
+                    pages[path] = " ".join([doc.hash, *targets, "<-", *links])
+                else:
+                    pages[path] = doc.hash
+                if known["pages"].get(path) != pages[path]:
+                    stale.append((path, doc, links if kind == KIND_TABLE else []))
+        for directory in PAGE_DIRS.values():
+            os.makedirs(os.path.join(self.site_dir, directory), exist_ok=True)
+        tasks = []
+        for path, doc, links in stale:
+            # the documents linked from the page are needed by name only
+            existing = {ref for ref in doc.refs if ref in tables}
+            tasks.append((path, doc.kind, self._doc(doc), links, existing, self.fmt))
+        for path, text in self._render_all(tasks):
+            self._write(path, text)
+        removed = [path for path in manifest["pages"] if path not in pages]
+        if manifest["format"] != self.fmt and manifest["index"] is not None:
+            removed.append(f"index.{manifest['format']}")
+        for path in removed:
+            try:
+                os.remove(os.path.join(self.site_dir, path))
+            except FileNotFoundError:
+                pass
+        table_names = sorted(tables)
+        ds_names = sorted(docs[KIND_DATA_SOURCE])
+        index_key = content_hash([self.namespace, table_names, ds_names])
+        index_rendered = index_key != known["index"]
+        if index_rendered:
+            self._write(f"index.{self.fmt}", render_index(self.namespace, table_names, ds_names, self.fmt))
+        manifest = {"version": SITE_VERSION, "format": self.fmt, "files": files, "pages": pages, "index": index_key}
+        write_atomic(self.manifest_path, json.dumps(manifest, separators=(",", ":")))
+        return SiteResult(self.site_dir, len(pages), len(tasks), len(removed), files_read, index_rendered)
+
+
+def build_site(docs_path: str, site_dir: str, namespace: Optional[str] = None, fmt: str = FORMAT_HTML,
+               workers: Optional[int] = None, force: bool = False) -> SiteResult:
+    os.makedirs(site_dir, exist_ok=True)
+    return SiteBuilder(docs_path, site_dir, namespace, fmt, workers, force).build()
@@ -0,0 +1,96 @@
+import importlib
+import json
+import os
+import sys
+
+import pytest
+
+from src.model import codegen
+from src.model.codegen import CODEGEN_MANIFEST, CodeGenerator
+from src.model.intern import field_pool
+from src.model.storage import expand_table
+
+PACKAGE = "generated_tables"
+
+
+def _table(name: str, *fields: str):
+    return field_pool.table(expand_table({"table_name": name, "table_fields": [
+        {"field_name": field, "field_type": "integer", "field_required": True} for field in fields
+    ]}))
+
+
+def _generate(tmp_path, *tables, **kwargs) -> codegen.CodegenResult:
+    return CodeGenerator(str(tmp_path / PACKAGE), **kwargs).generate(tables)
+
+
+def _names(paths: list[str]) -> list[str]:
+    return sorted(os.path.basename(path) for path in paths)
+
+
+@pytest.fixture
+def importable(tmp_path):
+    sys.path.insert(0, str(tmp_path))
+    yield
+    sys.path.remove(str(tmp_path))
+    for name in [name for name in sys.modules if name.split(".")[0] == PACKAGE]:
+        del sys.modules[name]
+
+
+def test_generated_package_imports(tmp_path, importable):
+    result = _generate(tmp_path, _table("customer", "id", "age"), _table("class", "id"))
+    assert _names(result.generated) == ["class_.py", "customer.py"]
+    package = importlib.import_module(PACKAGE)
+    customer = package.load("customer")
+    assert customer.CustomerModel(id=1, age=2).to_row() == customer.CustomerRow(id=1, age=2)
+    assert package.load("class").TABLE_NAME == "class"
+
+
+def test_unchanged_tables_are_skipped(tmp_path):
+    tables = [_table("customer", "id"), _table("orders", "id")]
+    _generate(tmp_path, *tables)
+    init = tmp_path / PACKAGE / "__init__.py"
+    os.utime(init, ns=(0, 0))
+    result = _generate(tmp_path, *tables)
+    assert (result.generated, result.unchanged, result.removed) == ([], 2, [])
+    assert os.stat(init).st_mtime_ns == 0
+    result = _generate(tmp_path, _table("customer", "id", "name"), tables[1])
+    assert (_names(result.generated), result.unchanged) == (["customer.py"], 1)
+    # a module deleted by hand is generated again
+    os.remove(tmp_path / PACKAGE / "orders.py")
+    assert _names(_generate(tmp_path, *tables).generated) == ["customer.py", "orders.py"]
+
+
+def test_removed_tables_delete_their_module(tmp_path, importable):
+    _generate(tmp_path, _table("customer", "id"), _table("orders", "id"))
+    result = _generate(tmp_path, _table("customer", "id"))
+    assert (result.generated, _names(result.removed)) == ([], ["orders.py"])
+    assert not os.path.exists(tmp_path / PACKAGE / "orders.py")
+    assert importlib.import_module(PACKAGE).MODULES == {"customer": "customer"}
+
+
+def test_version_bump_and_force_regenerate(tmp_path, monkeypatch):
+    tables = [_table("customer", "id"), _table("orders", "id")]
+    _generate(tmp_path, *tables)
+    assert len(_generate(tmp_path, *tables, force=True).generated) == 2
+    monkeypatch.setattr(codegen, "CODEGEN_VERSION", codegen.CODEGEN_VERSION + 1)
+    assert len(_generate(tmp_path, *tables).generated) == 2
+    with open(tmp_path / PACKAGE / CODEGEN_MANIFEST) as f:
+        assert json.load(f)["version"] == codegen.CODEGEN_VERSION
+    assert _generate(tmp_path, *tables).unchanged == 2
+
+
+def test_modules_are_written_atomically(tmp_path, monkeypatch):
+    written = []
+    write_atomic = codegen.write_atomic
+
+    def spy(path, data):
+        written.append(os.path.basename(path))
+        write_atomic(path, data)
+    monkeypatch.setattr(codegen, "write_atomic", spy)
+    table = field_pool.table(expand_table({"table_name": "menu", "table_fields": [
+        {"field_name": "dish", "field_type": "text", "field_pattern": "^café|thé$"},
+    ]}))
+    _generate(tmp_path, table)
+    assert written == ["menu.py", "__init__.py", CODEGEN_MANIFEST]
+    with open(tmp_path / PACKAGE / "menu.py", encoding="utf-8") as f:
+        assert "café|thé" in f.read()
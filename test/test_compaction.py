@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.corpus import write_namespace
+from src.model.compaction import compact_namespace, compacted_path, list_namespaces
+from src.model.docs import load_docs
+from src.model import storage
+from src.model.storage import compaction_sources
+
+NAMESPACE = "ns"
+
+
+def _compacted(directory: str) -> tuple[dict, list[dict]]:
+    """
+    Compact a namespace of one file per table, returns its validated tables and the written ones
+    """
+    tables = write_namespace(directory, NAMESPACE, n_tables=10, per_table_files=True)
+    expected = {name: table.model_dump() for name, table in load_docs(directory, NAMESPACE).tables.items()}
+    result = compact_namespace(directory, NAMESPACE)
+    assert len(result.merged) == len(tables)
+    return expected, tables
+
+
+def test_compaction_keeps_tables(tmp_path):
+    directory = str(tmp_path)
+    expected, _ = _compacted(directory)
+    assert os.path.isfile(compacted_path(directory, NAMESPACE))
+    assert not [name for name in os.listdir(directory) if "-tableinfo-table_" in name]
+    docs = load_docs(directory, NAMESPACE)
+    assert {name: table.model_dump() for name, table in docs.tables.items()} == expected
+
+
+def test_unchanged_merged_file_is_skipped(tmp_path):
+    directory = str(tmp_path)
+    expected, tables = _compacted(directory)
+    sources = compaction_sources(compacted_path(directory, NAMESPACE))
+    # a compaction stopped before removing the file it merged
+    name = f"{NAMESPACE}-tableinfo-table_0-config.json"
+    path = os.path.join(directory, name)
+    stale = {**tables[0], "table_fields": tables[0]["table_fields"][:1]}
+    with open(path, "w") as file:
+        file.write(json.dumps(stale))
+    os.utime(path, ns=(sources[name], sources[name]))
+    docs = load_docs(directory, NAMESPACE)
+    assert docs.tables["table_0"].model_dump() == expected["table_0"]
+
+
+def test_file_changed_after_compaction_wins(tmp_path):
+    directory = str(tmp_path)
+    _, tables = _compacted(directory)
+    path = os.path.join(directory, f"{NAMESPACE}-tableinfo-table_0-config.json")
+    changed = {**tables[0], "table_fields": tables[0]["table_fields"][:1]}
+    with open(path, "w") as file:
+        file.write(json.dumps(changed))
+    docs = load_docs(directory, NAMESPACE)
+    assert len(docs.tables["table_0"].table_fields) == 1
+    assert len(docs.tables) == len(tables)
+
+
+def test_compaction_sources_are_cached(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    _compacted(directory)
+    path = compacted_path(directory, NAMESPACE)
+    sources = compaction_sources(path)
+    monkeypatch.setattr(storage, "read_json", lambda file_path: pytest.fail("read again"))
+    assert compaction_sources(path) == sources
+
+
+def test_namespaces_are_the_loaders_ones(tmp_path):
+    directory = str(tmp_path)
+    write_namespace(directory, "my", n_tables=3, per_table_files=True)
+    write_namespace(directory, "my-ns", n_tables=2, per_table_files=True)
+    assert list_namespaces(directory) == ["my", "my-ns"]
+    result = compact_namespace(directory, "my")
+    assert result.tables == 3
+    assert len(load_docs(directory, "my-ns").tables) == 2
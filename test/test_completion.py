@@ -0,0 +1,87 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.configurator import completion
+from src.configurator.completion import CompletionItem, completions
+from src.model.index import NAME_INDEX_FILE
+
+PROG = "docs_run.py"
+NAMESPACE = "ns"
+
+
+@pytest.fixture(autouse=True)
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setenv(completion.CACHE_ENV, str(tmp_path / "cache"))
+    return tmp_path / "cache"
+
+
+@pytest.fixture(scope="module")
+def spec() -> dict:
+    from src.configurator.run import completion_spec
+    return completion_spec()
+
+
+def _values(items: list[CompletionItem]) -> list[str]:
+    return [item.value for item in items]
+
+
+def test_commands_and_options(spec):
+    assert _values(completions(spec, [], "generate-d")) == ["generate-data", "generate-ddl"]
+    assert _values(completions(spec, ["generate-data"], "--for")) == ["--format"]
+    assert _values(completions(spec, ["generate-data", "--format"], "")) == ["csv", "jsonl"]
+    assert _values(completions(spec, [], "--no-d")) == ["--no-daemon"]
+    assert completions(spec, ["generate-data", "-p"], "do") == [CompletionItem("do", type=completion.KIND_FILE)]
+
+
+def test_table_names(spec, tmp_path):
+    out = tmp_path / "out"
+    out.mkdir()
+    (out / f"{NAMESPACE}-tableinfo-customer-config.json").write_text("{}")
+    (out / "other-tableinfo-invoice-config.json").write_text("{}")
+    (out / NAME_INDEX_FILE).write_text(json.dumps({"files": {"x": [["table", "cart"], ["field", "cost"]]}}))
+    args = ["-o", str(out), "-n", NAMESPACE, "validate-data", "-t"]
+    assert _values(completions(spec, args, "c")) == ["cart", "customer"]
+
+
+def test_complete_reads_the_environment(spec, monkeypatch, capsys):
+    completion.write_spec(spec)
+    monkeypatch.setenv("COMP_WORDS", f"{PROG} generate-data --format j")
+    monkeypatch.setenv("COMP_CWORD", "3")
+    assert completion.complete(PROG, "bash_complete") == 0
+    assert capsys.readouterr().out == "plain,jsonl\n"
+    assert completion.complete(PROG, "tcsh_complete") == 1
+
+
+def test_help_cache(spec, monkeypatch):
+    completion.write_spec(spec)
+    key = completion.help_key(f"{PROG} generate-data", completion.help_width(), "theme")
+    assert completion.cached_help(PROG, ["generate-data", "--help"], "theme") is None
+    completion.store_help(key, "usage")
+    assert completion.cached_help(PROG, ["-n", NAMESPACE, "generate-data", "--help"], "theme") == "usage"
+    assert completion.cached_help(PROG, ["generate-data"], "theme") is None
+    assert completion.cached_help(PROG, ["generate-ddl", "--help"], "theme") is None
+    # a change of run.py drops the cached help
+    monkeypatch.setattr(completion, "source_stamp", lambda: [0])
+    assert completion.read_help(key) is None
+
+
+def _store(args: tuple[str, int]):
+    cache, worker = args
+    os.environ[completion.CACHE_ENV] = cache
+    for i in range(20):
+        completion.store_help(f"{worker}-{i}", "x" * 1000)
+
+
+def test_concurrent_runs_keep_each_others_help(cache):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_store, [(str(cache), worker) for worker in range(4)]))
+    assert all(completion.read_help(f"{worker}-{i}") for worker in range(4) for i in range(20))
+
+
+def test_read_only_cache(cache, monkeypatch):
+    monkeypatch.setenv(completion.CACHE_ENV, os.devnull)
+    completion.store_help("key", "text")
+    assert completion.read_help("key") is None
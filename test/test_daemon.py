@@ -0,0 +1,121 @@
+import json
+import multiprocessing
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+from benchmarks.corpus import write_namespace
+from src.model.index import NameIndex
+from src.server.client import DaemonClient, DaemonError
+from src.server.daemon import DAEMON_SUPPORTED, KIND_TABLES, DocsDaemon
+
+pytestmark = pytest.mark.skipif(not DAEMON_SUPPORTED, reason="the daemon needs Unix sockets")
+
+NAMESPACE = "ns"
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _serve(socket_path: str, docs_path: str):
+    DocsDaemon(socket_path, polling=True).run((docs_path,))
+
+
+def _wait(condition, timeout: float = 15.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.05)
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    docs_path = str(tmp_path / "docs")
+    write_namespace(docs_path, NAMESPACE, n_tables=5, n_fields=3, per_table_files=True)
+    socket_path = str(tmp_path / "d.sock")
+    process = multiprocessing.Process(target=_serve, args=(socket_path, docs_path), daemon=True)
+    process.start()
+    _wait(lambda: os.path.exists(socket_path))
+    client = DaemonClient.connect(socket_path)
+    yield client, socket_path, docs_path
+    if process.is_alive():
+        try:
+            client.request("stop")
+        except (DaemonError, OSError):
+            process.terminate()
+    client.close()
+    process.join(10)
+
+
+def _query(client: DaemonClient, docs_path: str, **params) -> list:
+    return client.request("query", path=docs_path, **params)
+
+
+def test_requests(daemon):
+    client, _, docs_path = daemon
+    assert client.request("ping")["paths"] == [docs_path]
+    views = client.request("load", path=docs_path, kind=KIND_TABLES)
+    assert len(views) == 5 and views[0][0].startswith("Table: ")
+    assert {row[2] for row in _query(client, docs_path, prefix="table_")} == {f"table_{i}" for i in range(5)}
+    assert _query(client, docs_path, fuzzy="tabel_3")[0][:2] == ["table", "table_3"]
+    with pytest.raises(DaemonError, match="Unknown operation"):
+        client.request("nope")
+
+
+def test_invalid_request_and_failure_log(daemon):
+    client, socket_path, docs_path = daemon
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(b"not json\n")
+        response = json.loads(sock.makefile("rb").readline())
+    assert not response["ok"] and response["error"].startswith("Invalid request")
+    with pytest.raises(DaemonError, match="KeyError"):
+        client.request("load", path=docs_path, kind="nope")
+    # without a logger, the daemon logs next to its socket
+    with open(os.path.join(os.path.dirname(socket_path), "logs-out.log")) as f:
+        assert "Request load failed" in f.read()
+
+
+def test_changed_files_update_the_index(daemon):
+    client, _, docs_path = daemon
+    write_namespace(docs_path, NAMESPACE, per_table_files=True, tables=[
+        {"table_name": "invoice", "table_fields": [{"field_name": "amount"}]},
+    ])
+    _wait(lambda: _query(client, docs_path, prefix="invoice"))
+    assert {row[1] for row in _query(client, docs_path, prefix="")} >= {"invoice", "amount", "table_0"}
+    os.remove(os.path.join(docs_path, f"{NAMESPACE}-tableinfo-invoice-config.json"))
+    _wait(lambda: not _query(client, docs_path, prefix="invoice"))
+
+
+def test_one_daemon_per_socket(daemon):
+    _, socket_path, _ = daemon
+    with pytest.raises(RuntimeError, match="already listening"):
+        DocsDaemon(socket_path)._check_socket()
+
+
+def test_stop(daemon):
+    client, socket_path, _ = daemon
+    assert client.request("stop") is True
+    _wait(lambda: not os.path.exists(socket_path))
+    assert DaemonClient.connect(socket_path) is None
+
+
+def test_search_is_answered_by_the_daemon(daemon, tmp_path):
+    client, socket_path, _ = daemon
+    other = str(tmp_path / "other")
+    write_namespace(other, NAMESPACE, n_tables=2, n_fields=2, per_table_files=True)
+    # the CLI writes its logs and the JSON schemas under the working directory
+    (tmp_path / "logs").mkdir()
+    (tmp_path / "schema").mkdir()
+    result = subprocess.run(
+        [sys.executable, os.path.join(ROOT, "docs_run.py"), "-n", NAMESPACE, "-o", str(tmp_path), "--socket",
+         socket_path, "search", "-q", "table_1", "-p", other],
+        cwd=str(tmp_path), env={**os.environ, "PYTHONPATH": ROOT}, capture_output=True, text=True, timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
+    assert "table_1" in result.stdout
+    # the daemon loaded the docs to answer, no index file was built locally
+    assert other in client.request("ping")["paths"]
+    assert not os.path.exists(NameIndex.index_path(other))
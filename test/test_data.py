@@ -0,0 +1,84 @@
+import os
+import re
+
+import pytest
+
+from benchmarks.corpus import generate_tables
+from src.data.generator import FORMATS, TableDataGenerator, write_data
+from src.data.pattern import PatternLanguage
+from src.data.validator import validate_file
+from src.model.intern import field_pool
+from src.model.storage import expand_table
+
+ROWS = 3000
+
+
+@pytest.fixture(scope="module")
+def table():
+    return field_pool.table(generate_tables(1, n_fields=16, seed=3)[0])
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_generated_data_is_valid(tmp_path, table, fmt):
+    path = os.path.join(str(tmp_path), f"data.{fmt}")
+    generator = TableDataGenerator(table, ROWS, seed=0, chunk_size=500)
+    write_data(path, generator, fmt, workers=1)
+    report = validate_file(path, table, fmt, workers=1)
+    assert report.rows == ROWS
+    assert report.is_valid, report.summary()
+
+
+def test_output_does_not_depend_on_workers(tmp_path, table):
+    generator = TableDataGenerator(table, ROWS, seed=0, chunk_size=500)
+    outputs = []
+    for workers in (1, 2):
+        path = os.path.join(str(tmp_path), f"data-{workers}.csv")
+        write_data(path, generator, "csv", workers=workers)
+        with open(path) as f:
+            outputs.append(f.read())
+    assert outputs[0] == outputs[1]
+    report = validate_file(os.path.join(str(tmp_path), "data-2.csv"), table, "csv", workers=2, block_size=4096)
+    assert report.is_valid, report.summary()
+
+
+@pytest.mark.parametrize("pattern, count", [
+    ("a?a?", 3), ("(ab|a)(bc|c)", 3), ("x|x|y", 2), (r"[a-c]{0,2}[b-d]{0,2}", 137), (r"\d{2}-[A-F]", 600),
+])
+def test_pattern_language_numbers_distinct_strings(pattern, count):
+    language = PatternLanguage(pattern)
+    values = [language.nth(n) for n in range(language.count)]
+    assert language.count == count
+    assert len(set(values)) == count
+    assert all(re.fullmatch(pattern, value) for value in values)
+
+
+def test_unique_ambiguous_pattern_column(tmp_path):
+    table = field_pool.table(expand_table({"table_name": "codes", "table_fields": [
+        {"field_name": "code", "field_type": "text", "field_pattern": "^a?a?b?b?$", "field_unique": True,
+         "field_required": True, "field_min_length": 1},
+    ]}))
+    rows = PatternLanguage("^a?a?b?b?$", 1).count
+    path = os.path.join(str(tmp_path), "codes.csv")
+    write_data(path, TableDataGenerator(table, rows, chunk_size=3), "csv", workers=1)
+    report = validate_file(path, table, "csv", workers=1)
+    assert report.rows == rows
+    assert report.is_valid, report.summary()
+    with pytest.raises(ValueError, match="can not hold"):
+        TableDataGenerator(table, rows + 1)
+
+
+@pytest.mark.parametrize("fmt", FORMATS)
+def test_bounded_datetimes(tmp_path, fmt):
+    # 2020-01-01T00:00:00Z plus one hour, in milliseconds
+    low, high = 1577836800000, 1577840400000
+    table = field_pool.table(expand_table({"table_name": "events", "table_fields": [
+        {"field_name": "at", "field_type": "datetime", "field_ge": low, "field_le": high},
+        {"field_name": "seen", "field_type": "datetime", "field_gt": low, "field_lt": high, "field_unique": True},
+    ]}))
+    path = os.path.join(str(tmp_path), f"events.{fmt}")
+    write_data(path, TableDataGenerator(table, 3599, chunk_size=500), fmt, workers=1)
+    report = validate_file(path, table, fmt, workers=1)
+    assert report.rows == 3599
+    assert report.is_valid, report.summary()
+    with pytest.raises(ValueError, match="can not hold"):
+        TableDataGenerator(table, 3600)
@@ -0,0 +1,107 @@
+import io
+
+import pytest
+
+from src.model.ddl import DIALECTS, DDLGenerator
+from src.model.meta import DatasourceDocs, TableInfo
+from src.model.storage import expand_table
+
+
+def _docs(*tables: dict) -> DatasourceDocs:
+    docs = DatasourceDocs(namespace="ns")
+    for table in tables:
+        docs.add_table(TableInfo(**expand_table(table)))
+    return docs
+
+
+def _fk(field_name: str, table_name: str, fk_field_name: str = "id") -> dict:
+    return {"field_name": field_name, "fk_table_name": table_name, "fk_field_name": fk_field_name, "fk_relate_name": None}
+
+
+CUSTOMER = {"table_name": "customer", "table_fields": [
+    {"field_name": "id", "field_type": "integer", "field_required": True, "field_unique": True},
+    {"field_name": "code", "field_type": "text", "field_unique": True},
+    {"field_name": "name", "field_type": "text", "field_max_length": 64, "field_min_length": 1},
+    {"field_name": "note", "field_type": "text"},
+    {"field_name": "score", "field_type": "float", "field_decimal_places": 2, "field_ge": 0},
+    {"field_name": "active", "field_type": "boolean", "field_default_value": True},
+    {"field_name": "extra", "field_type": "json"},
+]}
+ORDER = {"table_name": "order", "table_fields": [
+    {"field_name": "id", "field_type": "integer"},
+    {"field_name": "customer_code", "field_type": "text"},
+], "table_foreign_keys": [_fk("customer_code", "customer", "code")]}
+
+
+def _statements(dialect: str, docs: DatasourceDocs) -> list[str]:
+    return list(DDLGenerator(dialect).statements(docs))
+
+
+@pytest.mark.parametrize("dialect, expected", [
+    ("mysql", [
+        "`id` BIGINT NOT NULL UNIQUE", "`code` VARCHAR(768) UNIQUE", "`name` VARCHAR(64) CHECK (CHAR_LENGTH(`name`) >= 1)",
+        "`note` TEXT", "`score` DECIMAL(18, 2) CHECK (`score` >= 0)", "`active` TINYINT(1) DEFAULT 1", "`extra` JSON",
+    ]),
+    ("postgresql", [
+        '"id" BIGINT NOT NULL UNIQUE', '"code" TEXT UNIQUE', '"name" VARCHAR(64) CHECK (CHAR_LENGTH("name") >= 1)',
+        '"note" TEXT', '"score" NUMERIC(18, 2) CHECK ("score" >= 0)', '"active" BOOLEAN DEFAULT TRUE', '"extra" JSONB',
+    ]),
+    ("oracle", [
+        '"id" NUMBER(19) NOT NULL UNIQUE', '"code" VARCHAR2(1000 CHAR) UNIQUE',
+        '"name" VARCHAR2(64 CHAR) CHECK (LENGTH("name") >= 1)', '"note" CLOB',
+        '"score" NUMBER(18, 2) CHECK ("score" >= 0)', '"active" NUMBER(1) DEFAULT 1', '"extra" CLOB',
+    ]),
+])
+def test_columns_per_dialect(dialect, expected):
+    statement = _statements(dialect, _docs(CUSTOMER))[0]
+    quote = DIALECTS[dialect].quote
+    assert statement == f"CREATE TABLE {quote('customer')} (\n    " + ",\n    ".join(expected) + "\n);\n"
+
+
+@pytest.mark.parametrize("dialect, column", [
+    ("mysql", "`customer_code` VARCHAR(768)"),
+    ("postgresql", '"customer_code" TEXT'),
+    ("oracle", '"customer_code" VARCHAR2(1000 CHAR)'),
+])
+def test_foreign_key_columns_are_bounded(dialect, column):
+    statements = _statements(dialect, _docs(ORDER, CUSTOMER))
+    assert statements[0].startswith(f"CREATE TABLE {DIALECTS[dialect].quote('customer')}")
+    order = statements[1]
+    assert f"    {column},\n" in order
+    assert "FOREIGN KEY" in order and "REFERENCES" in order
+
+
+@pytest.mark.parametrize("dialect", ["mysql", "oracle"])
+def test_keys_that_can_not_be_indexed(dialect):
+    too_long = {"table_name": "t", "table_fields": [
+        {"field_name": "code", "field_type": "text", "field_unique": True, "field_max_length": 5000},
+    ]}
+    with pytest.raises(ValueError, match="Table t: Field code is a key"):
+        _statements(dialect, _docs(too_long))
+    json_key = {"table_name": "t", "table_fields": [{"field_name": "data", "field_type": "json", "field_unique": True}]}
+    with pytest.raises(ValueError, match="can not be one"):
+        _statements(dialect, _docs(json_key))
+
+
+def test_cycles_are_closed_by_alter_table():
+    docs = _docs(
+        {"table_name": "a", "table_fields": [{"field_name": "id", "field_type": "integer"},
+                                              {"field_name": "b_id", "field_type": "integer"}],
+         "table_foreign_keys": [_fk("b_id", "b")]},
+        {"table_name": "b", "table_fields": [{"field_name": "id", "field_type": "integer"},
+                                              {"field_name": "a_id", "field_type": "integer"}],
+         "table_foreign_keys": [_fk("a_id", "a")]},
+        {"table_name": "c", "table_fields": [{"field_name": "x", "field_type": "integer"}],
+         "table_foreign_keys": [_fk("x", "missing")]},
+    )
+    out = io.StringIO()
+    assert DDLGenerator("postgresql").write(out, docs) == 4
+    script = out.getvalue()
+    assert script.count("CREATE TABLE") == 3
+    assert 'ALTER TABLE "a" ADD CONSTRAINT "fk_a_b_id" FOREIGN KEY ("b_id") REFERENCES "b" ("id");' in script
+    assert "-- c.x references undocumented missing.id" in script
+
+
+def test_unknown_dialect():
+    with pytest.raises(ValueError, match="Dialect sqlite is not supported"):
+        DDLGenerator("sqlite")
@@ -0,0 +1,75 @@
+import json
+import os
+
+from benchmarks.corpus import generate_tables, write_namespace
+from src.model.compaction import compact_namespace
+from src.model.diff import diff_docs, load_table_hashes
+from src.model.storage import compaction_sources, dump_doc
+
+NAMESPACE = "ns"
+
+
+def _write(directory: str, tables: list[dict], **options) -> str:
+    write_namespace(directory, NAMESPACE, tables=tables, **options)
+    return directory
+
+
+def _rewrite(directory: str, table: dict):
+    with open(os.path.join(directory, f"{NAMESPACE}-tableinfo-{table['table_name']}-config.json"), "w") as file:
+        file.write(json.dumps(table))
+
+
+def test_same_docs_in_other_layouts_are_unchanged(tmp_path):
+    tables = generate_tables(30, seed=10)
+    old = _write(str(tmp_path / "old"), tables, per_table_files=True)
+    new = str(tmp_path / "new")
+    os.makedirs(new)
+    with open(os.path.join(new, f"{NAMESPACE}-tableinfo-config.json"), "w") as file:
+        file.write(dump_doc(tables, compact=True))
+    result = diff_docs(old, new, workers=1)
+    assert result == {"added": [], "removed": [], "modified": {}, "unchanged": len(tables)}
+
+
+def test_added_removed_and_modified_tables(tmp_path):
+    tables = generate_tables(10, seed=11)
+    old = _write(str(tmp_path / "old"), tables, per_table_files=True)
+    new = _write(str(tmp_path / "new"), tables, per_table_files=True)
+    os.remove(os.path.join(new, f"{NAMESPACE}-tableinfo-table_1-config.json"))
+    _rewrite(new, {"table_name": "table_new", "table_fields": tables[0]["table_fields"]})
+    fields = tables[2]["table_fields"]
+    _rewrite(new, {**tables[2], "table_fields": [{**fields[0], "field_required": not fields[0]["field_required"]},
+                                                  *fields[2:], {**fields[1], "field_name": "renamed"}]})
+    result = diff_docs(old, new, workers=1)
+    assert result["added"] == ["table_new"]
+    assert result["removed"] == ["table_1"]
+    assert list(result["modified"]) == ["table_2"]
+    changes = result["modified"]["table_2"]
+    assert changes["fields_added"] == ["renamed"]
+    assert changes["fields_removed"] == [fields[1]["field_name"]]
+    assert list(changes["fields_modified"][fields[0]["field_name"]]) == ["field_required"]
+    assert result["unchanged"] == 8
+
+
+def test_workers_give_the_same_diff(tmp_path):
+    tables = generate_tables(200, seed=12)
+    old = _write(str(tmp_path / "old"), tables, per_table_files=True)
+    new = _write(str(tmp_path / "new"), tables, per_table_files=True)
+    _rewrite(new, {**tables[5], "table_fields": tables[5]["table_fields"][:2]})
+    assert diff_docs(old, new, workers=1) == diff_docs(old, new, workers=2)
+    hashes = load_table_hashes(old, workers=2, chunk_size=16)[0]
+    assert len(hashes.hashes) == len(tables)
+
+
+def test_merged_sources_are_skipped(tmp_path):
+    tables = generate_tables(10, seed=13)
+    old = _write(str(tmp_path / "old"), tables, per_table_files=True)
+    new = _write(str(tmp_path / "new"), tables, per_table_files=True)
+    compact_namespace(new, NAMESPACE)
+    # a compaction stopped before removing a file it merged, the loaders do not read it
+    sources = compaction_sources(os.path.join(new, f"{NAMESPACE}-tableinfo-compacted.json"))
+    name = f"{NAMESPACE}-tableinfo-table_0-config.json"
+    _rewrite(new, {**tables[0], "table_fields": tables[0]["table_fields"][:1]})
+    os.utime(os.path.join(new, name), ns=(sources[name], sources[name]))
+    result = diff_docs(old, new, workers=1)
+    assert result["modified"] == {}
+    assert result["unchanged"] == len(tables)
@@ -0,0 +1,102 @@
+import time
+
+from src.model.graph import ForeignKeyGraph
+from src.model.meta import FieldInfo, ForeignKeyInfo, TableInfo
+from src.model.storage import expand_table
+
+
+def _table(name: str, *references: str, fields: tuple = ("id", "ref")) -> TableInfo:
+    foreign_keys = []
+    for reference in references:
+        field_name, _, target = reference.rpartition(":")
+        table_name, _, fk_field_name = target.partition(".")
+        foreign_keys.append({
+            "field_name": field_name or "ref", "fk_table_name": table_name,
+            "fk_field_name": fk_field_name or "id", "fk_relate_name": None,
+        })
+    return TableInfo(**expand_table({
+        "table_name": name,
+        "table_fields": [{"field_name": field, "field_type": "integer"} for field in fields],
+        "table_foreign_keys": foreign_keys or None,
+    }))
+
+
+def _before(order: list[str], first: str, then: str) -> bool:
+    return order.index(first) < order.index(then)
+
+
+def test_topological_order():
+    graph = ForeignKeyGraph([_table("line", "order", "product"), _table("order", "customer"),
+                             _table("product"), _table("customer")])
+    order = graph.topological_order()
+    assert sorted(order) == ["customer", "line", "order", "product"]
+    assert _before(order, "customer", "order") and _before(order, "order", "line")
+    assert _before(order, "product", "line")
+    assert not graph.has_cycles()
+    assert graph.dependents_of("customer", transitive=True) == ["order", "line"]
+    assert graph.dependencies_of("line") == ["order", "product"]
+
+
+def test_several_keys_to_a_table_are_one_edge():
+    graph = ForeignKeyGraph([_table("a", "ref:b", "id:b"), _table("b")])
+    assert graph.dependencies["a"] == ["b"]
+    assert graph.dependents["b"] == ["a"]
+
+
+def test_cycles_are_components():
+    graph = ForeignKeyGraph([
+        _table("a", "b"), _table("b", "c"), _table("c", "a"),
+        _table("d", "a"), _table("e", "f"), _table("f", "e"), _table("g"),
+    ])
+    assert sorted(graph.cycles()) == [["a", "b", "c"], ["e", "f"]]
+    order = graph.topological_order()
+    assert sorted(order) == list("abcdefg")
+    # a cycle is placed as a whole, after what it references and before what references it
+    assert order[order.index("a"):order.index("a") + 3] == ["a", "b", "c"]
+    assert _before(order, "c", "d")
+
+
+def test_self_references_do_not_make_cycles():
+    graph = ForeignKeyGraph([_table("employee", "ref:employee", "id:employee"), _table("team", "employee")])
+    assert graph.self_references == ["employee"]
+    assert not graph.has_cycles()
+    assert graph.topological_order() == ["employee", "team"]
+
+
+def test_dangling_references():
+    graph = ForeignKeyGraph([
+        _table("a", "missing"), _table("b", "a.nothing"), _table("c", "other:a"), _table("d", "a"),
+    ])
+    reasons = {(ref.table_name, ref.reason) for ref in graph.dangling}
+    assert reasons == {
+        ("a", "Table missing does not exist"),
+        ("b", "Field nothing is not a field of a"),
+        ("c", "Field other is not a field of c"),
+    }
+    assert graph.dependencies == {"a": [], "b": [], "c": [], "d": ["a"]}
+
+
+def _unvalidated(name: str, reference: str = None) -> TableInfo:
+    # the graph only reads names, validating 100k tables would take most of the test
+    foreign_keys = [ForeignKeyInfo.model_construct(field_name="ref", fk_table_name=reference, fk_field_name="id")]
+    return TableInfo.model_construct(
+        table_name=name, table_fields=_FIELDS, table_foreign_keys=foreign_keys if reference else None,
+    )
+
+
+_FIELDS = [FieldInfo.model_construct(field_name=name, field_type="integer") for name in ("id", "ref")]
+
+
+def test_large_graphs():
+    n = 100000
+    # a long chain, then the same chain closed into one cycle: the walks must not recurse
+    chain = [_unvalidated("t0")] + [_unvalidated(f"t{i}", f"t{i - 1}") for i in range(1, n)]
+    start = time.perf_counter()
+    graph = ForeignKeyGraph(chain)
+    order = graph.topological_order()
+    assert order == [f"t{i}" for i in range(n)]
+    assert len(graph.dependents_of("t0", transitive=True)) == n - 1
+    cycle = ForeignKeyGraph([_unvalidated("t0", f"t{n - 1}")] + chain[1:])
+    assert [len(component) for component in cycle.cycles()] == [n]
+    assert len(cycle.topological_order()) == n
+    assert time.perf_counter() - start < 5
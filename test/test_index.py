@@ -0,0 +1,104 @@
+import json
+import os
+
+from benchmarks.corpus import generate_tables, write_namespace
+from src.model import index as index_module
+from src.model.index import KIND_ALIAS, KIND_FIELD, KIND_TABLE, NameIndex
+from src.model.storage import dump_doc
+
+NAMESPACE = "ns"
+
+
+def _table(name: str, *fields: str, alias: bool = False) -> dict:
+    return {
+        "table_name": name,
+        "table_fields": [{"field_name": field, "field_alias": f"{field}_alias" if alias else None} for field in fields],
+    }
+
+
+def _index(*tables: dict) -> NameIndex:
+    index = NameIndex()
+    index.update_file("docs/ns-tableinfo-config.json", tables)
+    return index
+
+
+def test_lookup_and_prefix():
+    index = _index(_table("customer", "id", "name", alias=True), _table("customer_order", "id", "customer_id"))
+    assert [posting[0] for posting in index.lookup("CUSTOMER")] == [KIND_TABLE]
+    assert {posting[2] for posting in index.lookup("id")} == {"customer", "customer_order"}
+    assert index.lookup("name_alias")[0][:4] == [KIND_ALIAS, "name_alias", "customer", "name"]
+    assert index.prefix("cust") == ["customer", "customer_id", "customer_order"]
+    assert index.prefix("cust", limit=1) == ["customer"]
+    assert index.prefix("zzz") == []
+
+
+def test_fuzzy_ranks_by_trigram_similarity():
+    index = _index(_table("customer", "id"), _table("custom_fields", "id"), _table("invoice", "id"))
+    ranked = index.fuzzy("custmer")
+    assert ranked[0][0] == "customer"
+    assert "invoice" not in [term for term, _ in ranked]
+    assert index.fuzzy("customer")[0] == ("customer", 1.0)
+    scores = [score for _, score in ranked]
+    assert scores == sorted(scores, reverse=True)
+
+
+def test_complete_by_kind_and_fuzzy_fallback():
+    index = _index(_table("customer", "customer_id", "created_at"), _table("invoice", "customer_id"))
+    assert index.complete("cu", kind=KIND_TABLE) == ["customer"]
+    assert index.complete("cu", kind=KIND_FIELD) == ["customer_id"]
+    assert index.complete("cr") == ["created_at"]
+    # nothing starts with it, the closest names are proposed
+    assert index.complete("invoise", kind=KIND_TABLE) == ["invoice"]
+
+
+def test_update_export_replaces_the_file_postings():
+    index = _index(_table("a", "x"))
+    other = "docs/ns-tableinfo-b-config.json"
+    index.update_export(other, dump_doc([_table("b", "y")]))
+    index.update_export("docs/ns-tableinfo-config.json", dump_doc(_table("c", "x")))
+    assert index.lookup("a") == []
+    assert {posting[2] for posting in index.lookup("x")} == {"c"}
+    assert index.names(KIND_TABLE) == ["b", "c"]
+    index.remove_file(other)
+    assert index.names(KIND_TABLE) == ["c"]
+
+
+def test_load_refreshes_changed_and_removed_files(tmp_path, monkeypatch):
+    directory = str(tmp_path)
+    write_namespace(directory, NAMESPACE, n_tables=5, per_table_files=True)
+    NameIndex.build(directory).save(force=True)
+    reads = []
+    read_table_docs = index_module.read_table_docs
+    monkeypatch.setattr(index_module, "read_table_docs", lambda path: reads.append(path) or read_table_docs(path))
+    assert len(NameIndex.load(directory).files) == 5
+    assert reads == []
+    changed = os.path.join(directory, f"{NAMESPACE}-tableinfo-table_0-config.json")
+    with open(changed, "w") as file:
+        file.write(json.dumps(_table("renamed", "x")))
+    os.remove(os.path.join(directory, f"{NAMESPACE}-tableinfo-table_1-config.json"))
+    index = NameIndex.load(directory)
+    assert reads == [changed]
+    assert len(index.files) == 4
+    assert index.lookup("renamed") and not index.lookup("table_0") and not index.lookup("table_1")
+    index.save()
+    reads.clear()
+    assert NameIndex.load(directory).names(KIND_TABLE) == index.names(KIND_TABLE)
+    assert reads == []
+
+
+def test_concurrent_saves_keep_each_others_files(tmp_path):
+    directory = str(tmp_path)
+    write_namespace(directory, NAMESPACE, tables=generate_tables(2, seed=14), per_table_files=True)
+    NameIndex.build(directory).save(force=True)
+    first = NameIndex.load(directory)
+    second = NameIndex.load(directory)
+    first.update_file(os.path.join(directory, f"{NAMESPACE}-tableinfo-first-config.json"), [_table("first", "x")])
+    first.save()
+    second.update_file(os.path.join(directory, f"{NAMESPACE}-tableinfo-second-config.json"), [_table("second", "y")])
+    second.remove_file(os.path.join(directory, f"{NAMESPACE}-tableinfo-table_0-config.json"))
+    second.save()
+    # the second writer took the file of the first one, and kept its own removal
+    assert second.lookup("first")
+    saved = NameIndex(NameIndex.index_path(directory))._read_files()
+    names = {posting[1] for entry in saved.values() for posting in entry["postings"] if posting[0] == KIND_TABLE}
+    assert names == {"first", "second", "table_1"}
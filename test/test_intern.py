@@ -0,0 +1,47 @@
+import json
+
+from benchmarks.corpus import generate_tables
+from src.model.intern import FieldInfoPool, dump_shared_tables, field_key
+from src.model.meta import FieldInfo
+from src.model.storage import compact_doc, table_docs_from_data
+
+
+def test_compact_and_expanded_fields_share_a_key():
+    field = FieldInfo.model_construct(**{
+        **{name: FieldInfo.get_default(info) for name, info in FieldInfo.model_fields.items()},
+        "field_name": "code", "field_type": "text", "field_max_length": 8,
+    }).model_dump()
+    compact = compact_doc(field, FieldInfo)
+    assert "field_required" not in compact
+    assert field_key(compact) == field_key(field)
+    pool = FieldInfoPool()
+    interned = pool.intern(compact)
+    assert pool.intern(field) is interned
+    assert (pool.hits, pool.misses, len(pool)) == (1, 1, 1)
+
+
+def test_tables_share_interned_fields():
+    pool = FieldInfoPool()
+    tables = [pool.table(table) for table in generate_tables(20, seed=4)]
+    ids = [table.table_fields[0] for table in tables if table.table_fields[0].field_name == "id"]
+    assert len(ids) > 1
+    assert all(field is ids[0] for field in ids)
+    assert len(pool) < sum(len(table.table_fields) for table in tables)
+
+
+def test_pool_drops_unused_fields():
+    pool = FieldInfoPool()
+    tables = [pool.table(table) for table in generate_tables(5, seed=5)]
+    assert len(pool)
+    del tables
+    assert len(pool) == 0
+
+
+def test_shared_tables_round_trip():
+    pool = FieldInfoPool()
+    tables = [pool.table(table) for table in generate_tables(30, seed=6)]
+    for compact in (False, True):
+        data = json.loads(dump_shared_tables(tables, compact=compact))
+        assert len(data["shared_fields"]) == len(pool)
+        loaded = [pool.table(table) for table in table_docs_from_data(data)]
+        assert [table.model_dump() for table in loaded] == [table.model_dump() for table in tables]
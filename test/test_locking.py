@@ -0,0 +1,51 @@
+import os
+import threading
+import time
+
+from benchmarks.corpus import generate_tables
+from src.model.docs import load_docs
+from src.model.locking import consistent_read, namespace_writer
+from src.model.storage import dump_doc, write_atomic
+
+NAMESPACE = "ns"
+ROUNDS = 20
+
+
+def _batch(tables: list[dict], marker: str) -> list[tuple[str, str]]:
+    # every table of one write carries the marker of the write in its last field
+    files = []
+    for table in tables:
+        fields = [*table["table_fields"][:-1], {**table["table_fields"][-1], "field_name": marker}]
+        files.append((f"{NAMESPACE}-tableinfo-{table['table_name']}-config.json", dump_doc({**table, "table_fields": fields})))
+    return files
+
+
+def _markers(docs) -> set[str]:
+    return {table.table_fields[-1].field_name for table in docs.tables.values()}
+
+
+def _writer(directory: str, tables: list[dict]):
+    for round_ in range(ROUNDS):
+        with namespace_writer(directory, NAMESPACE) as write:
+            for name, data in _batch(tables, f"round_{round_}"):
+                write.write(os.path.join(directory, name), data)
+                # leave the readers time to see a part of the write
+                time.sleep(0.001)
+
+
+def test_consistent_read_under_concurrent_writer(tmp_path):
+    directory = str(tmp_path)
+    tables = generate_tables(8, n_fields=4)
+    for name, data in _batch(tables, "initial"):
+        write_atomic(os.path.join(directory, name), data)
+    writer = threading.Thread(target=_writer, args=(directory, tables))
+    writer.start()
+    reads = []
+    while writer.is_alive():
+        docs = consistent_read(directory, NAMESPACE, lambda: load_docs(directory, NAMESPACE))
+        assert len(docs.tables) == len(tables)
+        reads.append(_markers(docs))
+    writer.join()
+    assert reads
+    assert all(len(markers) == 1 for markers in reads), [m for m in reads if len(m) > 1]
+    assert _markers(load_docs(directory, NAMESPACE)) == {f"round_{ROUNDS - 1}"}
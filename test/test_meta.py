@@ -0,0 +1,93 @@
+from benchmarks.corpus import generate_tables
+from src.model.intern import field_pool
+from src.model.meta import DatasourceDocs, FieldInfo
+from src.model.storage import expand_doc
+
+
+def _field(name: str, **values) -> FieldInfo:
+    return FieldInfo(**expand_doc({"field_name": name, "field_type": "text", **values}, FieldInfo))
+
+
+def _docs() -> DatasourceDocs:
+    docs = DatasourceDocs(namespace="ns")
+    for table in generate_tables(2, n_fields=5, seed=7):
+        docs.add_table(field_pool.table(table))
+    return docs
+
+
+def _check_index(docs: DatasourceDocs, table_name: str):
+    """
+    The positions and the field index agree with table_fields
+    """
+    fields = docs.tables[table_name].table_fields
+    assert docs._positions[table_name] == {field.field_name: i for i, field in enumerate(fields)}
+    indexed = {name: field for (table, name), field in docs._fields.items() if table == table_name}
+    assert indexed == {field.field_name: field for field in fields}
+    assert all(docs.get_field(table_name, field.field_name) is field for field in fields)
+
+
+def test_add_field_appends():
+    docs = _docs()
+    table = docs.tables["table_0"]
+    fields = table.table_fields
+    count = len(fields)
+    docs.add_field("table_0", _field("added"))
+    assert docs.tables["table_0"] is table
+    assert table.table_fields is fields
+    assert [field.field_name for field in fields][-1] == "added"
+    assert len(fields) == count + 1
+    _check_index(docs, "table_0")
+
+
+def test_add_field_replaces_in_place():
+    docs = _docs()
+    fields = docs.tables["table_0"].table_fields
+    names = [field.field_name for field in fields]
+    replaced = _field(names[2], field_max_length=10)
+    docs.add_field("table_0", replaced)
+    assert [field.field_name for field in fields] == names
+    assert fields[2] is replaced
+    _check_index(docs, "table_0")
+
+
+def test_remove_field_from_the_middle():
+    docs = _docs()
+    fields = docs.tables["table_0"].table_fields
+    names = [field.field_name for field in fields]
+    removed = docs.remove_field("table_0", names[1])
+    assert removed.field_name == names[1]
+    assert [field.field_name for field in fields] == names[:1] + names[2:]
+    assert docs.get_field("table_0", names[1]) is None
+    _check_index(docs, "table_0")
+    # the positions after the removed field still point at their field
+    docs.add_field("table_0", _field(names[3], field_min_length=1))
+    assert fields[2].field_name == names[3] and fields[2].field_min_length == 1
+    _check_index(docs, "table_0")
+    assert docs.remove_field("table_0", names[1]) is None
+    _check_index(docs, "table_1")
+
+
+def test_add_remove_sequence():
+    docs = _docs()
+    docs.add_field("table_1", _field("a"))
+    docs.add_field("table_1", _field("b"))
+    docs.remove_field("table_1", "a")
+    docs.add_field("table_1", _field("a"))
+    docs.remove_field("table_1", docs.tables["table_1"].table_fields[0].field_name)
+    _check_index(docs, "table_1")
+    assert [field.field_name for field in docs.tables["table_1"].table_fields][-2:] == ["b", "a"]
+
+
+def test_add_field_creates_the_table():
+    docs = _docs()
+    docs.add_field("new_table", _field("a"))
+    assert [field.field_name for field in docs.tables["new_table"].table_fields] == ["a"]
+    _check_index(docs, "new_table")
+
+
+def test_replace_table_reindexes_it():
+    docs = _docs()
+    old = [field.field_name for field in docs.tables["table_0"].table_fields]
+    docs.add_table(field_pool.table(generate_tables(1, n_fields=3, seed=8)[0]))
+    _check_index(docs, "table_0")
+    assert all(docs.get_field("table_0", name) is None for name in set(old) - set(docs._positions["table_0"]))
@@ -0,0 +1,105 @@
+import json
+import os
+
+import pytest
+
+from benchmarks.corpus import generate_tables
+from src.model.meta import SCHEMA_VERSION
+from src.model.migration import (
+    KIND_DATA_SOURCE, KIND_TABLE, STATUS_CURRENT, STATUS_FAILED, STATUS_MIGRATED, MigrationError, migrate_file,
+    migrate_files, upgrade_doc, upgrade_shared,
+)
+from src.model.storage import SCHEMA_VERSION_KEY, SHARED_FIELDS_KEY, TABLES_KEY, dump_json
+
+NAMESPACE = "ns"
+# a modification time far from the time the files are rewritten
+MTIME_NS = 1_700_000_000_000_000_000
+
+
+def _v1_table(name: str) -> dict:
+    table = {key: value for key, value in generate_tables(1, n_fields=3, seed=1)[0].items()
+             if key not in ("table_foreign_keys", SCHEMA_VERSION_KEY)}
+    return {**table, "table_name": name}
+
+
+def _write(path: str, data, compact: bool) -> str:
+    with open(path, "w") as f:
+        f.write(dump_json(data, compact=compact))
+    os.utime(path, ns=(MTIME_NS, MTIME_NS))
+    return path
+
+
+def test_upgrade_doc():
+    table = _v1_table("customer")
+    upgraded = upgrade_doc(KIND_TABLE, table)
+    assert list(upgraded)[0] == SCHEMA_VERSION_KEY and upgraded[SCHEMA_VERSION_KEY] == SCHEMA_VERSION
+    assert upgraded["table_foreign_keys"] is None
+    assert upgraded["table_fields"] == table["table_fields"]
+    assert upgrade_doc(KIND_TABLE, upgraded) == upgraded
+    assert upgrade_doc(KIND_DATA_SOURCE, {"ds_name": "db"}) == {SCHEMA_VERSION_KEY: SCHEMA_VERSION, "ds_name": "db"}
+    with pytest.raises(MigrationError, match="never downgraded"):
+        upgrade_doc(KIND_TABLE, {**table, SCHEMA_VERSION_KEY: SCHEMA_VERSION + 1})
+
+
+def test_upgrade_shared():
+    data = {SHARED_FIELDS_KEY: {"f0": {"field_name": "id"}}, TABLES_KEY: [_v1_table("a"), _v1_table("b")]}
+    upgraded = upgrade_shared(data)
+    assert upgraded[SCHEMA_VERSION_KEY] == SCHEMA_VERSION
+    assert upgraded[SHARED_FIELDS_KEY] == data[SHARED_FIELDS_KEY]
+    # the file is stamped once, its tables are not
+    assert all(SCHEMA_VERSION_KEY not in table and "table_foreign_keys" in table for table in upgraded[TABLES_KEY])
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_migrate_file_keeps_layout_and_mtime(tmp_path, compact):
+    path = _write(str(tmp_path / f"{NAMESPACE}-tableinfo-config.json"), [_v1_table("a"), _v1_table("b")], compact)
+    result = migrate_file(path)
+    assert (result.version, result.status) == (1, STATUS_MIGRATED)
+    assert os.stat(path).st_mtime_ns == MTIME_NS
+    with open(path) as f:
+        text = f.read()
+    assert ("\n" not in text) == compact
+    tables = json.loads(text)
+    assert [table[SCHEMA_VERSION_KEY] for table in tables] == [SCHEMA_VERSION] * 2
+    assert all("table_foreign_keys" in table for table in tables)
+    # the stamp is read from the head of the file
+    assert migrate_file(path).status == STATUS_CURRENT
+    assert os.stat(path).st_mtime_ns == MTIME_NS
+
+
+def test_migrate_file_dry_run_and_failure(tmp_path):
+    table = _v1_table("a")
+    path = _write(str(tmp_path / f"{NAMESPACE}-tableinfo-a-config.json"), table, False)
+    assert migrate_file(path, dry_run=True).status == STATUS_MIGRATED
+    with open(path) as f:
+        assert json.load(f) == table
+    broken = _write(str(tmp_path / f"{NAMESPACE}-tableinfo-b-config.json"), {"unknown": 1}, False)
+    result = migrate_file(broken)
+    assert result.status == STATUS_FAILED and "Unknown docs layout" in result.error
+    newer = _write(str(tmp_path / f"{NAMESPACE}-tableinfo-c-config.json"), {**table, SCHEMA_VERSION_KEY: 99}, False)
+    assert migrate_file(newer).status == STATUS_FAILED
+
+
+def test_migrate_files_in_order(tmp_path):
+    paths = [_write(str(tmp_path / f"{NAMESPACE}-tableinfo-t{i}-config.json"), _v1_table(f"t{i}"), i % 2 == 0)
+             for i in range(10)]
+    results = list(migrate_files(paths, workers=2, chunk_size=3))
+    assert [result.path for result in results] == paths
+    assert {result.status for result in results} == {STATUS_MIGRATED}
+    assert {result.status for result in migrate_files(paths, workers=1)} == {STATUS_CURRENT}
+
+
+def test_migrate_command_drops_cached_indexes(tmp_path):
+    from src.configurator import run as cli
+    from src.helpers.pretty_str import default_theme
+    cli.set_logger("test", str(tmp_path), default_theme)
+    cli.set_theme(default_theme)
+    docs_path = str(tmp_path / "docs")
+    os.makedirs(docs_path)
+    _write(os.path.join(docs_path, f"{NAMESPACE}-tableinfo-config.json"), [_v1_table("a")], False)
+    index = cli.get_name_index(docs_path)
+    assert cli._name_indexes
+    cli.run.main(["-n", NAMESPACE, "-o", str(tmp_path), "migrate", "-p", docs_path, "--workers", "1"],
+                 standalone_mode=False, obj={})
+    assert not cli._name_indexes
+    assert cli.get_name_index(docs_path) is not index
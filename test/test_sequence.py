@@ -0,0 +1,78 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from src.data.generator import TableDataGenerator, references_of
+from src.data.sequence import SequenceAllocator
+from src.model.intern import field_pool
+from src.model.meta import DatasourceDocs, auto_field_factory
+from src.model.storage import expand_table
+
+NAMESPACE = "ns"
+
+
+def _allocator(directory: str, block_size: int = 10) -> SequenceAllocator:
+    return SequenceAllocator(directory, NAMESPACE, "t", "id", block_size=block_size)
+
+
+def _ids(args: tuple[str, int]) -> list[int]:
+    directory, count = args
+    allocator = _allocator(directory, block_size=7)
+    ids = [allocator.next() for _ in range(count)]
+    return ids + list(allocator.take(5)) + [i for first, n in allocator.blocks(23, 4) for i in range(first, first + n)]
+
+
+def test_ids_are_not_reused_after_a_restart(tmp_path):
+    first = _allocator(str(tmp_path))
+    before = [first.next() for _ in range(3)] + list(first.take(4))
+    assert before == list(range(1, 8))
+    # a new allocator is a restarted process, the rest of the first block is skipped
+    second = _allocator(str(tmp_path))
+    assert second.peek() == 11
+    after = [second.next() for _ in range(12)]
+    assert after == list(range(11, 23))
+    assert first.next() == 8
+
+
+def test_ids_are_not_reused_across_processes(tmp_path):
+    with ProcessPoolExecutor(max_workers=4) as executor:
+        ids = list(itertools.chain.from_iterable(executor.map(_ids, [(str(tmp_path), 50)] * 8)))
+    assert len(ids) == 8 * (50 + 5 + 23)
+    assert len(set(ids)) == len(ids)
+
+
+def test_blocks_follow_row_order(tmp_path):
+    allocator = _allocator(str(tmp_path), block_size=10)
+    assert allocator.blocks(25, 5) == [(1, 25)]
+    # a chunk larger than a block is reserved on its own
+    assert _allocator(str(tmp_path), block_size=3).blocks(8, 4) == [(31, 8)]
+    assert allocator.blocks(12, 5) == [(26, 5), (39, 7)]
+
+
+def test_auto_field_factory(tmp_path):
+    allocator = _allocator(str(tmp_path))
+    assert [auto_field_factory("integer", allocator) for _ in range(3)] == [1, 2, 3]
+    with pytest.raises(ValueError):
+        auto_field_factory("integer")
+    assert auto_field_factory("text") == ""
+
+
+def test_generated_ids_come_from_the_blocks():
+    parent = field_pool.table(expand_table({"table_name": "parent", "table_fields": [
+        {"field_name": "id", "field_type": "integer", "field_factory": "auto"},
+    ]}))
+    child = field_pool.table(expand_table({"table_name": "child", "table_fields": [
+        {"field_name": "parent_id", "field_type": "integer", "field_required": True},
+    ], "table_foreign_keys": [{"field_name": "parent_id", "fk_table_name": "parent", "fk_field_name": "id"}]}))
+    blocks = [(1, 3), (100, 4), (50, 3)]
+    ids = [i for first, count in blocks for i in range(first, first + count)]
+    rows = [row[0] for chunk in TableDataGenerator(parent, 10, chunk_size=4, ids={"id": blocks}) for row in chunk]
+    assert rows == ids
+    docs = DatasourceDocs(namespace=NAMESPACE, tables={"parent": parent, "child": child})
+    references = references_of(child, docs, 10, {"parent.id": blocks})
+    assert references == {"parent_id": blocks}
+    generator = TableDataGenerator(child, 500, chunk_size=100, references=references)
+    assert {row[0] for chunk in generator for row in chunk} == set(ids)
+    with pytest.raises(ValueError, match="reserved"):
+        TableDataGenerator(parent, 11, ids={"id": blocks})
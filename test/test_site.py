@@ -0,0 +1,96 @@
+import json
+import os
+
+from benchmarks.corpus import write_namespace
+from src.view import site
+from src.view.site import FORMAT_HTML, FORMAT_MARKDOWN, KIND_DATA_SOURCE, KIND_TABLE, build_site, page_path
+
+NAMESPACE = "ns"
+
+
+def _table(name: str, *refs: str) -> dict:
+    return {
+        "table_name": name,
+        "table_fields": [{"field_name": "id", "field_type": "integer"}] + [{"field_name": f"{ref}_id"} for ref in refs],
+        "table_foreign_keys": [
+            {"field_name": f"{ref}_id", "fk_table_name": ref, "fk_field_name": "id"} for ref in refs
+        ] or None,
+    }
+
+
+def _write(docs_path: str, *tables: dict):
+    write_namespace(docs_path, NAMESPACE, n_data_sources=1, per_table_files=True, tables=list(tables))
+
+
+def _table_file(docs_path: str, name: str) -> str:
+    return os.path.join(docs_path, f"{NAMESPACE}-tableinfo-{name}-config.json")
+
+
+def _pages(site_dir: str) -> set[str]:
+    return {
+        f"{directory}/{name}" for directory in site.PAGE_DIRS.values()
+        for name in os.listdir(os.path.join(site_dir, directory))
+    }
+
+
+def _build(tmp_path, **kwargs) -> site.SiteResult:
+    return build_site(str(tmp_path / "docs"), str(tmp_path / "site"), NAMESPACE, workers=1, **kwargs)
+
+
+def test_unchanged_docs_are_skipped(tmp_path):
+    docs_path = str(tmp_path / "docs")
+    _write(docs_path, _table("customer"), _table("orders", "customer"), _table("invoice"))
+    first = _build(tmp_path)
+    assert (first.pages, first.rendered, first.files_read, first.index_rendered) == (4, 4, 4, True)
+    second = _build(tmp_path)
+    assert (second.rendered, second.removed, second.files_read, second.index_rendered) == (0, 0, 0, False)
+
+
+def test_changed_table_rerenders_its_page_and_the_linked_ones(tmp_path):
+    docs_path = str(tmp_path / "docs")
+    _write(docs_path, _table("customer"), _table("orders", "customer"), _table("invoice"))
+    _build(tmp_path)
+    # a new foreign key also changes the page of the referenced table
+    with open(_table_file(docs_path, "invoice"), "w") as f:
+        json.dump(_table("invoice", "customer"), f)
+    result = _build(tmp_path)
+    assert (result.files_read, result.rendered, result.index_rendered) == (1, 2, False)
+    with open(tmp_path / "site" / page_path(KIND_TABLE, "customer", FORMAT_HTML)) as f:
+        assert "invoice" in f.read()
+
+
+def test_removed_table_deletes_its_page(tmp_path):
+    docs_path = str(tmp_path / "docs")
+    _write(docs_path, _table("customer"), _table("orders", "customer"), _table("invoice"))
+    _build(tmp_path)
+    os.remove(_table_file(docs_path, "customer"))
+    result = _build(tmp_path)
+    # orders now links to a missing table
+    assert (result.removed, result.rendered, result.index_rendered) == (1, 1, True)
+    assert _pages(str(tmp_path / "site")) == {
+        page_path(KIND_TABLE, "orders", FORMAT_HTML), page_path(KIND_TABLE, "invoice", FORMAT_HTML),
+        page_path(KIND_DATA_SOURCE, "source_0", FORMAT_HTML),
+    }
+
+
+def test_manifest_version_bump_rebuilds(tmp_path, monkeypatch):
+    _write(str(tmp_path / "docs"), _table("customer"), _table("orders", "customer"))
+    _build(tmp_path)
+    monkeypatch.setattr(site, "SITE_VERSION", site.SITE_VERSION + 1)
+    result = _build(tmp_path)
+    assert (result.rendered, result.files_read, result.index_rendered) == (3, 3, True)
+    with open(tmp_path / "site" / site.SITE_MANIFEST) as f:
+        assert json.load(f)["version"] == site.SITE_VERSION
+    assert _build(tmp_path).rendered == 0
+
+
+def test_format_change_and_force(tmp_path):
+    _write(str(tmp_path / "docs"), _table("customer"), _table("orders", "customer"))
+    _build(tmp_path)
+    result = _build(tmp_path, fmt=FORMAT_MARKDOWN)
+    assert (result.rendered, result.removed) == (3, 4)
+    site_dir = str(tmp_path / "site")
+    assert all(path.endswith(".md") for path in _pages(site_dir))
+    assert not os.path.exists(os.path.join(site_dir, "index.html"))
+    forced = _build(tmp_path, fmt=FORMAT_MARKDOWN, force=True)
+    assert (forced.rendered, forced.removed, forced.files_read) == (3, 0, 3)
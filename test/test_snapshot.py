@@ -0,0 +1,70 @@
+import json
+import os
+
+from benchmarks.corpus import generate_data_sources, generate_tables, write_namespace
+from src.model.docs import docs_to_snapshot, load_docs
+from src.model.snapshot import SNAPSHOT_EXTENSION, dump_snapshot, load_snapshot, read_header
+from src.model.storage import doc_files, RE_SNAPSHOT, RE_TABLE_INFO, snapshot_sources, write_atomic
+
+NAMESPACE = "ns"
+
+
+def _dumped(docs) -> tuple[dict, dict]:
+    return (
+        {name: ds.model_dump(mode="json") for name, ds in docs.data_sources.items()},
+        {name: table.model_dump(mode="json") for name, table in docs.tables.items()},
+    )
+
+
+def _write_snapshot(directory: str) -> str:
+    path = os.path.join(directory, f"{NAMESPACE}-snapshot{SNAPSHOT_EXTENSION}")
+    sources = snapshot_sources(directory, NAMESPACE)
+    write_atomic(path, docs_to_snapshot(load_docs(directory, NAMESPACE), sources))
+    return path
+
+
+def test_round_trip(tmp_path):
+    write_namespace(str(tmp_path), NAMESPACE, n_tables=50, n_data_sources=3, seed=1, per_table_files=True)
+    docs = load_docs(str(tmp_path), NAMESPACE)
+    snapshot = load_snapshot(docs_to_snapshot(docs))
+    data_sources, tables = _dumped(docs)
+    assert {ds["ds_name"]: ds for ds in snapshot.data_sources} == data_sources
+    assert {table["table_name"]: table for table in snapshot.tables} == tables
+
+
+def test_round_trip_keeps_tables_without_fields():
+    tables = [*generate_tables(3, seed=2), {"table_name": "empty", "table_fields": None}]
+    snapshot = load_snapshot(dump_snapshot(generate_data_sources(1), tables))
+    assert [table["table_name"] for table in snapshot.tables] == [table["table_name"] for table in tables]
+    assert snapshot.tables[-1]["table_fields"] is None
+    assert snapshot.tables[0]["table_fields"] == tables[0]["table_fields"]
+
+
+def test_header_keeps_sources(tmp_path):
+    write_namespace(str(tmp_path), NAMESPACE, n_tables=5, per_table_files=True)
+    path = _write_snapshot(str(tmp_path))
+    with open(path, "rb") as file:
+        assert read_header(file)["sources"] == snapshot_sources(str(tmp_path), NAMESPACE)
+
+
+def test_fresh_snapshot_replaces_json(tmp_path):
+    write_namespace(str(tmp_path), NAMESPACE, n_tables=5, per_table_files=True)
+    path = _write_snapshot(str(tmp_path))
+    assert doc_files(str(tmp_path), (RE_TABLE_INFO, RE_SNAPSHOT), NAMESPACE) == [path]
+
+
+def test_json_edit_wins_over_snapshot(tmp_path):
+    directory = str(tmp_path)
+    write_namespace(directory, NAMESPACE, n_tables=5, per_table_files=True)
+    path = _write_snapshot(directory)
+    table_path = os.path.join(directory, f"{NAMESPACE}-tableinfo-table_0-config.json")
+    with open(table_path) as file:
+        table = json.load(file)
+    table["table_fields"][-1]["field_name"] = "edited"
+    with open(table_path, "w") as file:
+        file.write(json.dumps(table))
+    assert path not in doc_files(directory, (RE_TABLE_INFO, RE_SNAPSHOT), NAMESPACE)
+    docs = load_docs(directory, NAMESPACE)
+    assert docs.tables["table_0"].table_fields[-1].field_name == "edited"
+    # a snapshot given explicitly is read whatever its age
+    assert load_docs(path).tables["table_0"].table_fields[-1].field_name != "edited"
@@ -0,0 +1,40 @@
+import json
+import os
+
+from benchmarks.corpus import write_namespace
+from src.model.docs import load_docs
+from src.model.storage import dump_doc
+
+NAMESPACE = "ns"
+
+
+def _export(directory: str, docs, compact: bool):
+    for name, ds_info in docs.data_sources.items():
+        with open(os.path.join(directory, f"{NAMESPACE}-datasourceinfo-{name}-config.json"), "w") as file:
+            file.write(dump_doc(ds_info, compact=compact))
+    with open(os.path.join(directory, f"{NAMESPACE}-tableinfo-config.json"), "w") as file:
+        file.write(dump_doc(list(docs.tables.values()), compact=compact))
+
+
+def test_compact_export_round_trip(tmp_path):
+    source = str(tmp_path / "source")
+    write_namespace(source, NAMESPACE, n_tables=40, n_data_sources=3, seed=9)
+    docs = load_docs(source, NAMESPACE)
+    sizes = {}
+    for compact in (False, True):
+        directory = str(tmp_path / ("compact" if compact else "verbose"))
+        os.makedirs(directory)
+        _export(directory, docs, compact)
+        sizes[compact] = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+        loaded = load_docs(directory, NAMESPACE)
+        assert loaded.model_dump() == docs.model_dump()
+    assert sizes[True] < sizes[False]
+
+
+def test_compact_export_omits_defaults(tmp_path):
+    write_namespace(str(tmp_path), NAMESPACE, n_tables=1)
+    docs = load_docs(str(tmp_path), NAMESPACE)
+    table = json.loads(dump_doc(docs.tables["table_0"], compact=True))
+    for field in table["table_fields"]:
+        assert None not in field.values()
+        assert field.get("field_required") is not False
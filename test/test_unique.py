@@ -0,0 +1,66 @@
+import os
+import random
+
+from src.data import unique
+from src.data.unique import find_duplicates
+from src.data.validator import validate_file
+from src.model.intern import field_pool
+from src.model.storage import expand_table
+
+MEMORY_LIMIT = 64 << 10
+
+
+def _values(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    values = [f"value-{i}" for i in range(n)]
+    # a few repeated text and JSON values, at random places
+    for i in rng.sample(range(n), 50):
+        values[i] = values[rng.randrange(n)]
+    values[rng.randrange(n)] = values[rng.randrange(n)] = {"b": [1, 2], "a": None}
+    return values
+
+
+def _spy_spills(monkeypatch, tmp_path) -> list:
+    spills = []
+    spill = unique.ExternalSorter._spill
+
+    def spy(sorter):
+        assert os.path.dirname(sorter.directory) == str(tmp_path)
+        spills.append(len(sorter._buffer))
+        spill(sorter)
+    monkeypatch.setattr(unique.ExternalSorter, "_spill", spy)
+    return spills
+
+
+def _sorted(duplicates) -> list:
+    return sorted((repr(d.value), d.locations) for d in duplicates)
+
+
+def test_external_path_matches_in_memory(monkeypatch, tmp_path):
+    values = _values(20000)
+    expected = _sorted(find_duplicates(lambda: zip(values, range(len(values)))))
+    assert expected
+    spills = _spy_spills(monkeypatch, tmp_path)
+    # every value is a candidate with a tiny Bloom filter, so the sorter spills many runs
+    found = find_duplicates(lambda: zip(values, range(len(values))), MEMORY_LIMIT // 16, str(tmp_path))
+    assert _sorted(found) == expected
+    assert len(spills) > 1
+    assert os.listdir(str(tmp_path)) == []
+
+
+def test_validate_file_spills(monkeypatch, tmp_path):
+    table = field_pool.table(expand_table({"table_name": "t", "table_fields": [
+        {"field_name": "code", "field_type": "text", "field_unique": True},
+    ]}))
+    path = os.path.join(str(tmp_path), "t.csv")
+    with open(path, "w") as f:
+        f.write("code\n" + "".join(f"code-{i % 19990}\n" for i in range(20000)))
+    expected = validate_file(path, table, workers=1)
+    spill_dir = tmp_path / "spill"
+    spill_dir.mkdir()
+    spills = _spy_spills(monkeypatch, spill_dir)
+    report = validate_file(path, table, workers=1, memory_limit=MEMORY_LIMIT // 16, spill_dir=str(spill_dir))
+    assert spills
+    assert report.total == expected.total == 10
+    assert report.violations == expected.violations
+    assert [v.row for v in report.violations] == list(range(19991, 20001))
@@ -0,0 +1,89 @@
+import json
+import os
+
+import pytest
+
+from src.data.validator import (
+    REASON_GE, REASON_LT, REASON_TYPE, REASON_UNIQUE, Violation, unique_key, validate_file,
+)
+from src.model.meta import FieldInfo, TableInfo
+from src.model.storage import expand_doc, expand_table
+
+# 2020-01-01T00:00:00Z and 2021-01-01T00:00:00Z in milliseconds
+JAN_2020 = 1577836800000
+JAN_2021 = 1609459200000
+
+
+def _table(*fields: dict) -> TableInfo:
+    return TableInfo(**expand_table({"table_name": "t", "table_fields": list(fields)}))
+
+
+def _write(tmp_path, name: str, lines: list[str]) -> str:
+    path = os.path.join(str(tmp_path), name)
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+    return path
+
+
+def _reasons(report) -> list[tuple[int, str, str]]:
+    return [(v.row, v.field_name, v.reason) for v in report.violations]
+
+
+def test_datetime_bounds(tmp_path):
+    table = _table({"field_name": "at", "field_type": "datetime", "field_ge": JAN_2020, "field_lt": JAN_2021})
+    csv_path = _write(tmp_path, "data.csv", [
+        "at", "2020-06-01T12:00:00+00:00", "2019-12-31T23:59:59", "2021-01-01T00:00:00+00:00",
+        "2020-12-31T23:00:00-02:00", "2020-01-01T00:00:00", "not a date",
+    ])
+    report = validate_file(csv_path, table, workers=1)
+    assert _reasons(report) == [(2, "at", REASON_GE), (3, "at", REASON_LT), (4, "at", REASON_LT), (6, "at", REASON_TYPE)]
+    jsonl_path = _write(tmp_path, "data.jsonl", [
+        json.dumps({"at": "2020-06-01T12:00:00Z"}), json.dumps({"at": "2019-06-01T12:00:00Z"}),
+    ])
+    assert _reasons(validate_file(jsonl_path, table, workers=1)) == [(2, "at", REASON_GE)]
+
+
+def test_unique_compares_typed_values(tmp_path):
+    table = _table(
+        {"field_name": "id", "field_type": "integer", "field_unique": True},
+        {"field_name": "score", "field_type": "float", "field_unique": True},
+        {"field_name": "at", "field_type": "datetime", "field_unique": True},
+    )
+    path = _write(tmp_path, "data.csv", [
+        "id,score,at",
+        "1,1.5,2020-01-01T00:00:00+00:00",
+        "01,1.50,2020-01-01T01:00:00+01:00",
+        "2,x,2020-01-01T00:00:00",
+        "x,2.5,",
+    ])
+    report = validate_file(path, table, workers=1)
+    assert [(v.row, v.field_name, v.reason) for v in report.violations if v.reason == REASON_UNIQUE] == [
+        (2, "id", REASON_UNIQUE), (2, "score", REASON_UNIQUE), (2, "at", REASON_UNIQUE), (3, "at", REASON_UNIQUE),
+    ]
+    # wrong values are type violations only
+    assert report.counts[("score", REASON_TYPE)] == 1 and report.counts[("id", REASON_TYPE)] == 1
+
+
+def test_unique_key_per_format():
+    field = FieldInfo(**expand_doc({"field_name": "u", "field_type": "uuid"}, FieldInfo))
+    upper = "6F9619FF-8B86-D011-B42D-00CF4FC964FF"
+    assert unique_key(field, "csv")(upper) == unique_key(field, "jsonl")(upper.lower())
+    field = FieldInfo(**expand_doc({"field_name": "j", "field_type": "json"}, FieldInfo))
+    assert unique_key(field, "csv")('{"a": 1, "b": 2}') == unique_key(field, "jsonl")({"b": 2, "a": 1})
+    with pytest.raises(ValueError):
+        unique_key(field, "csv")("[1]")
+
+
+@pytest.mark.parametrize("max_violations", [2, 100])
+def test_violations_in_row_order(tmp_path, max_violations):
+    table = _table(
+        {"field_name": "id", "field_type": "integer", "field_unique": True},
+        {"field_name": "n", "field_type": "integer", "field_ge": 0},
+    )
+    path = _write(tmp_path, "data.csv", ["id,n", "1,5", "1,6", "2,-1", "1,-2"])
+    report = validate_file(path, table, workers=1, max_violations=max_violations)
+    expected = [Violation(2, "id", 1, REASON_UNIQUE), Violation(3, "n", -1, REASON_GE),
+                Violation(4, "n", -2, REASON_GE), Violation(4, "id", 1, REASON_UNIQUE)]
+    assert report.total == 4
+    assert [(v.row, v.field_name, v.reason) for v in report.violations] == \
+        [(v.row, v.field_name, v.reason) for v in expected][:max_violations]